@@ -0,0 +1,35 @@
+import os
+import tempfile
+
+from app.config import settings
+
+
+class LocalBlobStore:
+    """Content-addressed files under a local directory (shared volume between api and worker)."""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put(self, key: str, data: bytes) -> None:
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".part")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, target)
+
+
+_store: LocalBlobStore | None = None
+
+
+def get_blob_store() -> LocalBlobStore:
+    global _store
+    if _store is None:
+        _store = LocalBlobStore(settings.blob_store_dir)
+    return _store
@@ -0,0 +1,32 @@
+"""One-off setup: schema upgrades, partitions, the search index and dev seed data.
+
+Runs before the API starts serving (``python -m app.bootstrap`` as a
+pre-deploy/init step) instead of inside every serving process, so cold
+starts do not pay for DDL or wait on OpenSearch.
+"""
+import logging
+
+from app.db import SessionLocal, init_database
+from app.logging_config import configure_logging
+from app.search_index import ensure_listings_index
+from app.seed import seed_if_empty
+
+
+logger = logging.getLogger(__name__)
+
+
+def bootstrap() -> None:
+    init_database()
+    if not ensure_listings_index():
+        logger.warning("Search index not ensured; the outbox drain will retry")
+    try:
+        with SessionLocal() as session:
+            seed_if_empty(session)
+    except Exception:
+        logger.warning("Seeding skipped", exc_info=True)
+
+
+if __name__ == "__main__":
+    configure_logging()
+    bootstrap()
+    logger.info("Bootstrap complete")
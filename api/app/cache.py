@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import time
+from typing import Awaitable, Callable
+
+import orjson
+
+from app.config import settings
+from app.metrics import CACHE_REQUESTS
+from app.redis_client import get_async_redis, get_redis
+
+
+LISTINGS_VERSION_KEY = "cache:listings:version"  # == _version_key("listings")
+_POLL_SECONDS = 0.05
+
+
+def _version_key(scope: str) -> str:
+    return f"cache:{scope}:version"
+
+
+def _scope_version(scope: str) -> int:
+    value = get_redis().get(_version_key(scope))
+    return int(value) if value else 0
+
+
+def invalidate_listings() -> None:
+    """Bump the listings version tag; every cached list/detail response becomes unreachable."""
+    try:
+        get_redis().incr(LISTINGS_VERSION_KEY)
+    except Exception:
+        pass
+
+
+def invalidate_scopes(scopes, ttl: int | None = None) -> None:
+    """Bump the version tag of several cache scopes in one round trip.
+
+    With ``ttl`` the version keys expire too; it must outlive the cached
+    entries, so a version that lapses back to 0 can't resurface an old entry.
+    """
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for scope in scopes:
+            pipe.incr(_version_key(scope))
+            if ttl:
+                pipe.expire(_version_key(scope), ttl)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def listings_cache_key(namespace: str, params: dict) -> str:
+    normalized = {k: v for k, v in params.items() if v is not None}
+    digest = hashlib.sha1(orjson.dumps(normalized, option=orjson.OPT_SORT_KEYS)).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def read_through(
+    key: str, loader: Callable[[], bytes | None], ttl: int | None = None, scope: str = "listings"
+) -> bytes | None:
+    """Return the cached value for ``key`` (scoped to the version of ``scope``) or load it.
+
+    Only one caller per key runs ``loader`` on a miss; concurrent callers wait
+    briefly for that result instead of all hitting the database. Redis errors
+    degrade to calling ``loader`` directly.
+    """
+    if not settings.listings_cache_enabled:
+        return loader()
+    # Per-tile scopes share one label ("tile") to keep cardinality bounded
+    cache_name = scope.split(":", 1)[0]
+    try:
+        r = get_redis()
+        versioned = f"cache:{scope}:v{_scope_version(scope)}:{key}"
+        cached = r.get(versioned)
+        if cached is not None:
+            CACHE_REQUESTS.labels(cache_name, "hit").inc()
+            return cached
+        CACHE_REQUESTS.labels(cache_name, "miss").inc()
+        lock_key = f"{versioned}:lock"
+        have_lock = bool(r.set(lock_key, b"1", nx=True, px=settings.cache_lock_timeout_ms))
+    except Exception:
+        return loader()
+
+    if not have_lock:
+        # Someone else is filling this entry; wait for it before falling back to the DB
+        deadline = time.monotonic() + settings.cache_wait_ms / 1000.0
+        while time.monotonic() < deadline:
+            time.sleep(_POLL_SECONDS)
+            try:
+                cached = r.get(versioned)
+            except Exception:
+                break
+            if cached is not None:
+                return cached
+        return loader()
+
+    try:
+        value = loader()
+        if value is not None:
+            try:
+                r.set(versioned, value, ex=ttl or settings.listings_cache_ttl_seconds)
+            except Exception:
+                pass
+        return value
+    finally:
+        try:
+            r.delete(lock_key)
+        except Exception:
+            pass
+
+
+async def read_through_async(
+    key: str, loader: Callable[[], Awaitable[bytes | None]], ttl: int | None = None, scope: str = "listings"
+) -> bytes | None:
+    """``read_through`` for async routes: same keys, locking and fallbacks, without blocking the event loop."""
+    if not settings.listings_cache_enabled:
+        return await loader()
+    cache_name = scope.split(":", 1)[0]
+    try:
+        r = get_async_redis()
+        version = await r.get(_version_key(scope))
+        versioned = f"cache:{scope}:v{int(version) if version else 0}:{key}"
+        cached = await r.get(versioned)
+        if cached is not None:
+            CACHE_REQUESTS.labels(cache_name, "hit").inc()
+            return cached
+        CACHE_REQUESTS.labels(cache_name, "miss").inc()
+        lock_key = f"{versioned}:lock"
+        have_lock = bool(await r.set(lock_key, b"1", nx=True, px=settings.cache_lock_timeout_ms))
+    except Exception:
+        return await loader()
+
+    if not have_lock:
+        deadline = time.monotonic() + settings.cache_wait_ms / 1000.0
+        while time.monotonic() < deadline:
+            await asyncio.sleep(_POLL_SECONDS)
+            try:
+                cached = await r.get(versioned)
+            except Exception:
+                break
+            if cached is not None:
+                return cached
+        return await loader()
+
+    try:
+        value = await loader()
+        if value is not None:
+            try:
+                await r.set(versioned, value, ex=ttl or settings.listings_cache_ttl_seconds)
+            except Exception:
+                pass
+        return value
+    finally:
+        try:
+            await r.delete(lock_key)
+        except Exception:
+            pass
@@ -0,0 +1,130 @@
+from dataclasses import dataclass
+from math import asin, cos, radians, sin, sqrt
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Campus
+
+
+EARTH_RADIUS_KM = 6371.0
+# How long a loaded index is trusted before checking the campuses table for changes
+REFRESH_CHECK_SECONDS = 60.0
+
+
+def _to_unit_vector(lat: float, lng: float) -> tuple[float, float, float]:
+    phi, lam = radians(lat), radians(lng)
+    return (cos(phi) * cos(lam), cos(phi) * sin(lam), sin(phi))
+
+
+def _chord_sq(a: tuple[float, float, float], b: tuple[float, float, float]) -> float:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2
+
+
+def _chord_to_km(chord: float) -> float:
+    # Chord length on the unit sphere -> great-circle distance
+    return 2.0 * EARTH_RADIUS_KM * asin(min(1.0, chord / 2.0))
+
+
+@dataclass
+class _Node:
+    point: tuple[float, float, float]
+    campus_id: int
+    name: str
+    axis: int
+    left: "_Node | None" = None
+    right: "_Node | None" = None
+
+
+class CampusIndex:
+    """KD-tree over campus positions projected onto the unit sphere.
+
+    Euclidean (chord) distance in 3D is monotonic with great-circle distance,
+    so nearest-neighbour search on the tree gives the nearest campus exactly.
+    """
+
+    def __init__(self, campuses: list[tuple[int, str, float, float]]):
+        points = [(_to_unit_vector(lat, lng), cid, name) for cid, name, lat, lng in campuses]
+        self._root = self._build(points, 0)
+        self.size = len(points)
+
+    def _build(self, points: list, depth: int) -> _Node | None:
+        if not points:
+            return None
+        axis = depth % 3
+        points.sort(key=lambda p: p[0][axis])
+        mid = len(points) // 2
+        point, cid, name = points[mid]
+        node = _Node(point=point, campus_id=cid, name=name, axis=axis)
+        node.left = self._build(points[:mid], depth + 1)
+        node.right = self._build(points[mid + 1:], depth + 1)
+        return node
+
+    def nearest(self, lat: float, lng: float) -> tuple[int, str, float] | None:
+        if self._root is None:
+            return None
+        target = _to_unit_vector(lat, lng)
+        best: list = [None, float("inf")]
+
+        def visit(node: _Node | None) -> None:
+            if node is None:
+                return
+            d = _chord_sq(target, node.point)
+            if d < best[1]:
+                best[0], best[1] = node, d
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+            visit(near)
+            if diff * diff < best[1]:
+                visit(far)
+
+        visit(self._root)
+        node = best[0]
+        return node.campus_id, node.name, _chord_to_km(sqrt(best[1]))
+
+
+_index: CampusIndex | None = None
+_fingerprint: tuple | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _campus_fingerprint(db: Session) -> tuple:
+    row = db.execute(
+        select(
+            func.count(Campus.id),
+            func.max(Campus.id),
+            func.sum(Campus.latitude),
+            func.sum(Campus.longitude),
+        )
+    ).one()
+    return tuple(row)
+
+
+def get_campus_index(db: Session) -> CampusIndex:
+    """Return the process-wide campus index, reloading it when campuses change."""
+    global _index, _fingerprint, _checked_at
+    now = time.monotonic()
+    if _index is not None and now - _checked_at < REFRESH_CHECK_SECONDS:
+        return _index
+    with _lock:
+        if _index is not None and now - _checked_at < REFRESH_CHECK_SECONDS:
+            return _index
+        fingerprint = _campus_fingerprint(db)
+        if _index is None or fingerprint != _fingerprint:
+            rows = db.execute(
+                select(Campus.id, Campus.name, Campus.latitude, Campus.longitude)
+            ).all()
+            _index = CampusIndex([tuple(r) for r in rows])
+            _fingerprint = fingerprint
+        _checked_at = now
+        return _index
+
+
+def invalidate_campus_index() -> None:
+    global _index, _fingerprint
+    with _lock:
+        _index = None
+        _fingerprint = None
@@ -8,6 +8,73 @@ class Settings(BaseSettings):
     api_port: int = 8000
     auto_create_tables: bool = True
     openai_api_key: str | None = None
+    openai_base_url: str | None = None
+    openai_model: str = "gpt-4o-mini"
+    llm_cache_ttl_seconds: int = 90 * 24 * 3600
+    llm_concurrency: int = 16
+    llm_requests_per_minute: int = 500
+    llm_tokens_per_minute: int = 200_000
+    llm_microbatch_size: int = 4
+    llm_microbatch_max_chars: int = 3000
+    ingest_batch_max_items: int = 5000
+    ingest_dispatch_chunk_size: int = 25
+    geocoder_url: str = "https://nominatim.openstreetmap.org/search"
+    geocode_user_agent: str = "roof-dev"
+    geocode_timeout_seconds: float = 5.0
+    geocode_cache_ttl_seconds: int = 30 * 24 * 3600
+    geocode_negative_ttl_seconds: int = 24 * 3600
+    outbox_batch_size: int = 500
+    outbox_max_batches_per_run: int = 20
+    outbox_drain_interval_seconds: float = 2.0
+    outbox_bulk_timeout_seconds: int = 30
+    listings_cache_enabled: bool = True
+    listings_cache_ttl_seconds: int = 60
+    cache_lock_timeout_ms: int = 5000
+    cache_wait_ms: int = 2000
+    image_cache_dir: str = "/tmp/roof-image-cache"
+    image_cache_max_bytes: int = 512 * 1024 * 1024
+    image_cache_max_object_bytes: int = 10 * 1024 * 1024
+    image_proxy_timeout_seconds: float = 30.0
+    image_proxy_max_connections: int = 100
+    blob_store_dir: str = "/data/blobs"
+    image_fetch_concurrency: int = 8
+    image_fetch_timeout_seconds: float = 20.0
+    image_fetch_max_bytes: int = 15 * 1024 * 1024
+    image_fetch_user_agent: str = "roof-image-worker"
+    image_fetch_max_redirects: int = 5
+    image_fetch_allow_private_hosts: bool = False  # local dev only: lets the worker fetch from LAN/loopback hosts
+    near_dup_text_threshold: float = 0.8
+    near_dup_image_max_distance: int = 3
+    near_dup_max_candidates: int = 20
+    raw_payload_retention_days: int = 90
+    raw_payload_retention_mode: str = "drop"  # "drop" or "detach" (keep as *_archive tables)
+    raw_payload_partitions_ahead: int = 2
+    listing_expire_after_days: int = 30
+    listing_expire_batch_size: int = 1000
+    listing_expire_max_batches_per_run: int = 50
+    map_tile_grid_size: int = 8
+    map_tile_max_cached_zoom: int = 18
+    map_tile_cache_ttl_seconds: int = 600
+    facets_use_opensearch: bool = True
+    facets_opensearch_timeout_seconds: float = 2.0
+    pipeline_stage_ttl_seconds: int = 24 * 3600
+    log_level: str = "INFO"
+    worker_metrics_port: int = 9808
+    db_pool_size: int = 10
+    db_max_overflow: int = 10
+    db_pool_timeout_seconds: float = 10.0
+    db_pool_recycle_seconds: int = 1800
+    async_db_pool_size: int = 20
+    async_db_max_overflow: int = 20
+    bootstrap_on_startup: bool = False  # normally `python -m app.bootstrap` runs before the server
+    opensearch_pool_maxsize: int = 25
+    readiness_cache_ttl_seconds: float = 5.0
+    readiness_timeout_seconds: float = 1.0
+    spam_score_batch_size: int = 10_000
+    spam_score_interval_seconds: int = 3600
+    spam_medians_min_group: int = 20
+    spam_medians_ttl_seconds: int = 2 * 24 * 3600
+    listings_max_spam_score: float | None = 0.8  # GET /listings default; None shows everything
 
     class Config:
         env_file = ".env"
@@ -1,29 +1,82 @@
 from typing import Iterable, Sequence
-from sqlalchemy.orm import Session
-from sqlalchemy import select
+from datetime import datetime
+import base64
+import json
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, selectinload
+from sqlalchemy import cast, func, or_, select, tuple_
 
 from app import models
-from app.schemas import ListingCreate
+from app.schemas import ListingCreate, ListingDetail, ListingImage
+from app.search_index import enqueue_listing_change
 
 
 def create_listing(db: Session, data: ListingCreate) -> models.Listing:
-    listing = models.Listing(**data.model_dict(exclude_none=True))
+    listing = models.Listing(**data.model_dump(exclude_none=True))
     db.add(listing)
     db.flush()
+    enqueue_listing_change(db, listing.id)
     return listing
 
 
-def list_listings(
-    db: Session,
+# Columns the read endpoints serialize; anything else on the model is left unloaded
+LISTING_READ_FIELDS = tuple(f for f in ListingDetail.model_fields if f != "images")
+IMAGE_READ_FIELDS = tuple(f for f in ListingImage.model_fields if f != "variants")
+
+
+def listing_read_options() -> list:
+    """Project only response columns and load images in one batched query."""
+    return [
+        load_only(*(getattr(models.Listing, f) for f in LISTING_READ_FIELDS)),
+        selectinload(models.Listing.images).load_only(
+            *(getattr(models.ListingImage, f) for f in IMAGE_READ_FIELDS)
+        ),
+    ]
+
+
+async def get_listing_async(db: AsyncSession, listing_id: int) -> models.Listing | None:
+    return await db.get(models.Listing, listing_id, options=listing_read_options())
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(listing: models.Listing) -> str:
+    raw = json.dumps([listing.collected_at.isoformat(), listing.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        collected_at, listing_id = json.loads(raw)
+        return datetime.fromisoformat(collected_at), int(listing_id)
+    except Exception as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+
+
+def geography_point(lat: float, lng: float):
+    return cast(func.ST_SetSRID(func.ST_MakePoint(lng, lat), 4326), models.Geography())
+
+
+def apply_listing_filters(
+    stmt,
     *,
-    limit: int = 20,
-    offset: int = 0,
     min_price: int | None = None,
     max_price: int | None = None,
     bedrooms: int | None = None,
     furnished: bool | None = None,
-) -> Sequence[models.Listing]:
-    stmt = select(models.Listing)
+    campus_id: int | None = None,
+    within_km: float | None = None,
+    bbox: tuple[float, float, float, float] | None = None,
+    near: tuple[float, float] | None = None,
+    radius_km: float | None = None,
+    max_spam_score: float | None = None,
+):
+    # Active listings only: near-duplicates are shown through their canonical listing, expired ones are archived
+    stmt = stmt.where(models.Listing.status == "active")
     if min_price is not None:
         stmt = stmt.where(models.Listing.price_cents >= min_price)
     if max_price is not None:
@@ -32,8 +85,50 @@ def list_listings(
         stmt = stmt.where(models.Listing.bedrooms == bedrooms)
     if furnished is not None:
         stmt = stmt.where(models.Listing.furnished == furnished)
-    stmt = stmt.order_by(models.Listing.collected_at.desc()).limit(limit).offset(offset)
-    return db.execute(stmt).scalars().all()
+    if campus_id is not None:
+        stmt = stmt.where(models.Listing.nearest_campus_id == campus_id)
+        if within_km is not None:
+            stmt = stmt.where(models.Listing.campus_distance_km <= within_km)
+    if max_spam_score is not None:
+        # Not-yet-scored listings stay visible; both arms are served by ix_listings_spam_score
+        stmt = stmt.where(or_(models.Listing.spam_score <= max_spam_score, models.Listing.spam_score.is_(None)))
+    # Spatial predicates below are served by the GiST index on listings.geog
+    if bbox is not None:
+        min_lng, min_lat, max_lng, max_lat = bbox
+        envelope = cast(func.ST_MakeEnvelope(min_lng, min_lat, max_lng, max_lat, 4326), models.Geography())
+        stmt = stmt.where(models.Listing.geog.op("&&")(envelope))
+    if near is not None and radius_km is not None:
+        stmt = stmt.where(func.ST_DWithin(models.Listing.geog, geography_point(*near), radius_km * 1000.0))
+    return stmt
+
 
+def listings_query(
+    *,
+    limit: int = 20,
+    offset: int = 0,
+    sort: str = "recent",
+    cursor: str | None = None,
+    near: tuple[float, float] | None = None,
+    **filters,
+):
+    """The GET /listings statement, shared by the sync and async sessions."""
+    stmt = select(models.Listing).options(*listing_read_options())
+    stmt = apply_listing_filters(stmt, near=near, **filters)
+    if sort == "campus_distance":
+        stmt = stmt.order_by(models.Listing.campus_distance_km.asc().nulls_last(), models.Listing.id)
+    elif sort == "distance" and near is not None:
+        # KNN ordering (<->) walks the GiST index nearest-first instead of sorting every match
+        stmt = stmt.order_by(models.Listing.geog.op("<->")(geography_point(*near)), models.Listing.id)
+    else:
+        if cursor is not None:
+            # Seek past the last row of the previous page; served by ix_listings_collected_at_id
+            collected_at, listing_id = decode_cursor(cursor)
+            stmt = stmt.where(
+                tuple_(models.Listing.collected_at, models.Listing.id) < tuple_(collected_at, listing_id)
+            )
+        stmt = stmt.order_by(models.Listing.collected_at.desc(), models.Listing.id.desc())
+    return stmt.limit(limit).offset(offset)
 
 
+async def list_listings_async(db: AsyncSession, **params) -> Sequence[models.Listing]:
+    return (await db.execute(listings_query(**params))).scalars().all()
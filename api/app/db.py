@@ -1,17 +1,106 @@
-from typing import Generator
+from typing import AsyncGenerator, Generator
 import time
 
 from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.config import settings
-from app.models import Base
+from app.facets import FACET_COUNTS_BACKFILL, FACET_COUNTS_DDL, FACET_COUNTS_UPGRADES
+from app.metrics import DB_POOL_CHECKOUT_SECONDS
+from app.models import LISTING_GEOG_EXPRESSION, Base
+from app.raw_partitions import ensure_partitions
 
 
-engine = create_engine(settings.database_url, pool_pre_ping=True, future=True)
+class _TimedCheckout:
+    pool_label = "sync"
+
+    # _do_get is where a checkout blocks when the pool is exhausted
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.labels(self.pool_label).observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pool_label = "async"
+
+
+def _async_url_and_args(url: str) -> tuple:
+    """The asyncpg form of ``database_url``; libpq's sslmode becomes asyncpg's ``ssl`` argument."""
+    parsed = make_url(url).set(drivername="postgresql+asyncpg")
+    sslmode = parsed.query.get("sslmode")
+    if sslmode is None:
+        return parsed, {}
+    return parsed.difference_update_query(["sslmode"]), {"ssl": sslmode}
+
+
+engine = create_engine(
+    settings.database_url,
+    pool_pre_ping=True,
+    poolclass=TimedQueuePool,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_recycle=settings.db_pool_recycle_seconds,
+    future=True,
+)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 
+# Read path for async routes: the event loop awaits Postgres instead of parking a threadpool worker
+_async_url, _async_connect_args = _async_url_and_args(settings.database_url)
+async_engine = create_async_engine(
+    _async_url,
+    connect_args=_async_connect_args,
+    pool_pre_ping=True,
+    poolclass=TimedAsyncQueuePool,
+    pool_size=settings.async_db_pool_size,
+    max_overflow=settings.async_db_max_overflow,
+    pool_timeout=settings.db_pool_timeout_seconds,
+    pool_recycle=settings.db_pool_recycle_seconds,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Idempotent DDL applied on startup for tables created before a column/index existed.
+# Keep in sync with api/migrations/*.sql.
+SCHEMA_UPGRADES: list[str] = [
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS attributes JSONB",
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS nearest_campus_id INTEGER REFERENCES campuses(id) ON DELETE SET NULL",
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS campus_distance_km DOUBLE PRECISION",
+    "CREATE INDEX IF NOT EXISTS ix_listings_campus_distance_km ON listings (campus_distance_km)",
+    "CREATE INDEX IF NOT EXISTS ix_listings_campus_distance ON listings (nearest_campus_id, campus_distance_km)",
+    "CREATE INDEX IF NOT EXISTS ix_listings_collected_at_id ON listings (collected_at, id)",
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS cluster_id INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_listings_cluster_id ON listings (cluster_id)",
+    "ALTER TABLE listing_images ADD COLUMN IF NOT EXISTS phash BIGINT",
+    # Fails (and is skipped) while duplicate rows exist; see migrations/add_listing_source_unique.sql
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_listings_source_source_id ON listings (source, source_id)",
+    "ALTER TABLE raw_payloads ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_raw_payloads_content_hash ON raw_payloads (content_hash)",
+    # Partitioning an existing table is a one-off: see migrations/partition_raw_payloads.sql
+    "ALTER TABLE raw_payloads ADD COLUMN IF NOT EXISTS payload_zstd BYTEA",
+    "ALTER TABLE raw_payloads ALTER COLUMN payload DROP NOT NULL",
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITHOUT TIME ZONE",
+    "CREATE INDEX IF NOT EXISTS ix_listings_last_seen_at ON listings (last_seen_at)",
+    "UPDATE listings SET last_seen_at = collected_at WHERE last_seen_at IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_listings_archive_source_source_id ON listings_archive (source, source_id)",
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS geog geography(Point, 4326) "
+    f"GENERATED ALWAYS AS ({LISTING_GEOG_EXPRESSION}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_listings_geog ON listings USING GIST (geog)",
+    *FACET_COUNTS_UPGRADES,
+    FACET_COUNTS_BACKFILL,
+    *FACET_COUNTS_DDL,
+]
+
 
 def init_database(max_attempts: int = 20, delay_seconds: float = 1.0) -> None:
     attempt = 0
@@ -45,9 +134,15 @@ def init_database(max_attempts: int = 20, delay_seconds: float = 1.0) -> None:
             # Ignore auto-create errors in startup; health endpoint will still surface DB readiness
             pass
     # Ensure new columns exist for evolving schema
+    for statement in SCHEMA_UPGRADES:
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(statement))
+        except Exception:
+            pass
     try:
         with engine.begin() as connection:
-            connection.execute(text("ALTER TABLE listings ADD COLUMN IF NOT EXISTS attributes JSONB"))
+            ensure_partitions(connection, settings.raw_payload_partitions_ahead)
     except Exception:
         pass
 
@@ -64,3 +159,9 @@ def get_db() -> Generator[Session, None, None]:
         session.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    # Read-only routes: nothing to commit, the transaction is rolled back on close
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
@@ -0,0 +1,172 @@
+from dataclasses import dataclass, field
+import re
+
+
+_IMAGE_EXT_RE = re.compile(r"\.(?:jpe?g|png|webp)", re.IGNORECASE)
+MAX_IMAGES = 12
+
+# Every text signal in one pattern so a document is scanned once. It runs over
+# lower-cased text (cheaper than IGNORECASE) and only tries to match at word
+# starts: either "<number> <unit>" or one of the fixed phrases.
+_TEXT_RE = re.compile(
+    r"""\b(?:
+        (?P<num>\d+(?:\.\d+)?)\s*(?P<unit>bedrooms?|beds?|br|bd|bath(?:rooms?)?|ba|months?|years?)\b
+      | (?P<phrase>unfurnished|furnished|no\s+pets|pets\s*not\s*allowed|pets\s*ok|pet\s*friendly
+          |pets\s*allowed|cats\s*ok|dogs\s*ok|month-?to-?month)\b
+    )""",
+    re.VERBOSE,
+)
+_NEGATIVE_PETS_RE = re.compile(r"no\s+pets|pets\s*not\s*allowed")
+
+
+def normalize_price_cents(price: str | int | None) -> int | None:
+    if price is None:
+        return None
+    if isinstance(price, int):
+        return price
+    digits = ''.join(ch for ch in price if ch.isdigit())
+    if not digits:
+        return None
+    return int(digits) * 100 if len(digits) <= 5 else int(digits)
+
+
+@dataclass
+class HeuristicFields:
+    title: str | None = None
+    description: str | None = None
+    price_cents: int | None = None
+    images: list[str] = field(default_factory=list)
+    address: str | None = None
+    canonical_url: str | None = None
+    bedrooms: int | None = None
+    bathrooms: float | None = None
+    furnished: bool | None = None
+    pets_allowed: bool | None = None
+    lease_term: str | None = None
+
+
+class ListingExtractor:
+    """Rule-based extraction from an ingest payload (raw_json + raw_text).
+
+    The default keys are the extension's full raw_json layout, which every
+    payload used before extractors were per source, so unregistered sources
+    lose nothing. Subclasses adjust the keys for their source and register
+    themselves with ``@register_extractor``.
+    """
+
+    title_keys: tuple[str, ...] = ("title",)
+    # Prefer explicit description_text > meta description > fallback
+    description_keys: tuple[str, ...] = ("description_text", "description_meta", "description")
+    price_keys: tuple[str, ...] = ("price",)
+    # Merge all image candidates (DOM imgs + og:image + background + all_images)
+    image_keys: tuple[str, ...] = ("images", "images_meta", "background_images", "all_images")
+    # Prefer explicit location_text if it looks like an address
+    address_keys: tuple[str, ...] = ("address", "location_text")
+    canonical_url_keys: tuple[str, ...] = ("canonical_url",)
+
+    def extract(self, payload: dict) -> HeuristicFields:
+        out = HeuristicFields()
+        j = payload.get("raw_json")
+        if j and isinstance(j, dict):
+            self.extract_json(j, out)
+        rt = payload.get("raw_text")
+        if isinstance(rt, str) and rt:
+            self.extract_text(rt, out)
+        return out
+
+    @staticmethod
+    def _first(j: dict, keys: tuple[str, ...]):
+        for key in keys:
+            value = j.get(key)
+            if value:
+                return value
+        return None
+
+    def extract_json(self, j: dict, out: HeuristicFields) -> None:
+        out.title = self._first(j, self.title_keys)
+        out.description = self._first(j, self.description_keys)
+        out.price_cents = normalize_price_cents(self._first(j, self.price_keys))
+        out.images = self.merge_images(j.get(key) for key in self.image_keys)
+        out.address = self._first(j, self.address_keys)
+        out.canonical_url = self._first(j, self.canonical_url_keys)
+
+    @staticmethod
+    def merge_images(sources) -> list[str]:
+        """Ordered, de-duplicated image URLs with query strings stripped."""
+        seen: set[str] = set()
+        imgs: list[str] = []
+        for arr in sources:
+            if not isinstance(arr, list):
+                continue
+            for u in arr:
+                if not isinstance(u, str) or not u.startswith("http"):
+                    continue
+                clean_url = u.split('?', 1)[0]  # Remove query params
+                if clean_url in seen or not _IMAGE_EXT_RE.search(clean_url):
+                    continue
+                seen.add(clean_url)
+                imgs.append(clean_url)
+                if len(imgs) >= MAX_IMAGES:
+                    return imgs
+        return imgs
+
+    def extract_text(self, text: str, out: HeuristicFields) -> None:
+        lowered = text.lower()
+        # Slice lease terms from the original text unless lower() changed offsets
+        source = text if len(lowered) == len(text) else lowered
+        furnished_seen = pets_ok_seen = False
+        for m in _TEXT_RE.finditer(lowered):
+            unit = m.group("unit")
+            if unit is not None:
+                num = m.group("num")
+                if unit.startswith("ba"):
+                    if out.bathrooms is None:
+                        out.bathrooms = float(num)
+                elif unit[0] == "b":
+                    if out.bedrooms is None and "." not in num:
+                        out.bedrooms = int(num)
+                elif out.lease_term is None:
+                    out.lease_term = source[m.start():m.end()]
+                continue
+            phrase = m.group("phrase")
+            if phrase == "unfurnished":
+                # Negative phrasing wins anywhere in the document
+                out.furnished = False
+            elif phrase == "furnished":
+                furnished_seen = True
+            elif phrase.startswith("month"):
+                if out.lease_term is None:
+                    out.lease_term = source[m.start():m.end()]
+            elif _NEGATIVE_PETS_RE.fullmatch(phrase):
+                out.pets_allowed = False
+            else:
+                pets_ok_seen = True
+            if (
+                out.furnished is False and out.pets_allowed is False and out.bedrooms is not None
+                and out.bathrooms is not None and out.lease_term is not None
+            ):
+                break
+        if out.furnished is None and furnished_seen:
+            out.furnished = True
+        if out.pets_allowed is None and pets_ok_seen:
+            out.pets_allowed = True
+
+
+_REGISTRY: dict[str, ListingExtractor] = {}
+_DEFAULT = ListingExtractor()
+
+
+def register_extractor(source: str):
+    def decorator(cls: type[ListingExtractor]) -> type[ListingExtractor]:
+        _REGISTRY[source] = cls()
+        return cls
+    return decorator
+
+
+def get_extractor(source: str | None) -> ListingExtractor:
+    return _REGISTRY.get(source or "", _DEFAULT)
+
+
+@register_extractor("marketplace")
+class MarketplaceExtractor(ListingExtractor):
+    """Payloads captured by the browser extension from Facebook Marketplace (the default layout)."""
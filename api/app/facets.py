@@ -0,0 +1,339 @@
+"""Facet counts (bedrooms, furnished, pets) and a price histogram for a filter set.
+
+Served from OpenSearch aggregations when the cluster answers. Otherwise they
+come from ``listing_facet_counts``, a small cube of active-listing counts
+keyed by (campus, bedrooms, furnished, pets, clean, price bucket). A trigger on
+``listings`` keeps the cube current in the same transaction as every write.
+Reads are then a GROUP BY over a few thousand cube rows rather than over
+``listings``. ``clean`` flags listings under the default spam threshold
+(``listings_max_spam_score``, or not yet scored), so default requests are
+served from the cube too; other thresholds aggregate ``listings`` directly.
+After changing that setting, run ``rebuild_listing_facet_counts``.
+
+Each facet ignores its own filter so clients can show the alternatives,
+e.g. the bedroom counts under ``bedrooms=2`` still list 1 and 3 bedrooms.
+"""
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.crud import apply_listing_filters
+from app.models import Listing, ListingFacetCount
+from app.opensearch_client import get_opensearch_client
+from app.search_index import LISTINGS_INDEX
+
+
+PRICE_BUCKET_CENTS = 25_000
+PRICE_BUCKETS = 24  # bucket 24 is open-ended: $6,000 and up
+
+_CUBE_FILTERS = {"min_price", "max_price", "bedrooms", "furnished", "campus_id", "max_spam_score"}
+_FACET_FILTERS = {"bedrooms": ("bedrooms",), "furnished": ("furnished",), "price": ("min_price", "max_price")}
+
+
+
+def _clean_flag(row: str) -> str:
+    """SQL for the cube's ``clean`` cell of ``row`` (e.g. ``"l."``): 1 when GET /listings shows it by default."""
+    threshold = settings.listings_max_spam_score
+    if threshold is None:
+        return "1"
+    return f"CASE WHEN {row}spam_score IS NULL OR {row}spam_score <= {float(threshold)!r} THEN 1 ELSE 0 END"
+
+
+# Cubes created before the spam dimension: widen the key and empty the cube so the backfill recounts it
+FACET_COUNTS_UPGRADES: list[str] = [
+    "ALTER TABLE listing_facet_counts ADD COLUMN IF NOT EXISTS clean SMALLINT NOT NULL DEFAULT 1",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (
+            SELECT 1 FROM information_schema.key_column_usage
+            WHERE table_name = 'listing_facet_counts' AND constraint_name = 'listing_facet_counts_pkey'
+              AND column_name = 'clean'
+        ) THEN
+            ALTER TABLE listing_facet_counts DROP CONSTRAINT IF EXISTS listing_facet_counts_pkey;
+            DELETE FROM listing_facet_counts;
+            ALTER TABLE listing_facet_counts
+                ADD PRIMARY KEY (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket);
+        END IF;
+    END
+    $$
+    """,
+]
+
+# Keep the bucket expression in sync with price_bucket() below
+FACET_COUNTS_DDL: list[str] = [
+    f"""
+    CREATE OR REPLACE FUNCTION listing_facet_counts_apply(l listings, delta integer) RETURNS void AS $$
+    BEGIN
+        IF l.status IS DISTINCT FROM 'active' THEN
+            RETURN;
+        END IF;
+        INSERT INTO listing_facet_counts AS c (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket, count)
+        VALUES (
+            COALESCE(l.nearest_campus_id, 0),
+            COALESCE(l.bedrooms, -1),
+            CASE WHEN l.furnished IS NULL THEN -1 WHEN l.furnished THEN 1 ELSE 0 END,
+            CASE WHEN l.pets_allowed IS NULL THEN -1 WHEN l.pets_allowed THEN 1 ELSE 0 END,
+            {_clean_flag("l.")},
+            LEAST(GREATEST(l.price_cents, 0) / {PRICE_BUCKET_CENTS}, {PRICE_BUCKETS}),
+            delta
+        )
+        ON CONFLICT (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket)
+        DO UPDATE SET count = c.count + EXCLUDED.count;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    CREATE OR REPLACE FUNCTION listing_facet_counts_trigger() RETURNS trigger AS $$
+    BEGIN
+        -- Rescoring only matters when it moves a listing across the threshold
+        IF TG_OP = 'UPDATE' AND
+           (OLD.status, OLD.nearest_campus_id, OLD.bedrooms, OLD.furnished, OLD.pets_allowed, OLD.price_cents,
+            {_clean_flag("OLD.")})
+           IS NOT DISTINCT FROM
+           (NEW.status, NEW.nearest_campus_id, NEW.bedrooms, NEW.furnished, NEW.pets_allowed, NEW.price_cents,
+            {_clean_flag("NEW.")}) THEN
+            RETURN NULL;
+        END IF;
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM listing_facet_counts_apply(OLD, -1);
+        END IF;
+        IF TG_OP IN ('UPDATE', 'INSERT') THEN
+            PERFORM listing_facet_counts_apply(NEW, 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE TRIGGER listings_facet_counts
+    AFTER INSERT OR DELETE OR UPDATE OF status, nearest_campus_id, bedrooms, furnished, pets_allowed, price_cents,
+        spam_score
+    ON listings FOR EACH ROW EXECUTE FUNCTION listing_facet_counts_trigger()
+    """,
+]
+
+_REBUILD_SQL = f"""
+INSERT INTO listing_facet_counts (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket, count)
+SELECT
+    COALESCE(nearest_campus_id, 0),
+    COALESCE(bedrooms, -1),
+    CASE WHEN furnished IS NULL THEN -1 WHEN furnished THEN 1 ELSE 0 END,
+    CASE WHEN pets_allowed IS NULL THEN -1 WHEN pets_allowed THEN 1 ELSE 0 END,
+    {_clean_flag("")},
+    LEAST(GREATEST(price_cents, 0) / {PRICE_BUCKET_CENTS}, {PRICE_BUCKETS}),
+    count(*)
+FROM listings
+WHERE status = 'active'
+"""
+_GROUP_BY = "GROUP BY 1, 2, 3, 4, 5, 6"
+
+# Startup backfill for a freshly created cube; runs before the trigger is installed
+FACET_COUNTS_BACKFILL = _REBUILD_SQL + "AND NOT EXISTS (SELECT 1 FROM listing_facet_counts)\n" + _GROUP_BY
+
+
+def price_bucket(price_cents: int | float) -> int:
+    return min(max(int(price_cents), 0) // PRICE_BUCKET_CENTS, PRICE_BUCKETS)
+
+
+def rebuild_facet_counts(db: Session) -> None:
+    """Recompute the cube from listings (backfill / drift repair); runs in the caller's transaction.
+
+    The exclusive lock makes concurrent writers' trigger deltas wait and land
+    on top of the rebuilt counts, so nothing is lost or counted twice.
+    """
+    db.execute(text("LOCK TABLE listing_facet_counts IN EXCLUSIVE MODE"))
+    db.execute(text("DELETE FROM listing_facet_counts"))
+    db.execute(text(_REBUILD_SQL + _GROUP_BY))
+
+
+def _tri_state(value: int) -> bool | None:
+    return None if value < 0 else bool(value)
+
+
+def _shape(source: str, total: int, bedrooms: dict, furnished: dict, pets: dict, prices: dict) -> dict:
+    def listed(counts: dict) -> list[dict]:
+        return [
+            {"value": value, "count": count}
+            for value, count in sorted(counts.items(), key=lambda kv: (kv[0] is None, kv[0]))
+            if count > 0
+        ]
+
+    return {
+        "source": source,
+        "total": total,
+        "bedrooms": listed(bedrooms),
+        "furnished": listed(furnished),
+        "pets_allowed": listed(pets),
+        "price_histogram": [
+            {
+                "min_cents": bucket * PRICE_BUCKET_CENTS,
+                "max_cents": (bucket + 1) * PRICE_BUCKET_CENTS if bucket < PRICE_BUCKETS else None,
+                "count": count,
+            }
+            for bucket, count in sorted(prices.items())
+            if count > 0
+        ],
+    }
+
+
+def _without(filters: dict, facet: str | None) -> dict:
+    skip = _FACET_FILTERS.get(facet, ())
+    return {k: v for k, v in filters.items() if k not in skip}
+
+
+def _counter_facets(db: Session, filters: dict) -> dict:
+    c = ListingFacetCount
+
+    def query(group_by, facet: str | None):
+        f = _without(filters, facet)
+        stmt = select(*group_by, func.coalesce(func.sum(c.count), 0))
+        if f.get("campus_id") is not None:
+            stmt = stmt.where(c.campus_id == f["campus_id"])
+        if f.get("bedrooms") is not None:
+            stmt = stmt.where(c.bedrooms == f["bedrooms"])
+        if f.get("furnished") is not None:
+            stmt = stmt.where(c.furnished == int(f["furnished"]))
+        if f.get("max_spam_score") is not None:
+            # Only the default threshold reaches the cube (see compute_facets)
+            stmt = stmt.where(c.clean == 1)
+        # Price bounds are applied at bucket granularity
+        if f.get("min_price") is not None:
+            stmt = stmt.where(c.price_bucket >= price_bucket(f["min_price"]))
+        if f.get("max_price") is not None:
+            stmt = stmt.where(c.price_bucket <= price_bucket(f["max_price"]))
+        if group_by:
+            stmt = stmt.group_by(*group_by)
+        return db.execute(stmt).all()
+
+    total = query([], None)[0][-1]
+    bedrooms = {(None if b < 0 else b): n for b, n in query([c.bedrooms], "bedrooms")}
+    furnished = {_tri_state(v): n for v, n in query([c.furnished], "furnished")}
+    pets = {_tri_state(v): n for v, n in query([c.pets_allowed], None)}
+    prices = {b: n for b, n in query([c.price_bucket], "price")}
+    return _shape("counters", int(total), bedrooms, furnished, pets, prices)
+
+
+def _sql_facets(db: Session, filters: dict) -> dict:
+    """Aggregate the filtered listings directly.
+
+    Used for spatial filters, which bound the row set, and for the spam threshold,
+    which the cube cannot express.
+    """
+
+    def query(column, facet: str | None):
+        stmt = apply_listing_filters(select(column, func.count()), **_without(filters, facet)).group_by(column)
+        return db.execute(stmt).all()
+
+    bucket = func.least(func.greatest(Listing.price_cents, 0) // PRICE_BUCKET_CENTS, PRICE_BUCKETS)
+    total = db.execute(apply_listing_filters(select(func.count()), **filters)).scalar_one()
+    return _shape(
+        "database",
+        total,
+        dict(query(Listing.bedrooms, "bedrooms")),
+        dict(query(Listing.furnished, "furnished")),
+        dict(query(Listing.pets_allowed, None)),
+        {int(b): n for b, n in query(bucket, "price")},
+    )
+
+
+def _os_filters(filters: dict, facet: str | None) -> list[dict]:
+    f = _without(filters, facet)
+    clauses: list[dict] = []
+    if f.get("min_price") is not None or f.get("max_price") is not None:
+        bounds = {}
+        if f.get("min_price") is not None:
+            bounds["gte"] = f["min_price"]
+        if f.get("max_price") is not None:
+            bounds["lte"] = f["max_price"]
+        clauses.append({"range": {"price_cents": bounds}})
+    if f.get("bedrooms") is not None:
+        clauses.append({"term": {"bedrooms": f["bedrooms"]}})
+    if f.get("furnished") is not None:
+        clauses.append({"term": {"furnished": f["furnished"]}})
+    return clauses
+
+
+def _opensearch_facets(filters: dict) -> dict:
+    base: list[dict] = [{"term": {"status": "active"}}]
+    if filters.get("campus_id") is not None:
+        base.append({"term": {"nearest_campus_id": filters["campus_id"]}})
+        if filters.get("within_km") is not None:
+            base.append({"range": {"campus_distance_km": {"lte": filters["within_km"]}}})
+    if filters.get("bbox") is not None:
+        min_lng, min_lat, max_lng, max_lat = filters["bbox"]
+        base.append({"geo_bounding_box": {"location": {
+            "top_left": {"lat": max_lat, "lon": min_lng},
+            "bottom_right": {"lat": min_lat, "lon": max_lng},
+        }}})
+    if filters.get("near") is not None and filters.get("radius_km") is not None:
+        lat, lng = filters["near"]
+        base.append({"geo_distance": {"distance": f"{filters['radius_km']}km", "location": {"lat": lat, "lon": lng}}})
+    if filters.get("max_spam_score") is not None:
+        # Same semantics as crud.apply_listing_filters: unscored listings stay visible
+        base.append({"bool": {"minimum_should_match": 1, "should": [
+            {"range": {"spam_score": {"lte": filters["max_spam_score"]}}},
+            {"bool": {"must_not": {"exists": {"field": "spam_score"}}}},
+        ]}})
+
+    def scoped(facet: str | None, aggs: dict | None = None) -> dict:
+        agg: dict = {"filter": {"bool": {"filter": _os_filters(filters, facet)}}}
+        if aggs:
+            agg["aggs"] = aggs
+        return agg
+
+    def tri_state(field: str) -> dict:
+        return {"values": {"terms": {"field": field, "size": 2}}, "unknown": {"missing": {"field": field}}}
+
+    body = {
+        "size": 0,
+        "query": {"bool": {"filter": base}},
+        "aggs": {
+            "total": scoped("total"),
+            "bedrooms": scoped("bedrooms", {
+                "values": {"terms": {"field": "bedrooms", "size": 50}},
+                "unknown": {"missing": {"field": "bedrooms"}},
+            }),
+            "furnished": scoped("furnished", tri_state("furnished")),
+            "pets_allowed": scoped(None, tri_state("pets_allowed")),
+            "price": scoped("price", {
+                "values": {"histogram": {"field": "price_cents", "interval": PRICE_BUCKET_CENTS, "min_doc_count": 1}},
+            }),
+        },
+    }
+    resp = get_opensearch_client().search(
+        index=LISTINGS_INDEX, body=body, request_timeout=settings.facets_opensearch_timeout_seconds
+    )
+    aggs = resp["aggregations"]
+
+    def counts(agg: dict, key=lambda k: k) -> dict:
+        out = {key(b["key"]): b["doc_count"] for b in agg["values"]["buckets"]}
+        if "unknown" in agg:
+            out[None] = agg["unknown"]["doc_count"]
+        return out
+
+    prices: dict[int, int] = {}
+    for b in aggs["price"]["values"]["buckets"]:
+        bucket = price_bucket(b["key"])
+        prices[bucket] = prices.get(bucket, 0) + b["doc_count"]
+    return _shape(
+        "opensearch",
+        aggs["total"]["doc_count"],
+        counts(aggs["bedrooms"], int),
+        counts(aggs["furnished"], bool),
+        counts(aggs["pets_allowed"], bool),
+        prices,
+    )
+
+
+def compute_facets(db: Session, **filters) -> dict:
+    filters = {k: v for k, v in filters.items() if v is not None}
+    if settings.facets_use_opensearch:
+        try:
+            return _opensearch_facets(filters)
+        except Exception:
+            # Cluster down or slow: fall back to Postgres
+            pass
+    if set(filters) <= _CUBE_FILTERS and filters.get("max_spam_score") in (None, settings.listings_max_spam_score):
+        return _counter_facets(db, filters)
+    return _sql_facets(db, filters)
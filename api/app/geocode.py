@@ -0,0 +1,123 @@
+import hashlib
+import json
+import re
+import threading
+import unicodedata
+
+import httpx
+
+from app.config import settings
+from app.metrics import CACHE_REQUESTS, observe_step
+from app.redis_client import get_redis
+
+
+_STATS_KEY = "geocode:stats"
+_KEY_PREFIX = "geocode:v1:"
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s#/-]")
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+
+
+def normalize_address(address: str) -> str:
+    text = unicodedata.normalize("NFKC", address).lower()
+    text = _PUNCT_RE.sub(" ", text)
+    return _WS_RE.sub(" ", text).strip()
+
+
+def _cache_key(normalized: str) -> str:
+    return _KEY_PREFIX + hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _http_client() -> httpx.Client:
+    # Shared keep-alive client, created lazily so each forked worker gets its own pool
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = httpx.Client(
+                    timeout=settings.geocode_timeout_seconds,
+                    headers={"User-Agent": settings.geocode_user_agent},
+                    limits=httpx.Limits(max_keepalive_connections=5, max_connections=10),
+                )
+    return _client
+
+
+def _record(field: str) -> None:
+    CACHE_REQUESTS.labels("geocode", field).inc()
+    try:
+        get_redis().hincrby(_STATS_KEY, field, 1)
+    except Exception:
+        pass
+
+
+def _cache_get(key: str) -> tuple[bool, tuple[float | None, float | None]]:
+    try:
+        cached = get_redis().get(key)
+    except Exception:
+        return False, (None, None)
+    if cached is None:
+        return False, (None, None)
+    value = json.loads(cached)
+    if value is None:
+        return True, (None, None)
+    return True, (float(value[0]), float(value[1]))
+
+
+def _cache_set(key: str, coords: tuple[float, float] | None) -> None:
+    ttl = settings.geocode_cache_ttl_seconds if coords else settings.geocode_negative_ttl_seconds
+    try:
+        get_redis().set(key, json.dumps(list(coords) if coords else None), ex=ttl)
+    except Exception:
+        pass
+
+
+def _lookup(address: str) -> tuple[float, float] | None:
+    """Query the upstream geocoder; raises on transport errors so they are not cached."""
+    params = {"q": address, "format": "json", "limit": 1}
+    with observe_step("nominatim"):
+        r = _http_client().get(settings.geocoder_url, params=params)
+    r.raise_for_status()
+    data = r.json()
+    if data:
+        return float(data[0]["lat"]), float(data[0]["lon"])
+    return None
+
+
+def geocode(address: str) -> tuple[float | None, float | None]:
+    normalized = normalize_address(address)
+    if not normalized:
+        return None, None
+    key = _cache_key(normalized)
+    hit, coords = _cache_get(key)
+    if hit:
+        _record("hits" if coords[0] is not None else "negative_hits")
+        return coords
+    _record("misses")
+    try:
+        found = _lookup(address)
+    except Exception:
+        # Upstream failure: do not poison the cache, let the next attempt retry
+        _record("errors")
+        return None, None
+    _cache_set(key, found)
+    return found if found else (None, None)
+
+
+def cache_stats() -> dict:
+    try:
+        raw = get_redis().hgetall(_STATS_KEY)
+    except Exception:
+        return {"available": False}
+    stats = {k.decode(): int(v) for k, v in raw.items()}
+    hits = stats.get("hits", 0) + stats.get("negative_hits", 0)
+    lookups = hits + stats.get("misses", 0)
+    return {
+        "available": True,
+        "hits": stats.get("hits", 0),
+        "negative_hits": stats.get("negative_hits", 0),
+        "misses": stats.get("misses", 0),
+        "errors": stats.get("errors", 0),
+        "hit_rate": round(hits / lookups, 4) if lookups else None,
+    }
@@ -0,0 +1,69 @@
+"""Liveness and readiness checks with short-lived cached results.
+
+Probes can arrive every second from several orchestrators; the dependency
+checks run at most once per ``readiness_cache_ttl_seconds`` per process and
+concurrent probes share the in-flight check.
+"""
+import threading
+import time
+
+from sqlalchemy import text
+
+from app.config import settings
+from app.db import engine
+from app.opensearch_client import get_opensearch_client
+from app.redis_client import get_redis
+
+
+# Serving depends on Postgres; Redis (cache) and OpenSearch (facets) have fallbacks
+REQUIRED = ("database",)
+
+_cached: dict | None = None
+_checked_at = 0.0
+_lock = threading.Lock()
+
+
+def _check_database() -> bool:
+    with engine.connect() as conn:
+        timeout_ms = str(int(settings.readiness_timeout_seconds * 1000))
+        conn.execute(text("SELECT set_config('statement_timeout', :ms, true)"), {"ms": timeout_ms})
+        conn.execute(text("SELECT 1"))
+    return True
+
+
+def _check_redis() -> bool:
+    return bool(get_redis().ping())
+
+
+def _check_opensearch() -> bool:
+    return bool(get_opensearch_client().ping(request_timeout=settings.readiness_timeout_seconds))
+
+
+_CHECKS = {
+    "database": _check_database,
+    "redis": _check_redis,
+    "opensearch": _check_opensearch,
+}
+
+
+def _run_checks() -> dict:
+    results = {}
+    for name, check in _CHECKS.items():
+        try:
+            results[name] = "ok" if check() else "error"
+        except Exception:
+            results[name] = "error"
+    ready = all(results[name] == "ok" for name in REQUIRED)
+    return {"status": "ok" if ready else "error", **results}
+
+
+def readiness() -> dict:
+    global _cached, _checked_at
+    if _cached is not None and time.monotonic() - _checked_at < settings.readiness_cache_ttl_seconds:
+        return _cached
+    with _lock:
+        if _cached is not None and time.monotonic() - _checked_at < settings.readiness_cache_ttl_seconds:
+            return _cached
+        _cached = _run_checks()
+        _checked_at = time.monotonic()
+        return _cached
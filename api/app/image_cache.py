@@ -0,0 +1,124 @@
+from dataclasses import dataclass
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from app.config import settings
+
+
+# Temp files this old belong to a fill that died with its worker; eviction removes them
+_STALE_PART_SECONDS = 3600
+
+@dataclass
+class CachedImage:
+    path: str
+    content_type: str
+    etag: str
+    size: int
+
+
+class ImageDiskCache:
+    """Bounded on-disk LRU cache for proxied images.
+
+    Each entry is a body file plus a small JSON sidecar. Recency is tracked
+    with the body file's mtime (touched on every hit), and eviction removes
+    the least recently used entries once the total size exceeds ``max_bytes``.
+    Every method does blocking file I/O; async callers run them in the threadpool.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_object_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_object_bytes = max_object_bytes
+        self._lock = threading.Lock()
+        self._approx_bytes: int | None = None
+
+    def _paths(self, url: str) -> tuple[str, str]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.root, digest[:2], digest)
+        return base + ".bin", base + ".json"
+
+    def get(self, url: str) -> CachedImage | None:
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            size = os.path.getsize(body_path)
+            os.utime(body_path, None)
+        except (OSError, ValueError):
+            return None
+        return CachedImage(path=body_path, content_type=meta["content_type"], etag=meta["etag"], size=size)
+
+    def open_temp(self) -> tuple[int, str]:
+        os.makedirs(self.root, exist_ok=True)
+        return tempfile.mkstemp(dir=self.root, suffix=".part")
+
+    def commit(self, url: str, temp_path: str, content_type: str, etag: str) -> None:
+        body_path, meta_path = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        size = os.path.getsize(temp_path)
+        with open(meta_path + ".part", "w") as f:
+            json.dump({"content_type": content_type, "etag": etag, "url": url}, f)
+        # Body first, then metadata: a reader only sees an entry once both exist
+        os.replace(temp_path, body_path)
+        os.replace(meta_path + ".part", meta_path)
+        with self._lock:
+            if self._approx_bytes is not None:
+                self._approx_bytes += size
+        self._evict_if_needed()
+
+    def _scan(self) -> list[tuple[float, int, str]]:
+        entries = []
+        stale_before = time.time() - _STALE_PART_SECONDS
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if not name.endswith((".bin", ".part")):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                    if name.endswith(".part"):
+                        if st.st_mtime < stale_before:
+                            os.remove(path)
+                        continue
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _evict_if_needed(self) -> None:
+        with self._lock:
+            if self._approx_bytes is not None and self._approx_bytes <= self.max_bytes:
+                return
+            entries = self._scan()
+            total = sum(size for _, size, _ in entries)
+            if total > self.max_bytes:
+                # Trim to 90% so we do not rescan on every subsequent insert
+                target = int(self.max_bytes * 0.9)
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    for victim in (path, path[: -len(".bin")] + ".json"):
+                        try:
+                            os.remove(victim)
+                        except OSError:
+                            pass
+                    total -= size
+            self._approx_bytes = total
+
+
+_cache: ImageDiskCache | None = None
+
+
+def get_image_cache() -> ImageDiskCache:
+    global _cache
+    if _cache is None:
+        _cache = ImageDiskCache(
+            settings.image_cache_dir,
+            settings.image_cache_max_bytes,
+            settings.image_cache_max_object_bytes,
+        )
+    return _cache
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import io
+import ipaddress
+import socket
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+
+from PIL import Image, ImageOps
+
+from app.blobstore import get_blob_store
+from app.config import settings
+from app.near_dup import dhash
+
+if TYPE_CHECKING:
+    import httpx
+
+
+# Variant name -> max width in pixels
+VARIANTS: dict[str, int] = {"card": 480, "detail": 1280}
+WEBP_QUALITY = 80
+
+
+@dataclass
+class ImageResult:
+    image_id: int
+    checksum: str | None = None
+    width: int | None = None
+    height: int | None = None
+    phash: int | None = None
+    error: str | None = None
+    variants: list[str] = field(default_factory=list)
+
+
+def variant_key(checksum: str, name: str) -> str:
+    return f"variants/{checksum[:2]}/{checksum}/{name}.webp"
+
+
+def variant_urls(checksum: str | None) -> dict[str, str] | None:
+    if not checksum:
+        return None
+    return {name: f"/api/images/variants/{checksum}/{name}" for name in VARIANTS}
+
+
+def render_variants(data: bytes, names=None) -> tuple[int, int, int, dict[str, bytes]]:
+    """Decode once and emit the perceptual hash and resized WebP renditions (``names``, default all); never upscales."""
+    with Image.open(io.BytesIO(data)) as img:
+        img = ImageOps.exif_transpose(img)
+        width, height = img.size
+        phash = dhash(img)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "transparency" in img.info else "RGB")
+        out: dict[str, bytes] = {}
+        for name, max_width in VARIANTS.items():
+            if names is not None and name not in names:
+                continue
+            rendition = img
+            if width > max_width:
+                rendition = img.resize((max_width, max(1, round(height * max_width / width))), Image.LANCZOS)
+            buf = io.BytesIO()
+            rendition.save(buf, format="WEBP", quality=WEBP_QUALITY, method=4)
+            out[name] = buf.getvalue()
+    return width, height, phash, out
+
+
+def _store_variants(image_id: int, data: bytes) -> ImageResult:
+    checksum = hashlib.sha256(data).hexdigest()
+    store = get_blob_store()
+    # Content-addressed: identical bytes across listings are encoded and stored once
+    missing = [name for name in VARIANTS if not store.exists(variant_key(checksum, name))]
+    width, height, phash, rendered = render_variants(data, missing)
+    for name, blob in rendered.items():
+        store.put(variant_key(checksum, name), blob)
+    return ImageResult(
+        image_id=image_id, checksum=checksum, width=width, height=height, phash=phash, variants=list(VARIANTS)
+    )
+
+
+async def _check_public_url(url: "httpx.URL") -> None:
+    """Refuse anything but http(s) to hosts that resolve only to public addresses.
+
+    Listing image URLs come from scraped payloads, so without this the worker
+    could be pointed at internal services or cloud metadata endpoints.
+    """
+    if url.scheme not in ("http", "https") or not url.host:
+        raise ValueError(f"blocked image url: {url}")
+    if settings.image_fetch_allow_private_hosts:
+        return
+    port = url.port or (443 if url.scheme == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(url.host, port, type=socket.SOCK_STREAM)
+    for *_, sockaddr in infos:
+        if not ipaddress.ip_address(sockaddr[0].split("%", 1)[0]).is_global:
+            raise ValueError(f"blocked non-public image host: {url.host}")
+
+
+async def _fetch_capped(client: "httpx.AsyncClient", url: str, max_bytes: int) -> bytes | None:
+    """Download ``url``, or return None as soon as it is known to exceed ``max_bytes``.
+
+    Redirects are followed here rather than by httpx so every hop is checked.
+    """
+    request = client.build_request("GET", url)
+    for _ in range(settings.image_fetch_max_redirects + 1):
+        await _check_public_url(request.url)
+        r = await client.send(request, stream=True)
+        try:
+            if r.next_request is not None:
+                request = r.next_request
+                continue
+            r.raise_for_status()
+            declared = r.headers.get("Content-Length")
+            if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+                return None
+            # Content-Length may be absent or wrong (chunked, compressed); count what actually arrives
+            buf = bytearray()
+            async for chunk in r.aiter_bytes():
+                buf += chunk
+                if len(buf) > max_bytes:
+                    return None
+            return bytes(buf)
+        finally:
+            await r.aclose()
+    raise ValueError("too many redirects")
+
+
+async def _process_one(client: "httpx.AsyncClient", sem: asyncio.Semaphore, image_id: int, url: str) -> ImageResult:
+    async with sem:
+        try:
+            data = await _fetch_capped(client, url, settings.image_fetch_max_bytes)
+            if data is None:
+                return ImageResult(image_id=image_id, error="too_large")
+            # Decoding/encoding is CPU-bound; keep the event loop free for other downloads
+            return await asyncio.to_thread(_store_variants, image_id, data)
+        except Exception as exc:
+            return ImageResult(image_id=image_id, error=str(exc)[:200])
+
+
+async def process_images(images: list[tuple[int, str]]) -> list[ImageResult]:
+    """Fetch each (image_id, url) once with bounded concurrency and build its variants."""
+    # Worker-only; keeps httpx out of the API's import path (routers only need variant_urls)
+    import httpx
+
+    sem = asyncio.Semaphore(max(1, settings.image_fetch_concurrency))
+    async with httpx.AsyncClient(
+        timeout=settings.image_fetch_timeout_seconds,
+        follow_redirects=False,
+        headers={"User-Agent": settings.image_fetch_user_agent},
+    ) as client:
+        return await asyncio.gather(*(_process_one(client, sem, image_id, url) for image_id, url in images))
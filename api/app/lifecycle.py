@@ -0,0 +1,112 @@
+"""Listing lifecycle: stale listings are expired and moved out of the hot table.
+
+``listings`` (and every index on it) only holds the active working set.
+Expired rows are copied, with their images, into ``listings_archive`` as a
+JSONB snapshot and then deleted from ``listings``; cascades clean up images
+and near-duplicate index rows.
+"""
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from sqlalchemy import delete, func, insert, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session
+
+from app.models import Listing, ListingArchive, ListingImage
+from app.search_index import enqueue_listing_change
+
+
+# Re-ingests inside this window do not rewrite last_seen_at
+LAST_SEEN_GRANULARITY = timedelta(hours=1)
+
+
+def touch_last_seen(db: Session, listing_id: int, now: datetime | None = None) -> None:
+    now = now or datetime.utcnow()
+    db.execute(
+        update(Listing)
+        .where(Listing.id == listing_id, Listing.last_seen_at < now - LAST_SEEN_GRANULARITY)
+        .values(last_seen_at=now)
+    )
+
+
+def touch_resubmitted(
+    db: Session, keys: Iterable[tuple[str, str]], now: datetime | None = None
+) -> set[tuple[str, str]]:
+    """Mark the listings behind byte-identical re-submissions as seen.
+
+    ``keys`` are ``(source, source_url)`` pairs whose payload hash is already
+    stored, so ingest skips processing them. Returns the pairs with no live
+    listing but an archived one: those payloads must go through the pipeline
+    again to bring the listing back.
+    """
+    keys = set(keys)
+    if not keys:
+        return set()
+    now = now or datetime.utcnow()
+    listing_key = tuple_(Listing.source, Listing.source_id)
+    db.execute(
+        update(Listing)
+        .where(listing_key.in_(keys), Listing.last_seen_at < now - LAST_SEEN_GRANULARITY)
+        .values(last_seen_at=now)
+        .execution_options(synchronize_session=False)
+    )
+    live = db.execute(select(Listing.source, Listing.source_id).where(listing_key.in_(keys)))
+    missing = keys - {tuple(row) for row in live}
+    if not missing:
+        return set()
+    archived = db.execute(
+        select(ListingArchive.source, ListingArchive.source_id)
+        .where(tuple_(ListingArchive.source, ListingArchive.source_id).in_(missing))
+        .distinct()
+    )
+    return {tuple(row) for row in archived}
+
+
+def archive_stale_listings(db: Session, cutoff: datetime, batch_size: int) -> list[tuple[int, float | None, float | None]]:
+    """Move up to ``batch_size`` listings last seen before ``cutoff`` into the archive.
+
+    Runs in the caller's transaction; rows locked by a concurrent ingest are
+    skipped. Returns ``(id, latitude, longitude)`` of every archived listing.
+    """
+    rows = db.execute(
+        select(Listing.id, Listing.latitude, Listing.longitude)
+        .where(Listing.last_seen_at < cutoff)
+        .order_by(Listing.last_seen_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        return []
+    ids = [row.id for row in rows]
+    listing = Listing.__table__
+    images = (
+        select(func.coalesce(
+            func.jsonb_agg(aggregate_order_by(
+                func.to_jsonb(ListingImage.__table__.table_valued()).op("-")("listing_id"),
+                ListingImage.order_index,
+            )),
+            literal([], type_=ListingArchive.data.type),
+        ))
+        .where(ListingImage.listing_id == listing.c.id)
+        .scalar_subquery()
+    )
+    snapshot = func.to_jsonb(listing.table_valued()).op("||")(func.jsonb_build_object("images", images))
+    db.execute(
+        insert(ListingArchive).from_select(
+            ["id", "source", "source_id", "status", "collected_at", "last_seen_at", "archived_at", "data"],
+            select(
+                listing.c.id,
+                listing.c.source,
+                listing.c.source_id,
+                literal("expired"),
+                listing.c.collected_at,
+                listing.c.last_seen_at,
+                literal(datetime.utcnow()),
+                snapshot,
+            ).where(listing.c.id.in_(ids)),
+        )
+    )
+    db.execute(delete(Listing).where(Listing.id.in_(ids)))
+    for listing_id in ids:
+        enqueue_listing_change(db, listing_id, op="delete")
+    return [tuple(row) for row in rows]
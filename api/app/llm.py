@@ -0,0 +1,153 @@
+from functools import lru_cache
+import hashlib
+import json
+import logging
+import re
+
+from app.config import settings
+from app.metrics import CACHE_REQUESTS, observe_step
+from app.redis_client import get_redis
+
+
+logger = logging.getLogger(__name__)
+
+
+# Bump whenever SYSTEM_PROMPT or build_model_input changes; old cache entries then stop matching
+PROMPT_VERSION = "1"
+_STATS_KEY = "llm_cache:stats"
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+_WS_RE = re.compile(r"[ \t]+")
+
+SYSTEM_PROMPT = (
+    "You are an expert rental listing analyzer. Analyze ALL the provided raw data comprehensively. "
+    "IMPORTANT: Use ALL available data sources (raw_text, raw_html, raw_json) to reconstruct complete information. "
+    "If description appears truncated (ends with '...', 'See more', etc.), use context from raw_text and raw_html to reconstruct the full description. "
+    "\n\nYou MUST return ONLY a valid JSON object (no other text) with these exact keys:\n"
+    "{\n"
+    "  \"title\": \"clean, descriptive title\",\n"
+    "  \"description\": \"original description from listing\",\n"
+    "  \"ai_description\": \"YOUR comprehensive analysis combining all available information about the rental unit, including features, location details, amenities, condition, and insights\",\n"
+    "  \"price\": \"1500\",\n"
+    "  \"currency\": \"CAD\",\n"
+    "  \"bedrooms\": 2,\n"
+    "  \"bathrooms\": 1.5,\n"
+    "  \"furnished\": true,\n"
+    "  \"pets_allowed\": false,\n"
+    "  \"lease_term\": \"12 months\",\n"
+    "  \"address\": \"full address or location\",\n"
+    "  \"availability\": \"availability information\",\n"
+    "  \"images\": [\"array\", \"of\", \"image\", \"URLs\"]\n"
+    "}\n\n"
+    "CRITICAL: Return ONLY the JSON object. No explanations, no markdown, no additional text."
+)
+
+
+@lru_cache(maxsize=1)
+def get_openai_client():
+    # One client (and HTTP connection pool) per worker process; imported lazily, the API never needs it
+    from openai import OpenAI
+
+    return OpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
+
+
+def _clean(value: str) -> str:
+    lines = (_WS_RE.sub(" ", line).strip() for line in value.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def build_model_input(url: str, payload: dict) -> str:
+    """Normalized user message for the model; also the basis of the cache key."""
+    raw_json = payload.get("raw_json")
+    raw_text = payload.get("raw_text")
+    raw_html = payload.get("raw_html")
+    return (
+        f"URL: {url.strip()}\n" +
+        (f"RAW_JSON: {json.dumps(raw_json, sort_keys=True, ensure_ascii=False)}\n" if raw_json else "") +
+        (f"RAW_TEXT (truncated): {_clean(str(raw_text))[:8000]}\n" if raw_text else "") +
+        (f"RAW_HTML (truncated): {str(raw_html).strip()[:2000]}\n" if raw_html else "")
+    )
+
+
+def cache_key(model_input: str, model: str | None = None) -> str:
+    digest = hashlib.sha256(model_input.encode()).hexdigest()
+    return f"llm:v{PROMPT_VERSION}:{model or settings.openai_model}:{digest}"
+
+
+def parse_completion(text: str) -> dict:
+    # Look for JSON in the response
+    json_match = _JSON_RE.search(text)
+    json_text = json_match.group(0) if json_match else text
+    try:
+        data = json.loads(json_text)
+    except json.JSONDecodeError:
+        logger.warning("Model returned unparseable JSON", extra={"snippet": json_text[:200]})
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def record_cache_event(field: str) -> None:
+    CACHE_REQUESTS.labels("llm", field).inc()
+    try:
+        get_redis().hincrby(_STATS_KEY, field, 1)
+    except Exception:
+        pass
+
+
+def cache_get(key: str) -> dict | None:
+    try:
+        cached = get_redis().get(key)
+    except Exception:
+        return None
+    return json.loads(cached) if cached is not None else None
+
+
+def cache_set(key: str, data: dict) -> None:
+    # Unparseable/empty responses are not cached so a retry can do better
+    if not data:
+        return
+    try:
+        get_redis().set(key, json.dumps(data), ex=settings.llm_cache_ttl_seconds)
+    except Exception:
+        pass
+
+
+def extract_listing_data(url: str, payload: dict) -> dict:
+    """Return the model's structured extraction for a payload, served from cache when possible."""
+    model_input = build_model_input(url, payload)
+    key = cache_key(model_input)
+    cached = cache_get(key)
+    if cached is not None:
+        record_cache_event("hits")
+        return cached
+    record_cache_event("misses")
+    with observe_step("openai"):
+        completion = get_openai_client().chat.completions.create(
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": model_input},
+            ],
+            temperature=0.1,
+        )
+    text = completion.choices[0].message.content or "{}"
+    logger.debug("OpenAI response", extra={"snippet": text[:500]})
+    data = parse_completion(text)
+    cache_set(key, data)
+    return data
+
+
+def cache_stats() -> dict:
+    try:
+        raw = get_redis().hgetall(_STATS_KEY)
+    except Exception:
+        return {"available": False}
+    stats = {k.decode(): int(v) for k, v in raw.items()}
+    hits, misses = stats.get("hits", 0), stats.get("misses", 0)
+    return {
+        "available": True,
+        "prompt_version": PROMPT_VERSION,
+        "model": settings.openai_model,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 4) if hits + misses else None,
+    }
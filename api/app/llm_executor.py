@@ -0,0 +1,195 @@
+import asyncio
+import logging
+import threading
+from typing import Any, Hashable
+
+import redis.asyncio as aioredis
+from openai import AsyncOpenAI
+
+from app.config import settings
+from app.llm import SYSTEM_PROMPT, build_model_input, cache_get, cache_key, cache_set, parse_completion, record_cache_event
+from app.metrics import observe_step
+
+
+logger = logging.getLogger(__name__)
+
+
+# Rough provider accounting: ~4 characters per token plus room for the JSON answer
+_CHARS_PER_TOKEN = 4
+_OUTPUT_TOKENS_PER_ITEM = 600
+
+BATCH_INSTRUCTIONS = (
+    "\n\nYou will receive several independent listings, each introduced by a line '### ITEM <n>'. "
+    "Analyze each one separately and return ONLY a JSON object of the form "
+    "{\"items\": [<object for item 0>, <object for item 1>, ...]} with one object per item, in order, "
+    "each using exactly the keys described above."
+)
+
+# Atomically refills and debits a requests bucket and a tokens bucket (both per minute).
+# Returns 0 when granted, otherwise the milliseconds to wait before retrying.
+_TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local wait = 0
+local levels = {}
+for i = 1, 2 do
+  local cap = tonumber(ARGV[(i - 1) * 2 + 1])
+  local want = math.min(cap, tonumber(ARGV[(i - 1) * 2 + 2]))
+  local state = redis.call('HMGET', KEYS[i], 'level', 'ts')
+  local level = tonumber(state[1]) or cap
+  local ts = tonumber(state[2]) or now
+  level = math.min(cap, level + (now - ts) * cap / 60000)
+  levels[i] = {level, want}
+  if level < want then
+    wait = math.max(wait, math.ceil((want - level) * 60000 / cap))
+  end
+end
+for i = 1, 2 do
+  local level = levels[i][1]
+  if wait == 0 then level = level - levels[i][2] end
+  redis.call('HSET', KEYS[i], 'level', level, 'ts', now)
+  redis.call('PEXPIRE', KEYS[i], 120000)
+end
+return wait
+"""
+
+
+class RateLimiter:
+    """Cluster-wide requests-per-minute and tokens-per-minute limiter kept in Redis."""
+
+    def __init__(self, client: aioredis.Redis, rpm: int, tpm: int, prefix: str = "llm:ratelimit"):
+        self._client = client
+        self._script = client.register_script(_TOKEN_BUCKET_LUA)
+        self._keys = [f"{prefix}:requests", f"{prefix}:tokens"]
+        self.rpm = rpm
+        self.tpm = tpm
+
+    async def acquire(self, tokens: int) -> None:
+        while True:
+            try:
+                wait_ms = int(await self._script(keys=self._keys, args=[self.rpm, 1, self.tpm, tokens]))
+            except Exception:
+                # Limiter unavailable: proceed rather than stall ingestion; the provider still enforces quotas
+                return
+            if wait_ms <= 0:
+                return
+            await asyncio.sleep(wait_ms / 1000.0)
+
+
+def _estimate_tokens(text: str, items: int = 1) -> int:
+    return (len(SYSTEM_PROMPT) + len(text)) // _CHARS_PER_TOKEN + _OUTPUT_TOKENS_PER_ITEM * items
+
+
+class ExtractionExecutor:
+    """Runs many extractions concurrently on one AsyncOpenAI client.
+
+    Small inputs are packed into one multi-item request; every result is
+    cached under its single-item key so later lookups do not care how it
+    was produced.
+    """
+
+    def __init__(self) -> None:
+        self._client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            max_retries=3,
+        )
+        self._redis = aioredis.Redis.from_url(settings.redis_url)
+        self._limiter = RateLimiter(self._redis, settings.llm_requests_per_minute, settings.llm_tokens_per_minute)
+        self._sem = asyncio.Semaphore(max(1, settings.llm_concurrency))
+
+    async def _complete(self, user_content: str, system_prompt: str, tokens: int) -> str:
+        async with self._sem:
+            await self._limiter.acquire(tokens)
+            with observe_step("openai"):
+                completion = await self._client.chat.completions.create(
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_content},
+                    ],
+                    temperature=0.1,
+                )
+        return completion.choices[0].message.content or "{}"
+
+    async def _extract_single(self, model_input: str) -> dict:
+        text = await self._complete(model_input, SYSTEM_PROMPT, _estimate_tokens(model_input))
+        return parse_completion(text)
+
+    async def _extract_group(self, inputs: list[str]) -> list[dict]:
+        if len(inputs) == 1:
+            return [await self._extract_single(inputs[0])]
+        content = "".join(f"### ITEM {i}\n{text}\n" for i, text in enumerate(inputs))
+        text = await self._complete(content, SYSTEM_PROMPT + BATCH_INSTRUCTIONS, _estimate_tokens(content, len(inputs)))
+        items = parse_completion(text).get("items")
+        if isinstance(items, list) and len(items) == len(inputs) and all(isinstance(i, dict) for i in items):
+            return items
+        # The model did not keep the batch shape; fall back to one request per item
+        return list(await asyncio.gather(*(self._extract_single(t) for t in inputs)))
+
+    def _plan(self, inputs: list[str]) -> list[list[int]]:
+        """Group indexes of small inputs into micro-batches; large inputs go alone."""
+        groups: list[list[int]] = []
+        current: list[int] = []
+        for idx, text in enumerate(inputs):
+            if len(text) > settings.llm_microbatch_max_chars or settings.llm_microbatch_size <= 1:
+                groups.append([idx])
+                continue
+            current.append(idx)
+            if len(current) >= settings.llm_microbatch_size:
+                groups.append(current)
+                current = []
+        if current:
+            groups.append(current)
+        return groups
+
+    async def extract_many(self, items: list[tuple[Hashable, str, dict]]) -> dict[Hashable, dict]:
+        """Extract ``(key, url, payload)`` items; failed extractions map to an empty dict."""
+        results: dict[Hashable, dict] = {}
+        pending_keys: list[Hashable] = []
+        pending_inputs: list[str] = []
+        for key, url, payload in items:
+            model_input = build_model_input(url, payload)
+            cached = cache_get(cache_key(model_input))
+            if cached is not None:
+                record_cache_event("hits")
+                results[key] = cached
+            else:
+                record_cache_event("misses")
+                pending_keys.append(key)
+                pending_inputs.append(model_input)
+
+        async def run_group(indexes: list[int]) -> None:
+            inputs = [pending_inputs[i] for i in indexes]
+            try:
+                extracted = await self._extract_group(inputs)
+            except Exception as exc:
+                logger.warning("OpenAI extraction failed", extra={"items": len(inputs), "error": str(exc)})
+                extracted = [{} for _ in inputs]
+            for i, data in zip(indexes, extracted):
+                cache_set(cache_key(pending_inputs[i]), data)
+                results[pending_keys[i]] = data
+
+        await asyncio.gather(*(run_group(g) for g in self._plan(pending_inputs)))
+        return results
+
+
+_loop: asyncio.AbstractEventLoop | None = None
+_executor: ExtractionExecutor | None = None
+_loop_lock = threading.Lock()
+
+
+def run_extractions(items: list[tuple[Hashable, str, dict]]) -> dict[Hashable, Any]:
+    """Synchronous entry point for Celery tasks.
+
+    Keeps one event loop and executor per worker process so the async HTTP
+    connection pool survives across tasks.
+    """
+    global _loop, _executor
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+        if _executor is None:
+            asyncio.set_event_loop(_loop)
+            _executor = ExtractionExecutor()
+        return _loop.run_until_complete(_executor.extract_many(items))
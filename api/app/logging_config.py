@@ -0,0 +1,22 @@
+import logging
+
+from pythonjsonlogger import jsonlogger
+
+from app.config import settings
+
+
+def configure_logging() -> None:
+    """Route all loggers (app, uvicorn, celery) to stdout as one JSON object per line."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(jsonlogger.JsonFormatter(
+        "%(asctime)s %(levelname)s %(name)s %(message)s",
+        rename_fields={"asctime": "time", "levelname": "level", "name": "logger"},
+    ))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(settings.log_level.upper())
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access", "celery"):
+        logging.getLogger(name).handlers[:] = []
+        logging.getLogger(name).propagate = True
+    # opensearch-py logs every failed request with a traceback; callers already handle failures
+    logging.getLogger("opensearch").setLevel(logging.ERROR)
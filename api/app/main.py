@@ -1,19 +1,25 @@
-from fastapi import Depends, FastAPI
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse
+import importlib
 import threading
+import time
 
-from app.db import get_db, init_database
-from app.opensearch_client import get_opensearch_client, ensure_index
-from app.tasks import celery_app as _celery
+from app.config import settings
+from app.db import async_engine, engine
+from app.health import readiness
+from app.logging_config import configure_logging
+from app.metrics import HTTP_REQUEST_SECONDS, PoolCollector, metrics_registry, render_metrics
 from app.routers import listings as listings_router
 from app.routers import ingest as ingest_router
 from app.routers import images as images_router
-from app.db import SessionLocal
-from app.seed import seed_if_empty
+from app.routers import map as map_router
 
 
-app = FastAPI(title="Roof API", version="0.1.0")
+configure_logging()
+metrics_registry().register(PoolCollector({"sync": engine, "async": async_engine.sync_engine}))
+
+app = FastAPI(title="Roof API", version="0.1.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,63 +27,73 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
-def _background_bootstrap() -> None:
-    init_database()
-    try:
-        ensure_index(
-            index_name="listings",
-            mappings={
-                "properties": {
-                    "title": {"type": "text"},
-                    "description": {"type": "text"},
-                    "price_cents": {"type": "long"},
-                    "bedrooms": {"type": "integer"},
-                    "bathrooms": {"type": "float"},
-                    "furnished": {"type": "boolean"},
-                    "pets_allowed": {"type": "boolean"},
-                    "lease_term": {"type": "keyword"},
-                    "posted_at": {"type": "date"},
-                    "location": {"type": "geo_point"},
-                }
-            },
-        )
-    except Exception:
-        pass
-    # seed
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
     try:
-        with SessionLocal() as session:
-            seed_if_empty(session)
-    except Exception:
-        pass
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template (/api/listings/{listing_id}), never the raw path
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status)
+        ).observe(time.perf_counter() - start)
+
+
+def _warm_up() -> None:
+    if settings.bootstrap_on_startup:
+        from app.bootstrap import bootstrap
+
+        bootstrap()
+    # Load the Celery app (and openai) off the request path before the first ingest needs it
+    importlib.import_module("app.tasks")
 
 
 @app.on_event("startup")
 def on_startup() -> None:
-    threading.Thread(target=_background_bootstrap, daemon=True).start()
+    threading.Thread(target=_warm_up, daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await images_router.close_http_client()
+
+
+@app.get("/live")
+def live() -> dict:
+    # Process is up and serving; no dependency checks
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready(response: Response) -> dict:
+    result = readiness()
+    if result["status"] != "ok":
+        response.status_code = 503
+    return result
 
 
 @app.get("/health")
-def health(db: Session = Depends(get_db)) -> dict:
-    # Pings OpenSearch
-    try:
-        client = get_opensearch_client()
-        client.info()
-        search_ok = True
-    except Exception:
-        search_ok = False
+def health() -> dict:
+    return readiness()
+
 
-    return {
-        "status": "ok",
-        "database": "ok",
-        "opensearch": "ok" if search_ok else "error",
-    }
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
 
 
 app.include_router(listings_router.router, prefix="/api", tags=["listings"])
 app.include_router(ingest_router.router, prefix="/api", tags=["ingest"])
 app.include_router(images_router.router, prefix="/api/images", tags=["images"])
+app.include_router(map_router.router, prefix="/api", tags=["map"])
 
 
@@ -0,0 +1,115 @@
+"""Server-side clustering of active listings into web-mercator map tiles.
+
+Each ``z/x/y`` tile is split into a ``grid x grid`` set of cells; every
+non-empty cell becomes one cluster with a count, a centroid and price stats.
+Tiles are cached individually and invalidated per tile: when a listing
+changes, the tile containing it is bumped at every cached zoom level. The
+per-tile version keys expire a while after the tiles they guard, so Redis
+doesn't keep one key per tile ever touched. Like GET /api/listings, tiles
+leave out listings scored above ``listings_max_spam_score``.
+"""
+import math
+from typing import Iterable
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.cache import invalidate_scopes, read_through
+from app.config import settings
+
+
+MAX_ZOOM = 22
+
+_CLUSTERS_SQL = text("""
+WITH bounds AS (
+    SELECT ST_TileEnvelope(:z, :x, :y) AS env
+), cells AS (
+    SELECT
+        l.id,
+        l.price_cents,
+        l.latitude,
+        l.longitude,
+        LEAST(:grid - 1, floor((ST_X(p.g) - ST_XMin(b.env)) / (ST_XMax(b.env) - ST_XMin(b.env)) * :grid))::int AS cx,
+        LEAST(:grid - 1, floor((ST_YMax(b.env) - ST_Y(p.g)) / (ST_YMax(b.env) - ST_YMin(b.env)) * :grid))::int AS cy
+    FROM listings l
+    CROSS JOIN bounds b
+    CROSS JOIN LATERAL (SELECT ST_Transform(l.geog::geometry, 3857) AS g) p
+    WHERE l.status = 'active'
+      AND (CAST(:max_spam_score AS double precision) IS NULL
+           OR l.spam_score IS NULL OR l.spam_score <= :max_spam_score)
+      AND l.geog && ST_Transform(b.env, 4326)::geography
+      AND ST_Intersects(p.g, b.env)
+)
+SELECT
+    cx,
+    cy,
+    count(*) AS count,
+    avg(latitude) AS lat,
+    avg(longitude) AS lng,
+    min(price_cents) AS price_min,
+    max(price_cents) AS price_max,
+    round(avg(price_cents))::bigint AS price_avg,
+    percentile_disc(0.5) WITHIN GROUP (ORDER BY price_cents) AS price_median,
+    min(id) AS listing_id
+FROM cells
+GROUP BY cx, cy
+ORDER BY cy, cx
+""")
+
+
+def tile_for_point(lat: float, lng: float, z: int) -> tuple[int, int]:
+    n = 1 << z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_scope(z: int, x: int, y: int) -> str:
+    return f"tile:{z}/{x}/{y}"
+
+
+def invalidate_tiles(points: Iterable[tuple[float | None, float | None]]) -> None:
+    """Invalidate the cached tiles containing any of ``(lat, lng)`` at every cached zoom."""
+    scopes = set()
+    for lat, lng in points:
+        if lat is None or lng is None:
+            continue
+        for z in range(settings.map_tile_max_cached_zoom + 1):
+            scopes.add(tile_scope(z, *tile_for_point(lat, lng, z)))
+    if scopes:
+        invalidate_scopes(scopes, ttl=2 * settings.map_tile_cache_ttl_seconds)
+
+
+def tile_clusters(db: Session, z: int, x: int, y: int, grid: int) -> list[dict]:
+    params = {"z": z, "x": x, "y": y, "grid": grid, "max_spam_score": settings.listings_max_spam_score}
+    rows = db.execute(_CLUSTERS_SQL, params).mappings().all()
+    clusters = []
+    for row in rows:
+        cluster = {
+            "lat": row["lat"],
+            "lng": row["lng"],
+            "count": row["count"],
+            "price_min": row["price_min"],
+            "price_max": row["price_max"],
+            "price_avg": row["price_avg"],
+            "price_median": row["price_median"],
+        }
+        if row["count"] == 1:
+            cluster["listing_id"] = row["listing_id"]
+        clusters.append(cluster)
+    return clusters
+
+
+def get_tile(db: Session, z: int, x: int, y: int) -> bytes:
+    grid = settings.map_tile_grid_size
+
+    def load() -> bytes:
+        return orjson.dumps({"z": z, "x": x, "y": y, "grid": grid, "clusters": tile_clusters(db, z, x, y, grid)})
+
+    if z > settings.map_tile_max_cached_zoom:
+        return load()
+    key = f"grid{grid}:spam{settings.listings_max_spam_score}"
+    return read_through(key, load, ttl=settings.map_tile_cache_ttl_seconds, scope=tile_scope(z, x, y))
@@ -0,0 +1,140 @@
+"""Prometheus metrics shared by the API and the Celery workers.
+
+The API serves them on ``/metrics``; each worker serves its own registry on
+``settings.worker_metrics_port``. When ``PROMETHEUS_MULTIPROC_DIR`` is set
+(prefork workers, multi-process uvicorn) samples from every child process
+are aggregated through prometheus_client's multiprocess mode.
+"""
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+_SLOW_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "roof_http_request_duration_seconds",
+    "API request latency by route template",
+    ["method", "route", "status"],
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "roof_db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool",
+    ["pool"],
+    buckets=_FAST_BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "roof_redis_command_duration_seconds",
+    "Redis round-trip time by command",
+    ["command"],
+    buckets=_FAST_BUCKETS,
+)
+OPENSEARCH_REQUEST_SECONDS = Histogram(
+    "roof_opensearch_request_duration_seconds",
+    "OpenSearch request time by endpoint",
+    ["method", "endpoint"],
+)
+TASK_SECONDS = Histogram(
+    "roof_task_duration_seconds",
+    "Celery task run time (one series per pipeline stage)",
+    ["task", "state"],
+    buckets=_SLOW_BUCKETS,
+)
+PIPELINE_STEP_SECONDS = Histogram(
+    "roof_pipeline_step_duration_seconds",
+    "Time spent in each step of payload processing (OpenAI, geocoder, DB, campus lookup, ...)",
+    ["step"],
+    buckets=_SLOW_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "roof_cache_requests_total",
+    "Cache lookups by cache and outcome",
+    ["cache", "result"],
+)
+
+_registry: CollectorRegistry | None = None
+
+
+def metrics_registry() -> CollectorRegistry:
+    global _registry
+    if _registry is None:
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            _registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(_registry)
+        else:
+            _registry = REGISTRY
+    return _registry
+
+
+def render_metrics() -> tuple[bytes, str]:
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def observe_step(step: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PIPELINE_STEP_SECONDS.labels(step).observe(time.perf_counter() - start)
+
+
+class PoolCollector:
+    """Live size/usage of SQLAlchemy QueuePools, read at scrape time."""
+
+    def __init__(self, engines: dict) -> None:
+        self._engines = engines
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        families = {
+            "size": GaugeMetricFamily("roof_db_pool_size", "Configured pool size", labels=["pool"]),
+            "checked_out": GaugeMetricFamily("roof_db_pool_checked_out", "Connections currently checked out", labels=["pool"]),
+            "overflow": GaugeMetricFamily("roof_db_pool_overflow", "Connections opened beyond pool_size", labels=["pool"]),
+        }
+        for label, engine in self._engines.items():
+            pool = engine.pool
+            families["size"].add_metric([label], pool.size())
+            families["checked_out"].add_metric([label], pool.checkedout())
+            families["overflow"].add_metric([label], max(pool.overflow(), 0))
+        yield from families.values()
+
+
+class QueueDepthCollector:
+    """Messages waiting in each Celery queue (Redis broker lists), read at scrape time."""
+
+    def __init__(self, redis_factory: Callable, queues: Iterable[str]) -> None:
+        self._redis_factory = redis_factory
+        self._queues = sorted(set(queues))
+
+    def describe(self):
+        # Keeps registration from calling collect() (and Redis) at import time
+        return []
+
+    def collect(self):
+        family = GaugeMetricFamily("roof_celery_queue_depth", "Messages waiting per Celery queue", labels=["queue"])
+        try:
+            pipe = self._redis_factory().pipeline(transaction=False)
+            for queue in self._queues:
+                pipe.llen(queue)
+            depths = pipe.execute()
+        except Exception:
+            return
+        for queue, depth in zip(self._queues, depths):
+            family.add_metric([queue], depth)
+        yield family
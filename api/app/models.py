@@ -1,15 +1,40 @@
 from datetime import datetime
 
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text
+from sqlalchemy import (
+    BigInteger, Boolean, Column, Computed, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, SmallInteger, String, Text,
+)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
+from sqlalchemy.types import UserDefinedType
 
 
 class Base(DeclarativeBase):
     pass
 
 
+class Geography(UserDefinedType):
+    """PostGIS ``geography``, optionally constrained (e.g. ``Geography("Point")``); only used inside SQL."""
+
+    cache_ok = True
+
+    def __init__(self, geometry_type: str | None = None, srid: int = 4326):
+        self.geometry_type = geometry_type
+        self.srid = srid
+
+    def get_col_spec(self, **kw) -> str:
+        if self.geometry_type is None:
+            return "geography"
+        return f"geography({self.geometry_type}, {self.srid})"
+
+
+# Keep in sync with the ALTER TABLE in app.db.SCHEMA_UPGRADES
+LISTING_GEOG_EXPRESSION = (
+    "CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL "
+    "THEN ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography END"
+)
+
+
 class Listing(Base):
     __tablename__ = "listings"
 
@@ -33,10 +58,25 @@ class Listing(Base):
     longitude: Mapped[float | None] = mapped_column(Float, index=True)
     posted_at: Mapped[datetime | None]
     collected_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    last_seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     status: Mapped[str] = mapped_column(String(32), default="active", index=True)
     dedup_key: Mapped[str | None] = mapped_column(String(256), index=True)
     spam_score: Mapped[float | None] = mapped_column(Float, index=True)
     attributes: Mapped[dict | None] = mapped_column(JSONB, default=dict)
+    nearest_campus_id: Mapped[int | None] = mapped_column(ForeignKey("campuses.id", ondelete="SET NULL"))
+    campus_distance_km: Mapped[float | None] = mapped_column(Float, index=True)
+    # Generated from latitude/longitude; GiST-indexed for radius, bbox and KNN queries
+    geog = mapped_column(Geography("Point"), Computed(LISTING_GEOG_EXPRESSION, persisted=True), deferred=True)
+    cluster_id: Mapped[int | None] = mapped_column(Integer, index=True)  # canonical listing id for near-duplicates
+
+    images = relationship("ListingImage", back_populates="listing", order_by="ListingImage.order_index")
+
+    __table_args__ = (
+        Index("ix_listings_campus_distance", "nearest_campus_id", "campus_distance_km"),
+        Index("ix_listings_collected_at_id", "collected_at", "id"),
+        Index("uq_listings_source_source_id", "source", "source_id", unique=True),
+        Index("ix_listings_geog", "geog", postgresql_using="gist"),
+    )
 
 
 class ListingImage(Base):
@@ -49,8 +89,9 @@ class ListingImage(Base):
     width: Mapped[int | None] = mapped_column(Integer)
     height: Mapped[int | None] = mapped_column(Integer)
     order_index: Mapped[int] = mapped_column(Integer, default=0)
+    phash: Mapped[int | None] = mapped_column(BigInteger)  # 64-bit dHash, signed
 
-    listing = relationship("Listing", backref="images")
+    listing = relationship("Listing", back_populates="images")
 
 
 class Campus(Base):
@@ -64,13 +105,99 @@ class Campus(Base):
 
 
 class RawPayload(Base):
+    """Raw ingest payloads, RANGE-partitioned by month on created_at (see app.raw_partitions)."""
+
     __tablename__ = "raw_payloads"
 
-    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     source: Mapped[str] = mapped_column(String(64), index=True)
     url: Mapped[str | None] = mapped_column(String(1024))
-    payload: Mapped[dict] = mapped_column(JSONB)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    payload: Mapped[dict | None] = mapped_column(JSONB(none_as_null=True))  # legacy rows only
+    payload_zstd: Mapped[bytes | None] = mapped_column(LargeBinary)  # zstd-compressed JSON (app.payloads)
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, primary_key=True, index=True)
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (created_at)"}
+
+
+class ListingOutbox(Base):
+    """Pending search-index changes, written in the same transaction as the listing."""
+
+    __tablename__ = "listing_outbox"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    listing_id: Mapped[int] = mapped_column(Integer, index=True)
+    op: Mapped[str] = mapped_column(String(16), default="upsert")
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    available_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    last_error: Mapped[str | None] = mapped_column(Text())
+
+
+class ListingTextSignature(Base):
+    """MinHash signature of a listing's title + description (see app.near_dup)."""
+
+    __tablename__ = "listing_text_signatures"
+
+    listing_id: Mapped[int] = mapped_column(ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True)
+    minhash: Mapped[bytes] = mapped_column(LargeBinary)
+
+
+class ListingLshBand(Base):
+    """LSH band buckets; listings sharing a (band, bucket) are near-duplicate candidates."""
+
+    __tablename__ = "listing_lsh_bands"
+
+    listing_id: Mapped[int] = mapped_column(ForeignKey("listings.id", ondelete="CASCADE"), primary_key=True)
+    band: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    bucket: Mapped[int] = mapped_column(BigInteger)
+
+    __table_args__ = (Index("ix_listing_lsh_bands_bucket", "band", "bucket"),)
+
+
+class ImageHashChunk(Base):
+    """Multi-index hashing table: one row per 16-bit chunk of an image's perceptual hash."""
+
+    __tablename__ = "image_hash_chunks"
+
+    image_id: Mapped[int] = mapped_column(ForeignKey("listing_images.id", ondelete="CASCADE"), primary_key=True)
+    chunk: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    value: Mapped[int] = mapped_column(Integer)
+    listing_id: Mapped[int] = mapped_column(Integer, index=True)
+    phash: Mapped[int] = mapped_column(BigInteger)
+
+    __table_args__ = (Index("ix_image_hash_chunks_value", "chunk", "value"),)
+
+
+class ListingArchive(Base):
+    """Expired listings moved out of the hot table (see app.lifecycle); ``data`` is a row + images snapshot."""
+
+    __tablename__ = "listings_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    source: Mapped[str] = mapped_column(String(64))
+    source_id: Mapped[str] = mapped_column(String(128))
+    status: Mapped[str] = mapped_column(String(32), default="expired")
+    collected_at: Mapped[datetime | None] = mapped_column(DateTime)
+    last_seen_at: Mapped[datetime | None] = mapped_column(DateTime)
+    archived_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    data: Mapped[dict] = mapped_column(JSONB)
+
+    __table_args__ = (Index("ix_listings_archive_source_source_id", "source", "source_id"),)
+
+
+class ListingFacetCount(Base):
+    """Active-listing counts per facet cell, maintained by a trigger on listings (see app.facets).
 
+    Unknown values are stored as 0 (campus) or -1 (bedrooms, furnished, pets_allowed).
+    """
 
+    __tablename__ = "listing_facet_counts"
 
+    campus_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    bedrooms: Mapped[int] = mapped_column(Integer, primary_key=True)
+    furnished: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    pets_allowed: Mapped[int] = mapped_column(SmallInteger, primary_key=True)
+    clean: Mapped[int] = mapped_column(SmallInteger, primary_key=True, default=1)  # 1: under the default spam threshold
+    price_bucket: Mapped[int] = mapped_column(Integer, primary_key=True)
+    count: Mapped[int] = mapped_column(BigInteger, default=0)
@@ -0,0 +1,202 @@
+"""Near-duplicate detection for listings.
+
+Text: MinHash signatures over word shingles of title + description, indexed
+with LSH banding in ``listing_lsh_bands`` so candidates come from an index
+lookup rather than a scan. Candidates are verified against their stored
+signature.
+
+Images: 64-bit difference hashes (dHash) indexed with multi-index hashing
+in ``image_hash_chunks``. The hash is split into 4 x 16-bit chunks, so
+any two hashes within Hamming distance 3 share at least one exact chunk.
+"""
+import hashlib
+import random
+import re
+import struct
+
+from PIL import Image
+from sqlalchemy import BigInteger, Text, cast, delete, func, or_, select, tuple_
+from sqlalchemy.dialects.postgresql import BIT
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import ImageHashChunk, Listing, ListingLshBand, ListingTextSignature
+
+
+NUM_PERM = 64
+BANDS = 16
+ROWS_PER_BAND = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MIN_WORDS = 8
+PHASH_CHUNKS = 4
+PHASH_CHUNK_BITS = 64 // PHASH_CHUNKS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MASK_32 = (1 << 32) - 1
+_rng = random.Random(1337)  # fixed seed: signatures must be stable across processes and deploys
+_PERMS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(NUM_PERM)]
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _to_signed64(value: int) -> int:
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def shingles(text: str) -> set[int]:
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < MIN_WORDS:
+        return set()
+    return {
+        int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_SIZE]).encode(), digest_size=8).digest(), "big")
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def text_signature(title: str | None, description: str | None) -> list[int] | None:
+    """MinHash signature of a listing's text, or None when there is too little text to judge."""
+    hashed = shingles(f"{title or ''} {description or ''}")
+    if not hashed:
+        return None
+    signature = []
+    for a, b in _PERMS:
+        signature.append(min((a * h + b) % _MERSENNE_PRIME for h in hashed) & _MASK_32)
+    return signature
+
+
+def _band_buckets(signature: list[int]) -> list[tuple[int, int]]:
+    buckets = []
+    for band in range(BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        digest = hashlib.blake2b(struct.pack(f">{ROWS_PER_BAND}I", *rows), digest_size=8).digest()
+        buckets.append((band, _to_signed64(int.from_bytes(digest, "big"))))
+    return buckets
+
+
+def _pack(signature: list[int]) -> bytes:
+    return struct.pack(f">{NUM_PERM}I", *signature)
+
+
+def _unpack(blob: bytes) -> tuple[int, ...]:
+    return struct.unpack(f">{NUM_PERM}I", blob)
+
+
+def estimated_jaccard(a, b) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def find_text_duplicate(db: Session, signature: list[int], bedrooms: int | None = None) -> int | None:
+    """Return the id of an active listing whose text is a near-duplicate of ``signature``."""
+    buckets = _band_buckets(signature)
+    candidates = db.execute(
+        select(ListingLshBand.listing_id, func.count().label("hits"))
+        .where(tuple_(ListingLshBand.band, ListingLshBand.bucket).in_(buckets))
+        .group_by(ListingLshBand.listing_id)
+        .order_by(func.count().desc())
+        .limit(settings.near_dup_max_candidates)
+    ).all()
+    if not candidates:
+        return None
+    rows = db.execute(
+        select(ListingTextSignature.listing_id, ListingTextSignature.minhash, Listing.bedrooms)
+        .join(Listing, Listing.id == ListingTextSignature.listing_id)
+        .where(
+            ListingTextSignature.listing_id.in_([c.listing_id for c in candidates]),
+            Listing.status == "active",
+        )
+    ).all()
+    best_id, best_score = None, 0.0
+    for listing_id, blob, candidate_bedrooms in rows:
+        # Same text but a different unit size is a different listing (e.g. multi-unit buildings)
+        if bedrooms is not None and candidate_bedrooms is not None and bedrooms != candidate_bedrooms:
+            continue
+        score = estimated_jaccard(signature, _unpack(blob))
+        if score >= settings.near_dup_text_threshold and score > best_score:
+            best_id, best_score = listing_id, score
+    return best_id
+
+
+def index_text_signature(db: Session, listing_id: int, signature: list[int]) -> None:
+    db.execute(delete(ListingLshBand).where(ListingLshBand.listing_id == listing_id))
+    db.execute(delete(ListingTextSignature).where(ListingTextSignature.listing_id == listing_id))
+    db.add(ListingTextSignature(listing_id=listing_id, minhash=_pack(signature)))
+    db.add_all(
+        ListingLshBand(listing_id=listing_id, band=band, bucket=bucket)
+        for band, bucket in _band_buckets(signature)
+    )
+
+
+def dhash(img: Image.Image) -> int:
+    """64-bit difference hash (signed, to fit a BIGINT column)."""
+    small = img.convert("L").resize((9, 8), Image.BILINEAR)
+    pixels = list(small.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (1 if left > right else 0)
+    return _to_signed64(value)
+
+
+def is_distinctive(phash: int) -> bool:
+    """Near-uniform images (blank, gradients, placeholders) hash to almost all 0s or 1s and match everything."""
+    bits = hamming(phash, 0)
+    return 8 <= bits <= 56
+
+
+def _chunks(phash: int) -> list[tuple[int, int]]:
+    unsigned = phash & ((1 << 64) - 1)
+    mask = (1 << PHASH_CHUNK_BITS) - 1
+    return [(i, (unsigned >> (i * PHASH_CHUNK_BITS)) & mask) for i in range(PHASH_CHUNKS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << 64) - 1)).count("1")
+
+
+def index_image_hashes(db: Session, listing_id: int, hashes: list[tuple[int, int]]) -> None:
+    """Store multi-index chunks for ``(image_id, phash)`` pairs of a listing."""
+    image_ids = [image_id for image_id, _ in hashes]
+    if not image_ids:
+        return
+    db.execute(delete(ImageHashChunk).where(ImageHashChunk.image_id.in_(image_ids)))
+    db.add_all(
+        ImageHashChunk(image_id=image_id, listing_id=listing_id, chunk=chunk, value=value, phash=phash)
+        for image_id, phash in hashes
+        if is_distinctive(phash)
+        for chunk, value in _chunks(phash)
+    )
+
+
+def _hamming_sql(column, phash: int):
+    # popcount of (a XOR b): the 64-bit string form of the XOR with its zeros removed
+    xor = column.op("#", return_type=BigInteger)(phash)
+    return func.length(func.replace(cast(cast(xor, BIT(64)), Text), "0", ""))
+
+
+def find_image_duplicate(db: Session, listing_id: int, phashes: list[int]) -> int | None:
+    """Return another active listing sharing a perceptually identical image, if any."""
+    phashes = [phash for phash in phashes if is_distinctive(phash)]
+    if not phashes:
+        return None
+    keys = {chunk for phash in phashes for chunk in _chunks(phash)}
+    # Distance is checked in SQL, so a common chunk value cannot crowd true matches out of the limit
+    hits = func.count(func.distinct(ImageHashChunk.image_id))
+    best = db.execute(
+        select(ImageHashChunk.listing_id)
+        .join(Listing, Listing.id == ImageHashChunk.listing_id)
+        .where(
+            tuple_(ImageHashChunk.chunk, ImageHashChunk.value).in_(keys),
+            ImageHashChunk.listing_id != listing_id,
+            Listing.status == "active",
+            or_(*(
+                _hamming_sql(ImageHashChunk.phash, phash) <= settings.near_dup_image_max_distance
+                for phash in phashes
+            )),
+        )
+        .group_by(ImageHashChunk.listing_id)
+        # Prefer the listing with the most matching images, then the oldest
+        .order_by(hits.desc(), ImageHashChunk.listing_id)
+        .limit(1)
+    ).scalar()
+    return best
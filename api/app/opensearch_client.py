@@ -1,18 +1,52 @@
-from time import sleep
-from opensearchpy import OpenSearch
+from functools import lru_cache
+from time import perf_counter, sleep
+from typing import TYPE_CHECKING
 
 from app.config import settings
+from app.metrics import OPENSEARCH_REQUEST_SECONDS
 
+if TYPE_CHECKING:
+    from opensearchpy import OpenSearch
 
-def get_opensearch_client() -> OpenSearch:
-    client = OpenSearch(settings.opensearch_url, http_compress=True, timeout=10)
-    return client
 
+def _endpoint(url: str) -> str:
+    # "/listings/_search" -> "_search"; document paths collapse to "doc" to keep label cardinality bounded
+    for part in url.split("?", 1)[0].split("/"):
+        if part.startswith("_"):
+            return part
+    return "doc"
 
-def ensure_index(index_name: str, mappings: dict | None = None, settings_dict: dict | None = None) -> None:
+
+@lru_cache(maxsize=1)
+def get_opensearch_client() -> "OpenSearch":
+    # One client per process; its urllib3 pool keeps connections alive across requests.
+    # opensearch-py is imported on first use so API startup does not pay for it.
+    from opensearchpy import OpenSearch, Transport
+
+    class TimedTransport(Transport):
+        def perform_request(self, method, url, *args, **kwargs):
+            start = perf_counter()
+            try:
+                return super().perform_request(method, url, *args, **kwargs)
+            finally:
+                OPENSEARCH_REQUEST_SECONDS.labels(method, _endpoint(url)).observe(perf_counter() - start)
+
+    return OpenSearch(
+        settings.opensearch_url,
+        http_compress=True,
+        timeout=10,
+        maxsize=settings.opensearch_pool_maxsize,
+        transport_class=TimedTransport,
+    )
+
+
+def ensure_index(
+    index_name: str, mappings: dict | None = None, settings_dict: dict | None = None, health_attempts: int = 30
+) -> bool:
+    """Create ``index_name`` (or add new mapping fields); returns whether the index now exists."""
     client = get_opensearch_client()
     # Retry waiting for OpenSearch to start
-    for _ in range(30):
+    for _ in range(health_attempts):
         try:
             client.cluster.health()
             break
@@ -26,8 +60,13 @@ def ensure_index(index_name: str, mappings: dict | None = None, settings_dict: d
             if mappings:
                 body["mappings"] = mappings
             client.indices.create(index=index_name, body=body)
+        elif mappings:
+            # New fields only; existing field mappings cannot change in place
+            client.indices.put_mapping(index=index_name, body=mappings)
+        return True
     except Exception:
-        # Ignore during startup
-        pass
-
-
+        # Ignore during startup; a rejected mapping update or a concurrent create still leaves an index
+        try:
+            return bool(client.indices.exists(index=index_name))
+        except Exception:
+            return False
@@ -0,0 +1,39 @@
+import hashlib
+
+import orjson
+import zstandard
+
+from app.schemas import IngestRequest
+
+
+ZSTD_LEVEL = 6
+
+
+def payload_body(p: IngestRequest) -> dict:
+    return {
+        "raw_html": p.raw_html,
+        "raw_json": p.raw_json,
+        "raw_text": p.raw_text,
+    }
+
+
+def content_hash(source: str, url: str | None, payload: dict) -> str:
+    """SHA-256 of the canonical JSON of a payload; equal for byte-identical re-submissions."""
+    canonical = orjson.dumps({"source": source, "url": url, "payload": payload}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(canonical).hexdigest()
+
+
+def compress_payload(payload: dict) -> bytes:
+    # Compressor objects are not thread-safe; they are cheap enough to create per call
+    return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(orjson.dumps(payload))
+
+
+def decompress_payload(blob: bytes) -> dict:
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(blob))
+
+
+def load_payload(payload_zstd: bytes | None, payload: dict | None) -> dict:
+    """Decode a stored raw payload; rows written before compression only have the JSONB column."""
+    if payload_zstd is not None:
+        return decompress_payload(payload_zstd)
+    return payload if isinstance(payload, dict) else {}
@@ -0,0 +1,33 @@
+"""Hand-off storage between the payload pipeline stages.
+
+Stage tasks only pass the payload id through the broker; the extracted
+fields live in Redis under a versioned key until the persist stage has
+written the listing. Keys expire so abandoned chains do not accumulate.
+"""
+import orjson
+
+from app.config import settings
+from app.redis_client import get_redis
+
+
+STAGE_KEY_PREFIX = "pipeline:v1:"
+
+
+def _stage_key(payload_id: int) -> str:
+    return f"{STAGE_KEY_PREFIX}{payload_id}"
+
+
+def stage_put(payload_id: int, fields: dict) -> None:
+    get_redis().set(_stage_key(payload_id), orjson.dumps(fields), ex=settings.pipeline_stage_ttl_seconds)
+
+
+def stage_get(payload_id: int) -> dict | None:
+    value = get_redis().get(_stage_key(payload_id))
+    return orjson.loads(value) if value is not None else None
+
+
+def stage_delete(payload_id: int) -> None:
+    try:
+        get_redis().delete(_stage_key(payload_id))
+    except Exception:
+        pass
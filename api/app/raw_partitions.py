@@ -0,0 +1,115 @@
+"""Monthly RANGE partitions of ``raw_payloads`` on ``created_at``.
+
+New partitions are created ahead of time; expired ones are detached and
+dropped (or kept as standalone archive tables), which is O(1) regardless of
+how many rows they hold. A DEFAULT partition catches inserts for a month
+nobody created yet (beat down for weeks, clock skew), so ingest never fails
+on a missing partition; the next ``ensure_partitions`` moves those rows into
+the month's own partition.
+"""
+from datetime import datetime, timedelta
+import re
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+PARENT = "raw_payloads"
+DEFAULT_PARTITION = f"{PARENT}_default"
+_UPPER_BOUND_RE = re.compile(r"TO \('([^']+)'\)")
+
+
+def month_start(when: datetime) -> datetime:
+    return datetime(when.year, when.month, 1)
+
+
+def add_months(when: datetime, months: int) -> datetime:
+    index = when.year * 12 + when.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f"{PARENT}_{start:%Y%m}"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    return bool(conn.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name)"),
+        {"name": PARENT},
+    ).scalar())
+
+
+def ensure_partitions(conn: Connection, months_ahead: int = 2, now: datetime | None = None) -> list[str]:
+    """Create the partitions for the current month and ``months_ahead`` following months.
+
+    Rows that already landed in the DEFAULT partition for one of those months
+    are moved into the new partition; attaching would fail otherwise.
+    """
+    if not is_partitioned(conn):
+        return []
+    try:
+        with conn.begin_nested():
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT} DEFAULT"))
+    except Exception:
+        # Best effort, like the monthly partitions below
+        pass
+    existing = {name for name, _ in list_partitions(conn)}
+    created = []
+    start = month_start(now or datetime.utcnow())
+    for offset in range(months_ahead + 1):
+        lower = add_months(start, offset)
+        name = partition_name(lower)
+        if name in existing:
+            continue
+        bounds = {"lower": lower, "upper": add_months(lower, 1)}
+        in_range = "created_at >= :lower AND created_at < :upper"
+        try:
+            with conn.begin_nested():
+                conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+                conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+                conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+                conn.execute(text(
+                    f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+                    f"FOR VALUES FROM ('{lower:%Y-%m-%d}') TO ('{bounds['upper']:%Y-%m-%d}')"
+                ))
+            created.append(name)
+        except Exception:
+            # Range already covered (e.g. by the pre-partitioning legacy partition)
+            pass
+    return created
+
+
+def list_partitions(conn: Connection) -> list[tuple[str, datetime | None]]:
+    """(partition name, exclusive upper bound) for every partition; None for MAXVALUE and DEFAULT."""
+    rows = conn.execute(text(
+        "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+        "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(:name)"
+    ), {"name": PARENT}).all()
+    partitions = []
+    for name, bound in rows:
+        m = _UPPER_BOUND_RE.search(bound or "")
+        partitions.append((name, datetime.fromisoformat(m.group(1)) if m else None))
+    return partitions
+
+
+def expire_partitions(conn: Connection, retention_days: int, mode: str = "drop", now: datetime | None = None) -> list[str]:
+    """Detach partitions whose rows are all older than the retention window.
+
+    ``mode="drop"`` deletes them; ``mode="detach"`` renames them to
+    ``*_archive`` so they can be dumped to cold storage and dropped later.
+    """
+    if not is_partitioned(conn):
+        return []
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+    expired = []
+    for name, upper in sorted(list_partitions(conn), key=lambda p: p[1] or datetime.max):
+        if upper is None or upper > cutoff:
+            continue
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        if mode == "detach":
+            conn.execute(text(f"ALTER TABLE {name} RENAME TO {name}_archive"))
+        else:
+            conn.execute(text(f"DROP TABLE {name}"))
+        expired.append(name)
+    return expired
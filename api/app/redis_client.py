@@ -0,0 +1,48 @@
+from functools import lru_cache
+import time
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import settings
+from app.metrics import REDIS_COMMAND_SECONDS
+
+
+class TimedRedis(redis.Redis):
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+
+class TimedAsyncRedis(aioredis.Redis):
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.labels(str(args[0]).upper()).observe(time.perf_counter() - start)
+
+
+@lru_cache(maxsize=1)
+def get_redis() -> TimedRedis:
+    # One connection pool per process; redis-py checks out connections per command
+    return TimedRedis.from_url(
+        settings.redis_url,
+        socket_timeout=2.0,
+        socket_connect_timeout=2.0,
+        health_check_interval=30,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_async_redis() -> TimedAsyncRedis:
+    # For async routes; the pool's connections belong to the API's event loop
+    return TimedAsyncRedis.from_url(
+        settings.redis_url,
+        socket_timeout=2.0,
+        socket_connect_timeout=2.0,
+        health_check_interval=30,
+    )
@@ -1,61 +1,233 @@
-from fastapi import APIRouter, HTTPException, Response
-from fastapi.responses import StreamingResponse
-import httpx
-import io
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+import hashlib
+import os
+import re
+from typing import TYPE_CHECKING
 from urllib.parse import unquote
 
+from app.config import settings
+from app.blobstore import get_blob_store
+from app.image_cache import CachedImage, get_image_cache
+from app.image_variants import VARIANTS, variant_key
+
+if TYPE_CHECKING:
+    import httpx
+
 router = APIRouter()
 
+_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+_CHECKSUM_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Set headers to mimic a browser request
+_UPSTREAM_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'DNT': '1',
+}
+
+_CACHE_HEADERS = {
+    'Cache-Control': 'public, max-age=3600',  # Cache for 1 hour
+    'Access-Control-Allow-Origin': '*',
+}
+
+_client: "httpx.AsyncClient | None" = None
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    # One pooled client per process so repeated CDN hosts reuse warm TLS connections;
+    # httpx itself is imported on first proxy request, not at API startup
+    global _client
+    if _client is None:
+        import httpx
+
+        _client = httpx.AsyncClient(
+            timeout=settings.image_proxy_timeout_seconds,
+            follow_redirects=True,
+            headers=_UPSTREAM_HEADERS,
+            limits=httpx.Limits(
+                max_connections=settings.image_proxy_max_connections,
+                max_keepalive_connections=settings.image_proxy_max_connections,
+            ),
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _iter_file(path: str, start: int, length: int):
+    # A sync iterator: StreamingResponse pulls each chunk in the threadpool, off the event loop
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = f.read(min(_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into an inclusive (start, end); None if unsatisfiable."""
+    m = _RANGE_RE.match(header.strip())
+    if not m or (not m.group(1) and not m.group(2)):
+        return None
+    if not m.group(1):
+        # Suffix range: last N bytes
+        length = int(m.group(2))
+        if length == 0:
+            return None
+        return max(0, size - length), size - 1
+    start = int(m.group(1))
+    end = int(m.group(2)) if m.group(2) else size - 1
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _serve_cached(request: Request, entry: CachedImage) -> Response:
+    headers = {**_CACHE_HEADERS, 'ETag': entry.etag, 'Accept-Ranges': 'bytes'}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and entry.etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, entry.size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, 'Content-Range': f'bytes */{entry.size}'})
+        start, end = byte_range
+        length = end - start + 1
+        headers.update({'Content-Range': f'bytes {start}-{end}/{entry.size}', 'Content-Length': str(length)})
+        return StreamingResponse(
+            _iter_file(entry.path, start, length), status_code=206, media_type=entry.content_type, headers=headers
+        )
+
+    # FileResponse stats and reads the file in the threadpool (and uses sendfile where available)
+    return FileResponse(entry.path, media_type=entry.content_type, headers=headers)
+
+
+def _discard(temp, temp_path: str) -> None:
+    temp.close()
+    try:
+        os.remove(temp_path)
+    except OSError:
+        pass
+
+
+async def _stream_and_cache(url: str, upstream: "httpx.Response", content_type: str):
+    """Relay upstream chunks to the client while teeing them into the disk cache."""
+    cache = get_image_cache()
+    declared = upstream.headers.get('content-length')
+    cacheable = not (declared and declared.isdigit() and int(declared) > cache.max_object_bytes)
+    # Disk work (temp file, writes, commit + eviction scan) runs in the threadpool so a
+    # cache fill never stalls the other requests on this event loop
+    fd, temp_path = await run_in_threadpool(cache.open_temp) if cacheable else (None, None)
+    temp = os.fdopen(fd, "wb") if fd is not None else None
+    digest = hashlib.sha256()
+    written = 0
+    completed = False
+    try:
+        async for chunk in upstream.aiter_bytes(_CHUNK_SIZE):
+            if temp is not None:
+                written += len(chunk)
+                if written > cache.max_object_bytes:
+                    await run_in_threadpool(_discard, temp, temp_path)
+                    temp = None
+                else:
+                    await run_in_threadpool(temp.write, chunk)
+                    digest.update(chunk)
+            yield chunk
+        completed = True
+    finally:
+        committed = False
+        try:
+            await upstream.aclose()
+            if temp is not None and completed:
+                await run_in_threadpool(temp.close)
+                etag = upstream.headers.get('etag') or f'"{digest.hexdigest()[:32]}"'
+                await run_in_threadpool(cache.commit, url, temp_path, content_type, etag)
+                committed = True
+        finally:
+            if temp is not None and not committed:
+                # Inline, not in the threadpool: after a disconnect or cancellation
+                # any further await may raise before the .part file is removed
+                _discard(temp, temp_path)
+
+
 @router.get("/proxy")
-async def proxy_image(url: str):
+async def proxy_image(url: str, request: Request):
     """
     Proxy images through our backend to avoid CORS issues with Facebook CDN
     """
+    # Decode the URL if it's encoded
+    decoded_url = unquote(url)
+
+    # Validate that it's a Facebook/Instagram image URL for security
+    allowed_domains = [
+        'scontent-', 'fbcdn.net', 'cdninstagram.com',
+        'instagram.com', 'facebook.com'
+    ]
+
+    if not any(domain in decoded_url for domain in allowed_domains):
+        raise HTTPException(status_code=400, detail="Invalid image source")
+
+    entry = await run_in_threadpool(get_image_cache().get, decoded_url)
+    if entry is not None:
+        return _serve_cached(request, entry)
+
+    import httpx
+
     try:
-        # Decode the URL if it's encoded
-        decoded_url = unquote(url)
-        
-        # Validate that it's a Facebook/Instagram image URL for security
-        allowed_domains = [
-            'scontent-', 'fbcdn.net', 'cdninstagram.com', 
-            'instagram.com', 'facebook.com'
-        ]
-        
-        if not any(domain in decoded_url for domain in allowed_domains):
-            raise HTTPException(status_code=400, detail="Invalid image source")
-        
-        # Set headers to mimic a browser request
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Accept': 'image/webp,image/apng,image/*,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        
-        # Fetch the image
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(decoded_url, headers=headers, follow_redirects=True)
-            
-            if response.status_code != 200:
-                raise HTTPException(status_code=404, detail="Image not found")
-            
-            # Determine content type
-            content_type = response.headers.get('content-type', 'image/jpeg')
-            
-            # Stream the image back
-            return StreamingResponse(
-                io.BytesIO(response.content),
-                media_type=content_type,
-                headers={
-                    'Cache-Control': 'public, max-age=3600',  # Cache for 1 hour
-                    'Access-Control-Allow-Origin': '*',
-                }
-            )
-            
+        client = get_http_client()
+        upstream = await client.send(client.build_request("GET", decoded_url), stream=True)
     except httpx.TimeoutException:
         raise HTTPException(status_code=408, detail="Image request timeout")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to proxy image: {str(e)}")
+
+    if upstream.status_code != 200:
+        await upstream.aclose()
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    # Determine content type
+    content_type = upstream.headers.get('content-type', 'image/jpeg')
+    headers = dict(_CACHE_HEADERS)
+    if upstream.headers.get('etag'):
+        headers['ETag'] = upstream.headers['etag']
+
+    # Stream the image back chunk by chunk as it arrives
+    return StreamingResponse(
+        _stream_and_cache(decoded_url, upstream, content_type),
+        media_type=content_type,
+        headers=headers,
+    )
+
+
+@router.get("/variants/{checksum}/{variant}")
+def image_variant(checksum: str, variant: str):
+    """Serve a resized WebP rendition produced by the image worker."""
+    if variant not in VARIANTS or not _CHECKSUM_RE.match(checksum):
+        raise HTTPException(status_code=404, detail="Image not found")
+    path = get_blob_store().path(variant_key(checksum, variant))
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Image not found")
+    # Content-addressed, so the bytes behind this URL never change
+    return FileResponse(
+        path,
+        media_type="image/webp",
+        headers={
+            'Cache-Control': 'public, max-age=31536000, immutable',
+            'ETag': f'"{checksum[:32]}-{variant}"',
+            'Access-Control-Allow-Origin': '*',
+        },
+    )
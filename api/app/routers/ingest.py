@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime
+import json
 
-from app.db import get_db
+from app.config import settings
+from app.db import get_async_db, get_db
+from app.lifecycle import touch_resubmitted
 from app.models import RawPayload, Listing
-from app.schemas import IngestRequest, IngestResponse
-from app.tasks import process_raw_payload
+from app.payloads import compress_payload, content_hash, load_payload, payload_body
+from app.schemas import IngestBatchResponse, IngestRequest, IngestResponse
 
 
 router = APIRouter()
 
 
+def _dispatch(payload_ids: list[int]) -> None:
+    # Celery (and the task modules behind it) load on first use, not at API import
+    from app.tasks import dispatch_payloads
+
+    dispatch_payloads(payload_ids)
+
+
 def naive_extract_from_marketplace(payload: IngestRequest) -> dict:
     # Placeholder for AI extraction. For now, return minimal fields.
     title = "Imported listing"
@@ -38,45 +51,138 @@ def naive_extract_from_marketplace(payload: IngestRequest) -> dict:
 
 @router.post("/ingest", response_model=IngestResponse)
 def ingest(payload: IngestRequest, db: Session = Depends(get_db)) -> IngestResponse:
+    body = payload_body(payload)
+    digest = content_hash(payload.source, payload.source_url, body)
+    # Byte-identical re-submission: already stored and processed, only the listing's last_seen_at moves.
+    # If the listing has since been archived, process the payload again to bring it back.
+    if db.scalar(select(RawPayload.id).where(RawPayload.content_hash == digest).limit(1)) is not None:
+        if not touch_resubmitted(db, [(payload.source, payload.source_url)]):
+            db.commit()
+            return IngestResponse(created_listing_id=None, status="duplicate", reason="identical payload already ingested")
     raw = RawPayload(
         source=payload.source,
         url=payload.source_url,
-        payload={
-            "raw_html": payload.raw_html,
-            "raw_json": payload.raw_json,
-            "raw_text": payload.raw_text,
-        },
+        payload_zstd=compress_payload(body),
+        content_hash=digest,
     )
     db.add(raw)
-    db.flush()
-    process_raw_payload.delay(raw.id)
     db.commit()
+    _dispatch([raw.id])
     return IngestResponse(created_listing_id=None, status="queued")
 
 
+_ingest_list_adapter = TypeAdapter(list[IngestRequest])
+
+
+async def _batch_payloads(request: Request) -> list[IngestRequest]:
+    # Accept either a JSON array or NDJSON (one IngestRequest object per line)
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "ndjson" in content_type or "jsonlines" in content_type:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body or b"[]")
+        return _ingest_list_adapter.validate_python(items)
+    except (ValueError, ValidationError) as exc:
+        raise HTTPException(status_code=422, detail=f"Invalid batch payload: {exc}")
+
+
+@router.post("/ingest/batch", response_model=IngestBatchResponse)
+def ingest_batch(
+    payloads: list[IngestRequest] = Depends(_batch_payloads),
+    db: Session = Depends(get_db),
+) -> IngestBatchResponse:
+    if len(payloads) > settings.ingest_batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large (max {settings.ingest_batch_max_items} items)",
+        )
+    if not payloads:
+        return IngestBatchResponse(payload_ids=[], status="empty", count=0)
+
+    rows = []
+    for p in payloads:
+        body = payload_body(p)
+        rows.append({
+            "source": p.source,
+            "url": p.source_url,
+            "payload_zstd": compress_payload(body),
+            "content_hash": content_hash(p.source, p.source_url, body),
+        })
+    existing = dict(
+        db.execute(
+            select(RawPayload.content_hash, func.min(RawPayload.id))
+            .where(RawPayload.content_hash.in_({r["content_hash"] for r in rows}))
+            .group_by(RawPayload.content_hash)
+        ).all()
+    )
+    # Known payloads refresh last_seen_at; ones whose listing was archived are stored and processed again
+    revived = touch_resubmitted(db, {(r["source"], r["url"]) for r in rows if r["content_hash"] in existing})
+    for r in rows:
+        if (r["source"], r["url"]) in revived:
+            existing.pop(r["content_hash"], None)
+    # Skip payloads already stored, and repeats within this batch
+    new_rows = []
+    for r in rows:
+        if r["content_hash"] not in existing:
+            existing[r["content_hash"]] = None
+            new_rows.append(r)
+
+    new_ids: list[int] = []
+    if new_rows:
+        # Single multi-row INSERT ... RETURNING; ids come back in request order
+        stmt = insert(RawPayload).returning(RawPayload.id, sort_by_parameter_order=True)
+        new_ids = list(db.scalars(stmt, new_rows))
+        for r, payload_id in zip(new_rows, new_ids):
+            existing[r["content_hash"]] = payload_id
+    # Commit before dispatch so workers never race the transaction
+    db.commit()
+    if new_ids:
+        _dispatch(new_ids)
+    payload_ids = [existing[r["content_hash"]] for r in rows]
+    return IngestBatchResponse(
+        payload_ids=payload_ids,
+        status="queued" if new_ids else "duplicate",
+        count=len(new_ids),
+        duplicates=len(rows) - len(new_ids),
+    )
+
+
+@router.get("/ingest/geocode/stats")
+def geocode_stats() -> dict:
+    from app.geocode import cache_stats
+
+    return cache_stats()
+
+
+@router.get("/ingest/llm/stats")
+def llm_stats() -> dict:
+    from app.llm import cache_stats
+
+    return cache_stats()
+
+
 @router.get("/ingest/raw/recent")
-def recent_raw_payloads(limit: int = 5, db: Session = Depends(get_db)) -> list[dict]:
+async def recent_raw_payloads(limit: int = 5, db: AsyncSession = Depends(get_async_db)) -> list[dict]:
     rows = (
-        db.query(RawPayload)
-        .order_by(RawPayload.id.desc())
-        .limit(max(1, min(limit, 50)))
-        .all()
-    )
+        await db.scalars(select(RawPayload).order_by(RawPayload.id.desc()).limit(max(1, min(limit, 50))))
+    ).all()
     return [
         {
             "id": r.id,
             "created_at": r.created_at.isoformat(),
             "source": r.source,
             "url": r.url,
-            "payload": r.payload,
+            "payload": load_payload(r.payload_zstd, r.payload),
         }
         for r in rows
     ]
 
 
 @router.get("/ingest/raw/{payload_id}")
-def get_raw_payload(payload_id: int, db: Session = Depends(get_db)) -> dict:
-    r = db.get(RawPayload, payload_id)
+async def get_raw_payload(payload_id: int, db: AsyncSession = Depends(get_async_db)) -> dict:
+    r = (await db.scalars(select(RawPayload).where(RawPayload.id == payload_id))).first()
     if not r:
         return {"error": "not_found"}
     return {
@@ -84,7 +190,7 @@ def get_raw_payload(payload_id: int, db: Session = Depends(get_db)) -> dict:
         "created_at": r.created_at.isoformat(),
         "source": r.source,
         "url": r.url,
-        "payload": r.payload,
+        "payload": load_payload(r.payload_zstd, r.payload),
     }
 
 
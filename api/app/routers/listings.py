@@ -1,54 +1,186 @@
-from fastapi import APIRouter, Depends, Query, HTTPException
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.config import settings
+from app.db import get_async_db, get_db
+from app.facets import compute_facets
+from app.image_variants import variant_urls
+from app.map_tiles import invalidate_tiles
 from app.schemas import Listing, ListingCreate, ListingDetail
-from app import crud
+from app import cache, crud
 from app.models import Listing as ListingModel
 
 
 router = APIRouter()
 
 
+def _listing_to_dict(row: ListingModel) -> dict:
+    # Same shape as ListingDetail, without per-row pydantic validation
+    data = {f: getattr(row, f) for f in crud.LISTING_READ_FIELDS}
+    data["images"] = [
+        {**{f: getattr(img, f) for f in crud.IMAGE_READ_FIELDS}, "variants": variant_urls(img.checksum)}
+        for img in row.images
+    ]
+    return data
+
+
+def _pack(headers: dict, payload: list) -> bytes:
+    # Cached list entries carry their response headers on the first line
+    return orjson.dumps(headers) + b"\n" + orjson.dumps(payload)
+
+
+def _unpack(value: bytes) -> tuple[dict, bytes]:
+    head, _, body = value.partition(b"\n")
+    return orjson.loads(head), body
+
+
+def _parse_floats(value: str, count: int, name: str) -> list[float]:
+    try:
+        parts = [float(p) for p in value.split(",")]
+    except ValueError:
+        parts = []
+    if len(parts) != count:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+    return parts
+
+
+def _parse_bbox(value: str) -> tuple[float, float, float, float]:
+    min_lng, min_lat, max_lng, max_lat = _parse_floats(value, 4, "bbox")
+    if not (-180 <= min_lng < max_lng <= 180 and -90 <= min_lat < max_lat <= 90):
+        raise HTTPException(status_code=400, detail="Invalid bbox")
+    return min_lng, min_lat, max_lng, max_lat
+
+
+def _parse_near(value: str) -> tuple[float, float]:
+    lat, lng = _parse_floats(value, 2, "near")
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise HTTPException(status_code=400, detail="Invalid near")
+    return lat, lng
+
+
 @router.post("/listings", response_model=Listing)
 def create_listing(payload: ListingCreate, db: Session = Depends(get_db)) -> Listing:
     listing = crud.create_listing(db, payload)
-    return Listing.model_validate(listing)
+    result = Listing.model_validate(listing)
+    db.commit()
+    cache.invalidate_listings()
+    invalidate_tiles([(listing.latitude, listing.longitude)])
+    return result
 
 
 @router.get("/listings", response_model=list[ListingDetail])
-def get_listings(
-    db: Session = Depends(get_db),
+async def get_listings(
+    db: AsyncSession = Depends(get_async_db),
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
     min_price: int | None = Query(None, ge=0),
     max_price: int | None = Query(None, ge=0),
     bedrooms: int | None = Query(None, ge=0),
     furnished: bool | None = Query(None),
-) -> list[ListingDetail]:
-    rows = crud.list_listings(
-        db,
-        limit=limit,
-        offset=offset,
-        min_price=min_price,
-        max_price=max_price,
-        bedrooms=bedrooms,
-        furnished=furnished,
-    )
-    # Ensure images are loaded for each listing
-    for row in rows:
-        _ = len(row.images)
-    return [ListingDetail.model_validate(r) for r in rows]
+    campus_id: int | None = Query(None, ge=1),
+    within_km: float | None = Query(None, gt=0),
+    bbox: str | None = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    near: str | None = Query(None, description="lat,lng"),
+    radius_km: float | None = Query(None, gt=0, le=500),
+    sort: Literal["recent", "campus_distance", "distance"] = Query("recent"),
+    cursor: str | None = Query(None, description="Opaque cursor from the X-Next-Cursor header"),
+    max_spam_score: float | None = Query(None, ge=0, le=1, description="Defaults to LISTINGS_MAX_SPAM_SCORE"),
+) -> Response:
+    if within_km is not None and campus_id is None:
+        raise HTTPException(status_code=400, detail="within_km requires campus_id")
+    bbox_value = _parse_bbox(bbox) if bbox is not None else None
+    near_value = _parse_near(near) if near is not None else None
+    if radius_km is not None and near_value is None:
+        raise HTTPException(status_code=400, detail="radius_km requires near")
+    if sort == "distance" and near_value is None:
+        raise HTTPException(status_code=400, detail="sort=distance requires near")
+    if cursor is not None and (offset or sort != "recent"):
+        raise HTTPException(status_code=400, detail="cursor cannot be combined with offset or a custom sort")
+    if cursor is not None:
+        try:
+            crud.decode_cursor(cursor)
+        except crud.InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    params = {
+        "limit": limit,
+        "offset": offset,
+        "min_price": min_price,
+        "max_price": max_price,
+        "bedrooms": bedrooms,
+        "furnished": furnished,
+        "campus_id": campus_id,
+        "within_km": within_km,
+        "bbox": bbox_value,
+        "near": near_value,
+        "radius_km": radius_km,
+        "sort": sort,
+        "cursor": cursor,
+        "max_spam_score": max_spam_score if max_spam_score is not None else settings.listings_max_spam_score,
+    }
 
+    async def load() -> bytes:
+        rows = await crud.list_listings_async(db, **params)
+        # Keyset pagination: hand back the position of the last row when the page is full
+        headers = {}
+        if sort == "recent" and len(rows) == limit:
+            headers["X-Next-Cursor"] = crud.encode_cursor(rows[-1])
+        # Images were batch-loaded by crud; serialize straight to JSON bytes
+        return _pack(headers, [_listing_to_dict(r) for r in rows])
 
-@router.get("/listings/{listing_id}", response_model=ListingDetail)
-def get_listing(listing_id: int, db: Session = Depends(get_db)) -> ListingDetail:
-    row = db.get(ListingModel, listing_id)
-    if not row:
-        raise HTTPException(status_code=404, detail="Listing not found")
-    # Ensure images relationship is loaded
-    _ = len(row.images)
-    return ListingDetail.model_validate(row)
+    cached = await cache.read_through_async(cache.listings_cache_key("list", params), load)
+    headers, body = _unpack(cached)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
+@router.get("/listings/facets")
+def get_listing_facets(
+    db: Session = Depends(get_db),
+    min_price: int | None = Query(None, ge=0),
+    max_price: int | None = Query(None, ge=0),
+    bedrooms: int | None = Query(None, ge=0),
+    furnished: bool | None = Query(None),
+    campus_id: int | None = Query(None, ge=1),
+    within_km: float | None = Query(None, gt=0),
+    bbox: str | None = Query(None, description="min_lng,min_lat,max_lng,max_lat"),
+    near: str | None = Query(None, description="lat,lng"),
+    radius_km: float | None = Query(None, gt=0, le=500),
+    max_spam_score: float | None = Query(None, ge=0, le=1, description="Defaults to LISTINGS_MAX_SPAM_SCORE"),
+) -> Response:
+    """Bedroom, furnished and pets counts plus a price histogram for the same filters as GET /listings."""
+    if within_km is not None and campus_id is None:
+        raise HTTPException(status_code=400, detail="within_km requires campus_id")
+    near_value = _parse_near(near) if near is not None else None
+    if (radius_km is None) != (near_value is None):
+        raise HTTPException(status_code=400, detail="near and radius_km must be given together")
+    params = {
+        "min_price": min_price,
+        "max_price": max_price,
+        "bedrooms": bedrooms,
+        "furnished": furnished,
+        "campus_id": campus_id,
+        "within_km": within_km,
+        "bbox": _parse_bbox(bbox) if bbox is not None else None,
+        "near": near_value,
+        "radius_km": radius_km,
+        "max_spam_score": max_spam_score if max_spam_score is not None else settings.listings_max_spam_score,
+    }
+    body = cache.read_through(
+        cache.listings_cache_key("facets", params), lambda: orjson.dumps(compute_facets(db, **params))
+    )
+    return Response(content=body, media_type="application/json")
+
 
+@router.get("/listings/{listing_id}", response_model=ListingDetail)
+async def get_listing(listing_id: int, db: AsyncSession = Depends(get_async_db)) -> Response:
+    async def load() -> bytes | None:
+        row = await crud.get_listing_async(db, listing_id)
+        return orjson.dumps(_listing_to_dict(row)) if row else None
+
+    body = await cache.read_through_async(f"detail:{listing_id}", load)
+    if body is None:
+        raise HTTPException(status_code=404, detail="Listing not found")
+    return Response(content=body, media_type="application/json")
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.map_tiles import MAX_ZOOM, get_tile
+
+
+router = APIRouter()
+
+
+@router.get("/map/tiles/{z}/{x}/{y}")
+def map_tile(
+    z: int = Path(..., ge=0, le=MAX_ZOOM),
+    x: int = Path(..., ge=0),
+    y: int = Path(..., ge=0),
+    db: Session = Depends(get_db),
+) -> Response:
+    """Clustered active listings for one web-mercator tile, with counts and price stats per cluster."""
+    if x >= 1 << z or y >= 1 << z:
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    return Response(
+        content=get_tile(db, z, x, y),
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=30"},
+    )
@@ -34,6 +34,9 @@ class Listing(ListingBase):
     dedup_key: str | None = None
     spam_score: float | None = None
     attributes: dict | None = None
+    nearest_campus_id: int | None = None
+    campus_distance_km: float | None = None
+    cluster_id: int | None = None
 
     class Config:
         from_attributes = True
@@ -46,6 +49,7 @@ class ListingImage(BaseModel):
     width: int | None = None
     height: int | None = None
     order_index: int = 0
+    variants: dict[str, str] | None = None
 
     class Config:
         from_attributes = True
@@ -69,4 +73,11 @@ class IngestResponse(BaseModel):
     reason: str | None = None
 
 
+class IngestBatchResponse(BaseModel):
+    payload_ids: list[int]
+    status: str
+    count: int
+    duplicates: int = 0
+
+
 
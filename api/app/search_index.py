@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.models import Listing, ListingOutbox
+from app.opensearch_client import ensure_index, get_opensearch_client
+
+
+LISTINGS_INDEX = "listings"
+LISTINGS_MAPPINGS = {
+    "properties": {
+        "title": {"type": "text"},
+        "description": {"type": "text"},
+        "price_cents": {"type": "long"},
+        "bedrooms": {"type": "integer"},
+        "bathrooms": {"type": "float"},
+        "furnished": {"type": "boolean"},
+        "pets_allowed": {"type": "boolean"},
+        "lease_term": {"type": "keyword"},
+        "posted_at": {"type": "date"},
+        "location": {"type": "geo_point"},
+        "status": {"type": "keyword"},
+        "nearest_campus_id": {"type": "integer"},
+        "campus_distance_km": {"type": "float"},
+        "spam_score": {"type": "float"},
+    }
+}
+
+_MAX_BACKOFF_SECONDS = 300
+_index_checked = False
+
+
+def ensure_listings_index(health_attempts: int = 30) -> bool:
+    return ensure_index(index_name=LISTINGS_INDEX, mappings=LISTINGS_MAPPINGS, health_attempts=health_attempts)
+
+
+def enqueue_listing_change(db: Session, listing_id: int, op: str = "upsert") -> None:
+    """Record a pending index change; commits (or rolls back) with the caller's transaction."""
+    db.add(ListingOutbox(listing_id=listing_id, op=op))
+
+
+def enqueue_listing_changes(db: Session, listing_ids: list[int], op: str = "upsert") -> None:
+    """``enqueue_listing_change`` for many listings in one INSERT."""
+    if listing_ids:
+        db.execute(insert(ListingOutbox), [{"listing_id": listing_id, "op": op} for listing_id in listing_ids])
+
+
+def listing_document(listing: Listing) -> dict:
+    doc = {
+        "title": listing.title,
+        "description": listing.description,
+        "price_cents": listing.price_cents,
+        "currency": listing.currency,
+        "bedrooms": listing.bedrooms,
+        "bathrooms": listing.bathrooms,
+        "furnished": listing.furnished,
+        "pets_allowed": listing.pets_allowed,
+        "lease_term": listing.lease_term,
+        "posted_at": listing.posted_at.isoformat() if listing.posted_at else None,
+        "collected_at": listing.collected_at.isoformat() if listing.collected_at else None,
+        "status": listing.status,
+        "source": listing.source,
+        "nearest_campus_id": listing.nearest_campus_id,
+        "campus_distance_km": listing.campus_distance_km,
+        "spam_score": listing.spam_score,
+    }
+    if listing.latitude is not None and listing.longitude is not None:
+        doc["location"] = {"lat": listing.latitude, "lon": listing.longitude}
+    return doc
+
+
+def _backoff(attempts: int) -> timedelta:
+    return timedelta(seconds=min(_MAX_BACKOFF_SECONDS, 2 ** attempts))
+
+
+def drain_outbox_batch(db: Session, batch_size: int) -> dict:
+    """Push one batch of outbox rows to OpenSearch with the _bulk API.
+
+    Rows are claimed with SKIP LOCKED so several drainers can run at once.
+    Successful rows are deleted; failed rows are retried with exponential
+    backoff. ``throttled`` is set when the cluster pushed back (429 or
+    transport error) so the caller can stop draining for now.
+    """
+    global _index_checked
+    if not _index_checked:
+        # Before claiming rows: the health wait must not hold outbox row locks or a transaction open.
+        # Until the index exists nothing is sent, or _bulk would auto-create it with dynamic mappings.
+        if not ensure_listings_index(health_attempts=1):
+            return {"claimed": 0, "indexed": 0, "failed": 0, "throttled": True}
+        _index_checked = True
+    now = datetime.utcnow()
+    rows = db.execute(
+        select(ListingOutbox)
+        .where(ListingOutbox.available_at <= now)
+        .order_by(ListingOutbox.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if not rows:
+        return {"claimed": 0, "indexed": 0, "failed": 0, "throttled": False}
+
+    # Collapse repeated changes to the same listing; the newest op wins
+    latest: dict[int, ListingOutbox] = {}
+    for row in rows:
+        latest[row.listing_id] = row
+    upsert_ids = [lid for lid, row in latest.items() if row.op != "delete"]
+    listings = {
+        l.id: l
+        for l in db.execute(select(Listing).where(Listing.id.in_(upsert_ids))).scalars().all()
+    } if upsert_ids else {}
+
+    body: list[dict] = []
+    order: list[int] = []
+    for listing_id, row in latest.items():
+        listing = listings.get(listing_id)
+        if row.op == "delete" or listing is None:
+            body.append({"delete": {"_index": LISTINGS_INDEX, "_id": str(listing_id)}})
+        else:
+            body.append({"index": {"_index": LISTINGS_INDEX, "_id": str(listing_id)}})
+            body.append(listing_document(listing))
+        order.append(listing_id)
+
+    failed: dict[int, str] = {}
+    throttled = False
+    try:
+        resp = get_opensearch_client().bulk(body=body, timeout=f"{settings.outbox_bulk_timeout_seconds}s")
+        for listing_id, item in zip(order, resp.get("items", [])):
+            result = next(iter(item.values()))
+            status = result.get("status", 500)
+            # Deleting a document that was never indexed is fine
+            if status >= 300 and not (status == 404 and "delete" in item):
+                failed[listing_id] = str(result.get("error"))[:500]
+                throttled = throttled or status == 429
+    except Exception as exc:
+        failed = {listing_id: str(exc)[:500] for listing_id in order}
+        throttled = True
+
+    done_ids = [row.id for row in rows if row.listing_id not in failed]
+    if done_ids:
+        db.execute(delete(ListingOutbox).where(ListingOutbox.id.in_(done_ids)))
+    for row in rows:
+        if row.listing_id in failed:
+            db.execute(
+                update(ListingOutbox)
+                .where(ListingOutbox.id == row.id)
+                .values(
+                    attempts=row.attempts + 1,
+                    available_at=now + _backoff(row.attempts + 1),
+                    last_error=failed[row.listing_id],
+                )
+            )
+    db.commit()
+    return {
+        "claimed": len(rows),
+        "indexed": len(order) - len(failed),
+        "failed": len(failed),
+        "throttled": throttled,
+    }
@@ -0,0 +1,216 @@
+"""Spam scores for listings, computed as NumPy feature matrices.
+
+Each listing gets a feature row, and the score is a logistic over a fixed weight
+vector, stored in ``listings.spam_score`` (0 = clean, 1 = spam). The features are:
+
+* price outliers: log distance below or above the median price for the same
+  bedrooms near the same campus (falling back to bedrooms alone when that
+  area has too few listings), plus a missing price;
+* text signals: scam phrases, off-platform contact hints, exclamation marks
+  and an almost empty description;
+* photos reused by other listings (same image checksum).
+
+The periodic job recomputes the medians over all active listings and scores
+everything in ``spam_score_batch_size`` chunks. Ingest scores single listings
+against the medians the job cached in Redis; until the job has run (or
+while Redis is down) they get neutral price features rather than a
+full-table median query on the ingest path.
+"""
+import numpy as np
+import orjson
+from sqlalchemy import and_, func, select, text
+from sqlalchemy.orm import Session, aliased
+
+from app.config import settings
+from app.models import Listing, ListingImage
+from app.redis_client import get_redis
+from app.search_index import enqueue_listing_changes
+
+
+MEDIANS_KEY = "spam:v1:price_medians"
+# No groups: every median lookup is NaN, so the price outlier features are 0
+NEUTRAL_MEDIANS = {name: {"keys": [], "medians": [], "counts": []} for name in ("area", "bedrooms")}
+TEXT_CHARS = 2000  # title + description are truncated to this before matching
+
+SCAM_TERMS = (
+    "wire transfer", "western union", "moneygram", "deposit before", "send deposit", "pay deposit",
+    "out of the country", "out of town", "missionary", "keys will be mailed", "god bless", "no viewing",
+    "gift card", "bitcoin", "crypto",
+)
+CONTACT_TERMS = ("whatsapp", "telegram", "wechat", "@gmail", "@yahoo", "@hotmail", "text me", "email me", "http", "www.")
+
+FEATURES = (
+    "price_below_median", "price_above_median", "price_missing",
+    "scam_terms", "contact_terms", "exclamations", "short_description", "duplicate_images",
+)
+# Hand-tuned: underpricing and scam phrasing dominate; a lone contact hint or reused photo is weak evidence
+WEIGHTS = np.array([3.0, 0.6, 1.5, 1.6, 0.9, 0.25, 0.8, 0.7])
+BIAS = -3.5
+
+
+def _group_keys(campus_ids: np.ndarray, bedrooms: np.ndarray) -> np.ndarray:
+    # campus 0 = untagged, bedrooms -1 = unknown; packed into one int64 per (area, bedrooms)
+    return campus_ids.astype(np.int64) * 64 + np.clip(bedrooms + 1, 0, 63).astype(np.int64)
+
+
+def group_medians(keys: np.ndarray, values: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Median and size of ``values`` per distinct key, as (sorted keys, medians, counts)."""
+    if not len(keys):
+        return keys, values.astype(float), keys
+    order = np.lexsort((values, keys))
+    keys, values = keys[order], values[order]
+    unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    medians = (values[starts + (counts - 1) // 2] + values[starts + counts // 2]) / 2.0
+    return unique, medians, counts
+
+
+def _lookup(table: dict, keys: np.ndarray, min_count: int) -> np.ndarray:
+    """Median for each key (NaN when the group is unknown or smaller than ``min_count``)."""
+    found = np.full(len(keys), np.nan)
+    table_keys = np.asarray(table["keys"], dtype=np.int64)
+    if not len(table_keys):
+        return found
+    idx = np.clip(np.searchsorted(table_keys, keys), 0, len(table_keys) - 1)
+    ok = (table_keys[idx] == keys) & (np.asarray(table["counts"])[idx] >= min_count)
+    found[ok] = np.asarray(table["medians"], dtype=float)[idx[ok]]
+    return found
+
+
+def compute_price_medians(campus_ids: np.ndarray, bedrooms: np.ndarray, prices: np.ndarray) -> dict:
+    """Price medians per (campus, bedrooms) and per bedrooms alone, over priced listings."""
+    priced = prices > 0
+    tables = {}
+    for name, keys in (
+        ("area", _group_keys(campus_ids, bedrooms)),
+        ("bedrooms", _group_keys(np.zeros_like(campus_ids), bedrooms)),
+    ):
+        unique, medians, counts = group_medians(keys[priced], prices[priced].astype(float))
+        tables[name] = {"keys": unique.tolist(), "medians": medians.tolist(), "counts": counts.tolist()}
+    return tables
+
+
+def load_price_medians() -> dict:
+    """Medians cached by the periodic job, or ``NEUTRAL_MEDIANS`` when Redis has none."""
+    try:
+        cached = get_redis().get(MEDIANS_KEY)
+        if cached:
+            return orjson.loads(cached)
+    except Exception:
+        pass
+    return NEUTRAL_MEDIANS
+
+
+def refresh_price_medians(db: Session) -> dict:
+    rows = db.execute(
+        select(
+            func.coalesce(Listing.nearest_campus_id, 0),
+            func.coalesce(Listing.bedrooms, -1),
+            Listing.price_cents,
+        ).where(Listing.status == "active")
+    ).all()
+    columns = np.array(rows, dtype=np.int64).reshape(-1, 3)
+    medians = compute_price_medians(columns[:, 0], columns[:, 1], columns[:, 2])
+    try:
+        get_redis().set(MEDIANS_KEY, orjson.dumps(medians), ex=settings.spam_medians_ttl_seconds)
+    except Exception:
+        pass
+    return medians
+
+
+def _term_counts(texts: np.ndarray, terms: tuple[str, ...]) -> np.ndarray:
+    hits = np.zeros(len(texts))
+    for term in terms:
+        hits += np.char.count(texts, term) > 0
+    return hits
+
+
+def feature_matrix(
+    campus_ids: np.ndarray,
+    bedrooms: np.ndarray,
+    prices: np.ndarray,
+    texts: np.ndarray,
+    description_lengths: np.ndarray,
+    duplicate_images: np.ndarray,
+    medians: dict,
+) -> np.ndarray:
+    """One row per listing, one column per name in ``FEATURES``. ``texts`` must already be lower-cased."""
+    min_count = settings.spam_medians_min_group
+    median = _lookup(medians["area"], _group_keys(campus_ids, bedrooms), min_count)
+    fallback = np.isnan(median)
+    untagged = np.zeros(int(fallback.sum()), dtype=np.int64)
+    median[fallback] = _lookup(medians["bedrooms"], _group_keys(untagged, bedrooms[fallback]), min_count)
+    priced = (prices > 0) & ~np.isnan(median)
+    ratio = np.zeros(len(prices))
+    ratio[priced] = np.log(prices[priced] / median[priced])
+    return np.column_stack([
+        np.clip(-ratio, 0.0, 3.0),
+        np.clip(ratio, 0.0, 3.0),
+        (prices <= 0).astype(float),
+        np.minimum(_term_counts(texts, SCAM_TERMS), 3.0),
+        np.minimum(_term_counts(texts, CONTACT_TERMS), 3.0),
+        np.minimum(np.char.count(texts, "!"), 10) / 5.0,
+        (description_lengths < 40).astype(float),
+        np.log1p(duplicate_images),
+    ])
+
+
+def spam_scores(features: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-(features @ WEIGHTS + BIAS)))
+
+
+def _duplicate_image_counts(db: Session, ids: list[int]) -> dict[int, int]:
+    """Images of each listing whose checksum also appears on a different listing."""
+    other = aliased(ListingImage)
+    rows = db.execute(
+        select(ListingImage.listing_id, func.count(func.distinct(ListingImage.id)))
+        .join(other, and_(other.checksum == ListingImage.checksum, other.listing_id != ListingImage.listing_id))
+        .where(ListingImage.listing_id.in_(ids), ListingImage.checksum.is_not(None))
+        .group_by(ListingImage.listing_id)
+    ).all()
+    return dict(rows)
+
+
+_WRITE_SCORES = text(
+    "UPDATE listings AS l SET spam_score = v.score "
+    "FROM unnest(CAST(:ids AS integer[]), CAST(:scores AS double precision[])) AS v(id, score) "
+    "WHERE l.id = v.id AND l.spam_score IS DISTINCT FROM v.score "
+    "RETURNING l.id"
+)
+
+
+def score_listings(db: Session, ids: list[int], medians: dict | None = None) -> int:
+    """Score ``ids`` in the caller's transaction; returns how many scores changed.
+
+    Changed listings are queued for reindexing so search-side facets see the new score.
+    """
+    if not ids:
+        return 0
+    rows = db.execute(
+        select(
+            Listing.id,
+            func.coalesce(Listing.nearest_campus_id, 0),
+            func.coalesce(Listing.bedrooms, -1),
+            Listing.price_cents,
+            func.lower(func.left(func.concat_ws(" ", Listing.title, Listing.description), TEXT_CHARS)),
+            func.length(func.coalesce(Listing.description, "")),
+        ).where(Listing.id.in_(ids))
+    ).all()
+    if not rows:
+        return 0
+    if medians is None:
+        medians = load_price_medians()
+    listing_ids, campus_ids, bedrooms, prices, texts, lengths = zip(*rows)
+    duplicates = _duplicate_image_counts(db, list(listing_ids))
+    features = feature_matrix(
+        np.array(campus_ids, dtype=np.int64),
+        np.array(bedrooms, dtype=np.int64),
+        np.array(prices, dtype=float),
+        np.array(texts, dtype=str),
+        np.array(lengths),
+        np.array([duplicates.get(i, 0) for i in listing_ids], dtype=float),
+        medians,
+    )
+    scores = np.round(spam_scores(features), 4)
+    changed = db.scalars(_WRITE_SCORES, {"ids": list(listing_ids), "scores": scores.tolist()}).all()
+    enqueue_listing_changes(db, list(changed))
+    return len(changed)
@@ -1,16 +1,39 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+import asyncio
 import hashlib
+import logging
+import os
+import time
 from typing import Any, Dict
 
-import httpx
-from openai import OpenAI
-from celery import Celery
+from celery import Celery, chain, group, signals
+from prometheus_client import multiprocess, start_http_server
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import delete, insert, literal, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.config import settings
-from app.db import SessionLocal
-from app.models import RawPayload, Listing, ListingImage, Campus
+from app.db import SessionLocal, engine
+from app.extractors import get_extractor, normalize_price_cents
+from app.geocode import geocode
+from app.campus_index import get_campus_index, invalidate_campus_index
+from app.cache import invalidate_listings
+from app.image_variants import process_images
+from app.llm import extract_listing_data
+from app.llm_executor import run_extractions
+from app.logging_config import configure_logging
+from app.metrics import QueueDepthCollector, TASK_SECONDS, metrics_registry, observe_step
+from app.facets import rebuild_facet_counts
+from app.lifecycle import archive_stale_listings, touch_last_seen
+from app.map_tiles import invalidate_tiles
+from app.payloads import load_payload
+from app.pipeline import stage_delete, stage_get, stage_put
+from app.raw_partitions import ensure_partitions, expire_partitions
+from app.redis_client import get_redis
+from app.near_dup import find_image_duplicate, find_text_duplicate, index_image_hashes, index_text_signature, text_signature
+from app.search_index import drain_outbox_batch, enqueue_listing_change
+from app.spam import refresh_price_medians, score_listings
+from app.models import RawPayload, Listing, ListingImage, ListingOutbox
 
 
 celery_app = Celery(
@@ -19,16 +42,78 @@ celery_app = Celery(
     backend=settings.redis_url,
 )
 
+celery_app.conf.beat_schedule = {
+    "drain-listing-outbox": {
+        "task": "app.tasks.drain_listing_outbox",
+        "schedule": settings.outbox_drain_interval_seconds,
+        "options": {"expires": settings.outbox_drain_interval_seconds * 5},
+    },
+    "maintain-raw-payload-partitions": {
+        "task": "app.tasks.maintain_raw_payload_partitions",
+        "schedule": 6 * 3600,
+    },
+    "expire-stale-listings": {
+        "task": "app.tasks.expire_stale_listings",
+        "schedule": 3600,
+    },
+    "rebuild-facet-counts": {
+        "task": "app.tasks.rebuild_listing_facet_counts",
+        "schedule": 24 * 3600,
+    },
+    "score-listing-spam": {
+        "task": "app.tasks.score_listing_spam",
+        "schedule": settings.spam_score_interval_seconds,
+        "options": {"expires": settings.spam_score_interval_seconds},
+    },
+}
 
-def _normalize_price_cents(price: str | int | None) -> int | None:
-    if price is None:
-        return None
-    if isinstance(price, int):
-        return price
-    digits = ''.join(ch for ch in price if ch.isdigit())
-    if not digits:
-        return None
-    return int(digits) * 100 if len(digits) <= 5 else int(digits)
+# Payload pipeline stages run on their own queues so each worker pool can be sized
+# for its bottleneck (LLM, geocoder, database, cache/broker); everything else uses "celery".
+celery_app.conf.task_routes = {
+    "app.tasks.extract_payloads": {"queue": "extract"},
+    "app.tasks.enrich_payload": {"queue": "enrich"},
+    "app.tasks.persist_payload": {"queue": "persist"},
+    "app.tasks.notify_listing_change": {"queue": "index"},
+    "app.tasks.process_listing_images": {"queue": "media"},
+}
+
+logger = logging.getLogger(__name__)
+_task_started: dict[str, float] = {}
+
+
+@signals.setup_logging.connect
+def _setup_logging(**kwargs) -> None:
+    configure_logging()
+
+
+@signals.worker_init.connect
+def _start_metrics_server(**kwargs) -> None:
+    registry = metrics_registry()
+    queues = {"celery", *(route["queue"] for route in celery_app.conf.task_routes.values())}
+    registry.register(QueueDepthCollector(get_redis, queues))
+    try:
+        start_http_server(settings.worker_metrics_port, registry=registry)
+    except OSError:
+        # Another worker in this container/host already serves the port
+        logger.warning("Worker metrics port in use", extra={"port": settings.worker_metrics_port})
+
+
+@signals.worker_process_shutdown.connect
+def _mark_process_dead(pid=None, **kwargs) -> None:
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR") and pid:
+        multiprocess.mark_process_dead(pid)
+
+
+@signals.task_prerun.connect
+def _task_prerun(task_id=None, **kwargs) -> None:
+    _task_started[task_id] = time.perf_counter()
+
+
+@signals.task_postrun.connect
+def _task_postrun(task_id=None, task=None, state=None, **kwargs) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is not None and task is not None:
+        TASK_SECONDS.labels(task.name, state or "UNKNOWN").observe(time.perf_counter() - started)
 
 
 def _dedup_key(source: str, title: str | None, price_cents: int | None, first_image: str | None) -> str:
@@ -36,314 +121,607 @@ def _dedup_key(source: str, title: str | None, price_cents: int | None, first_im
     return hashlib.sha1(base.encode()).hexdigest()
 
 
-def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    from math import radians, sin, cos, sqrt, atan2
-    R = 6371.0
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon/2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-
-def _nearest_campus(db: Session, lat: float, lng: float) -> tuple[str | None, float | None]:
-    campuses = db.execute(select(Campus)).scalars().all()
-    if not campuses:
-        return None, None
-    best_name, best_dist = None, None
-    for c in campuses:
-        d = _haversine_km(lat, lng, c.latitude, c.longitude)
-        if best_dist is None or d < best_dist:
-            best_name, best_dist = c.name, d
-    return best_name, best_dist
+def _nearest_campus(db: Session, lat: float, lng: float) -> tuple[int | None, str | None, float | None]:
+    found = get_campus_index(db).nearest(lat, lng)
+    if found is None:
+        return None, None, None
+    return found
 
 
 def _geocode(address: str) -> tuple[float | None, float | None]:
     # Use Nominatim (for local dev). Respect usage policies in production.
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {"q": address, "format": "json", "limit": 1}
-        with httpx.Client(timeout=5.0, headers={"User-Agent": "roof-dev"}) as client:
-            r = client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json()
-            if data:
-                return float(data[0]["lat"]), float(data[0]["lon"])
-    except Exception:
-        pass
-    return None, None
+    # Results (including misses) are cached in Redis by normalized address.
+    return geocode(address)
 
 
 @celery_app.task
 def process_raw_payload(payload_id: int) -> dict:
+    """Run every pipeline stage for one payload in this worker (debugging, benchmarks)."""
+    return _process_payload(payload_id)
+
+
+def _process_payload(payload_id: int, extracted: dict | None = None) -> dict:
+    with SessionLocal() as db:
+        fields = _extract_fields(db, payload_id, extracted)
+    if fields is None:
+        return {"status": "not_found"}
+    fields = _enrich_fields(fields)
+    with SessionLocal() as db:
+        result = _persist_fields(db, fields)
+    return _notify(result)
+
+
+@celery_app.task
+def extract_payloads(payload_ids: list[int]) -> int:
+    """Stage 1 (queue "extract"): LLM extraction for a chunk, run concurrently, plus heuristics.
+
+    Each extracted payload is staged in Redis and continues through its own
+    enrich -> persist -> notify chain; only the payload id travels with it.
+    """
+    extracted: dict[int, dict] = {}
     with SessionLocal() as db:
-        raw = db.get(RawPayload, payload_id)
-        if not raw:
-            return {"status": "not_found"}
-
-        url = raw.url or ""
-        title = "Imported listing"
-        desc = None
-        ai_desc = None
-        availability_val = None
-        price_cents = _normalize_price_cents(None)
-        images: list[str] = []
-        address = None
-
-        # Try AI extraction first if API key provided
-        bedrooms_val = None
-        bathrooms_val = None
-        furnished_val = None
-        pets_val = None
-        lease_term_val = None
         if settings.openai_api_key:
-            try:
-                client = OpenAI(api_key=settings.openai_api_key)
-                pj = raw.payload or {}
-                raw_json = pj.get("raw_json") if isinstance(pj, dict) else None
-                raw_html = pj.get("raw_html") if isinstance(pj, dict) else None
-                raw_text = pj.get("raw_text") if isinstance(pj, dict) else None
-                prompt = (
-                    "You are an expert rental listing analyzer. Analyze ALL the provided raw data comprehensively. "
-                    "IMPORTANT: Use ALL available data sources (raw_text, raw_html, raw_json) to reconstruct complete information. "
-                    "If description appears truncated (ends with '...', 'See more', etc.), use context from raw_text and raw_html to reconstruct the full description. "
-                    "\n\nYou MUST return ONLY a valid JSON object (no other text) with these exact keys:\n"
-                    "{\n"
-                    "  \"title\": \"clean, descriptive title\",\n"
-                    "  \"description\": \"original description from listing\",\n"
-                    "  \"ai_description\": \"YOUR comprehensive analysis combining all available information about the rental unit, including features, location details, amenities, condition, and insights\",\n"
-                    "  \"price\": \"1500\",\n"
-                    "  \"currency\": \"CAD\",\n"
-                    "  \"bedrooms\": 2,\n"
-                    "  \"bathrooms\": 1.5,\n"
-                    "  \"furnished\": true,\n"
-                    "  \"pets_allowed\": false,\n"
-                    "  \"lease_term\": \"12 months\",\n"
-                    "  \"address\": \"full address or location\",\n"
-                    "  \"availability\": \"availability information\",\n"
-                    "  \"images\": [\"array\", \"of\", \"image\", \"URLs\"]\n"
-                    "}\n\n"
-                    "CRITICAL: Return ONLY the JSON object. No explanations, no markdown, no additional text."
-                )
-                content = (
-                    f"URL: {url}\n" +
-                    (f"RAW_JSON: {raw_json}\n" if raw_json else "") +
-                    (f"RAW_TEXT (truncated): {str(raw_text)[:8000]}\n" if raw_text else "") +
-                    (f"RAW_HTML (truncated): {str(raw_html)[:2000]}\n" if raw_html else "")
-                )
-                completion = client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[
-                        {"role": "system", "content": prompt},
-                        {"role": "user", "content": content},
-                    ],
-                    temperature=0.1,
-                )
-                text = completion.choices[0].message.content or "{}"
-                print(f"OpenAI Response: {text[:500]}...")
-                
-                # Try to extract JSON from the response
-                import json
-                import re
-                
-                # Look for JSON in the response
-                json_match = re.search(r'\{.*\}', text, re.DOTALL)
-                if json_match:
-                    json_text = json_match.group(0)
-                else:
-                    json_text = text
-                
-                try:
-                    data = json.loads(json_text)
-                except json.JSONDecodeError:
-                    print(f"Failed to parse JSON: {json_text[:200]}...")
-                    data = {}
-                # 1. TITLE: Use original extension title, fallback to AI if bad
-                ai_title = data.get("title")
-                
-                # Check if extension title is good (not UI text)
-                extension_title_is_good = (
-                    title and 
-                    len(title) > 5 and 
-                    not any(word in title.lower() for word in ['notification', 'unread', 'facebook', 'marketplace', 'menu', 'message', 'imported'])
-                )
-                
-                if extension_title_is_good:
-                    # Use the original extension title
-                    print(f"✅ Using extension title: {title}")
-                elif ai_title and len(ai_title) > 10:
-                    # Fallback to AI title if extension title is bad
-                    title = ai_title
-                    print(f"🤖 Using AI title (extension title was bad): {title}")
-                else:
-                    # Final fallback
-                    title = "Property Listing"
-                    print(f"⚠️ Using generic fallback title: {title}")
-                
-                # 2. DESCRIPTION: Use ORIGINAL extension description, not AI description
-                original_desc = raw_json.get("description_text", "").strip()
-                if original_desc and len(original_desc) > 20:
-                    desc = original_desc  # Use the original Facebook description
-                    print(f"✅ Using original description ({len(desc)} chars)")
-                else:
-                    # Fallback to current description if no original found
-                    print(f"⚠️ No good original description, using current ({len(desc)} chars)")
-                
-                # 3. AI ANALYSIS: Keep as separate field
-                ai_desc = data.get("ai_description")
-                availability_val = data.get("availability")
-                price_cents = _normalize_price_cents(data.get("price")) or price_cents
-                address = data.get("address") or address
-                images = data.get("images") or images
-                # typed fields
-                try:
-                    b = data.get("bedrooms")
-                    bedrooms_val = int(b) if b is not None else None
-                except Exception:
-                    bedrooms_val = None
-                try:
-                    ba = data.get("bathrooms")
-                    bathrooms_val = float(ba) if ba is not None and str(ba) != "" else None
-                except Exception:
-                    bathrooms_val = None
-                furnished_val = data.get("furnished") if isinstance(data.get("furnished"), bool) else None
-                pets_val = data.get("pets_allowed") if isinstance(data.get("pets_allowed"), bool) else None
-                lease_term_val = data.get("lease_term") if isinstance(data.get("lease_term"), str) else None
-            except Exception as e:
-                # Log the error for debugging
-                print(f"OpenAI API Error: {str(e)}")
-                # fallback to heuristics
-                pass
-
-        # Minimal heuristics from raw payload as fallback/augmentation
-        pj = raw.payload or {}
-        if isinstance(pj, dict):
-            if pj.get("raw_json") and isinstance(pj["raw_json"], dict):
-                j = pj["raw_json"]
-                title = j.get("title") or title
-                # Prefer explicit description_text > meta description > fallback
-                desc = j.get("description_text") or j.get("description_meta") or j.get("description") or desc
-                price_cents = _normalize_price_cents(j.get("price")) or price_cents
-                # Merge all image candidates (DOM imgs + og:image + background + all_images)
-                imgs = []
-                image_sources = [
-                    j.get("images") or [],
-                    j.get("images_meta") or [],
-                    j.get("background_images") or [],
-                    j.get("all_images") or []
-                ]
-                
-                for arr in image_sources:
-                    if isinstance(arr, list):
-                        for u in arr:
-                            if isinstance(u, str) and u.startswith("http") and u not in imgs:
-                                # Clean up image URLs
-                                clean_url = u.split('?')[0]  # Remove query params
-                                if clean_url not in imgs and any(ext in clean_url.lower() for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-                                    imgs.append(clean_url)
-                
-                if imgs:
-                    images = imgs[:12]  # Limit to 12 images
-                # Prefer explicit location_text if it looks like an address
-                address = j.get("address") or j.get("location_text") or address
-                # Capture canonical/original URL if present
-                if j.get("canonical_url"):
-                    url = j.get("canonical_url")
-
-            # Heuristic typed field extraction from raw_text as a fallback
-            rt = pj.get("raw_text") if isinstance(pj, dict) else None
-            if isinstance(rt, str) and rt:
-                import re
-                # bedrooms: look for '2 bed', '2br', '2 bd', '2 bedrooms'
-                if bedrooms_val is None:
-                    m = re.search(r"(\d+)\s*(?:bedrooms?|beds?|br|bd)\b", rt, flags=re.IGNORECASE)
-                    if m:
-                        try:
-                            bedrooms_val = int(m.group(1))
-                        except Exception:
-                            pass
-                # bathrooms: '1.5 bath', '2 ba', '2 bathrooms'
-                if bathrooms_val is None:
-                    m = re.search(r"(\d+(?:\.\d+)?)\s*(?:bath(?:rooms?)?|ba)\b", rt, flags=re.IGNORECASE)
-                    if m:
-                        try:
-                            bathrooms_val = float(m.group(1))
-                        except Exception:
-                            pass
-                # furnished/unfurnished
-                if furnished_val is None:
-                    if re.search(r"\bunfurnished\b", rt, flags=re.IGNORECASE):
-                        furnished_val = False
-                    elif re.search(r"\bfurnished\b", rt, flags=re.IGNORECASE):
-                        furnished_val = True
-                # pets allowed
-                if pets_val is None:
-                    if re.search(r"\b(no\s+pets|pets\s*not\s*allowed)\b", rt, flags=re.IGNORECASE):
-                        pets_val = False
-                    elif re.search(r"\b(pets\s*ok|pet\s*friendly|pets\s*allowed|cats\s*ok|dogs\s*ok)\b", rt, flags=re.IGNORECASE):
-                        pets_val = True
-                # lease term: try to pull '12 month', '1 year', 'month-to-month'
-                if lease_term_val is None:
-                    m = re.search(r"(\d+\s*(?:month|months|year|years)|month-?to-?month)", rt, flags=re.IGNORECASE)
-                    if m:
-                        lease_term_val = m.group(1)
-
-        lat, lng = (None, None)
-        if address:
-            lat, lng = _geocode(address)
-
-        # Dedup by simple key
-        first_image = images[0] if images else None
-        key = _dedup_key("marketplace", title, price_cents, first_image)
-
-        # capture additional attributes blob for anything extra LLM extracts
-        # Preserve additional extracted attributes if present
-        extra_attrs = {}
+            rows = db.execute(
+                select(RawPayload.id, RawPayload.url, RawPayload.payload_zstd, RawPayload.payload)
+                .where(RawPayload.id.in_(payload_ids))
+            ).all()
+            items = [(pid, url or "", load_payload(blob, pj)) for pid, url, blob, pj in rows]
+            with observe_step("llm_batch"):
+                extracted = run_extractions(items)
+        staged = 0
+        for payload_id in payload_ids:
+            fields = _extract_fields(db, payload_id, extracted.get(payload_id))
+            if fields is None:
+                continue
+            stage_put(payload_id, fields)
+            chain(enrich_payload.s(payload_id), persist_payload.s(), notify_listing_change.s()).apply_async()
+            staged += 1
+    return staged
+
+
+@celery_app.task
+def enrich_payload(payload_id: int) -> int | None:
+    """Stage 2 (queue "enrich"): geocoding and other network lookups."""
+    fields = stage_get(payload_id)
+    if fields is None:
+        return None
+    stage_put(payload_id, _enrich_fields(fields))
+    return payload_id
+
+
+@celery_app.task
+def persist_payload(payload_id: int | None) -> dict | None:
+    """Stage 3 (queue "persist"): campus tagging, de-duplication and the listing upsert."""
+    if payload_id is None:
+        return None
+    fields = stage_get(payload_id)
+    if fields is None:
+        return None
+    with SessionLocal() as db:
+        result = _persist_fields(db, fields)
+    stage_delete(payload_id)
+    return result
+
+
+@celery_app.task
+def notify_listing_change(result: dict | None) -> dict | None:
+    """Stage 4 (queue "index"): cache invalidation and follow-up image work."""
+    if result is None:
+        return None
+    return _notify(result)
+
+
+def _extract_fields(db: Session, payload_id: int, extracted: dict | None = None) -> dict | None:
+    """Listing fields from a raw payload; ``extracted`` is a prefetched LLM result."""
+    raw = db.scalars(select(RawPayload).where(RawPayload.id == payload_id)).first()
+    if not raw:
+        return None
+    raw_payload = load_payload(raw.payload_zstd, raw.payload)
+
+    url = raw.url or ""
+    title = "Imported listing"
+    desc = None
+    ai_desc = None
+    availability_val = None
+    price_cents = normalize_price_cents(None)
+    images: list[str] = []
+    address = None
+
+    # Try AI extraction first if API key provided
+    bedrooms_val = None
+    bathrooms_val = None
+    furnished_val = None
+    pets_val = None
+    lease_term_val = None
+    if settings.openai_api_key:
         try:
-            if settings.openai_api_key and 'data' in locals() and isinstance(data, dict):
-                for k in ("unit_size", "utilities_included", "parking", "laundry", "floor", "building_type"):
-                    if data.get(k) is not None:
-                        extra_attrs[k] = data.get(k)
-        except Exception:
-            pass
-
-        listing = Listing(
-            source="marketplace",
-            source_id=url,
-            title=title,
-            description=desc,
-            ai_description=ai_desc,
-            price_cents=price_cents or 0,
-            currency="CAD",
-            raw_address=address,
-            availability=availability_val,
-            original_url=url,
-            latitude=lat,
-            longitude=lng,
-            posted_at=datetime.utcnow(),
-            dedup_key=key,
-            bedrooms=bedrooms_val,
-            bathrooms=bathrooms_val,
-            furnished=furnished_val,
-            pets_allowed=pets_val,
-            lease_term=lease_term_val,
-            attributes=extra_attrs or None,
+            pj = raw_payload
+            raw_json = pj.get("raw_json") if isinstance(pj, dict) else None
+            if extracted is not None:
+                data = extracted
+            else:
+                data = extract_listing_data(url, pj if isinstance(pj, dict) else {})
+            # 1. TITLE: Use original extension title, fallback to AI if bad
+            ai_title = data.get("title")
+            
+            # Check if extension title is good (not UI text)
+            extension_title_is_good = (
+                title and 
+                len(title) > 5 and 
+                not any(word in title.lower() for word in ['notification', 'unread', 'facebook', 'marketplace', 'menu', 'message', 'imported'])
+            )
+            
+            if extension_title_is_good:
+                # Use the original extension title
+                logger.debug("Using extension title", extra={"payload_id": payload_id, "title": title})
+            elif ai_title and len(ai_title) > 10:
+                # Fallback to AI title if extension title is bad
+                title = ai_title
+                logger.debug("Using AI title (extension title was bad)", extra={"payload_id": payload_id, "title": title})
+            else:
+                # Final fallback
+                title = "Property Listing"
+                logger.debug("Using generic fallback title", extra={"payload_id": payload_id})
+            
+            # 2. DESCRIPTION: Use ORIGINAL extension description, not AI description
+            original_desc = raw_json.get("description_text", "").strip()
+            if original_desc and len(original_desc) > 20:
+                desc = original_desc  # Use the original Facebook description
+                logger.debug("Using original description", extra={"payload_id": payload_id, "chars": len(desc)})
+            else:
+                # Fallback to current description if no original found
+                logger.debug("No good original description", extra={"payload_id": payload_id, "chars": len(desc or "")})
+            
+            # 3. AI ANALYSIS: Keep as separate field
+            ai_desc = data.get("ai_description")
+            availability_val = data.get("availability")
+            price_cents = normalize_price_cents(data.get("price")) or price_cents
+            address = data.get("address") or address
+            images = data.get("images") or images
+            # typed fields
+            try:
+                b = data.get("bedrooms")
+                bedrooms_val = int(b) if b is not None else None
+            except Exception:
+                bedrooms_val = None
+            try:
+                ba = data.get("bathrooms")
+                bathrooms_val = float(ba) if ba is not None and str(ba) != "" else None
+            except Exception:
+                bathrooms_val = None
+            furnished_val = data.get("furnished") if isinstance(data.get("furnished"), bool) else None
+            pets_val = data.get("pets_allowed") if isinstance(data.get("pets_allowed"), bool) else None
+            lease_term_val = data.get("lease_term") if isinstance(data.get("lease_term"), str) else None
+        except Exception as e:
+            # fall back to heuristics
+            logger.warning("OpenAI extraction failed", extra={"payload_id": payload_id, "error": str(e)})
+
+    # Per-source heuristics from raw payload as fallback/augmentation
+    pj = raw_payload
+    if isinstance(pj, dict):
+        # raw.source only picks the extractor; listings keep the "marketplace" source they always had
+        h = get_extractor(raw.source).extract(pj)
+        # raw_json fields captured by the extension take precedence over the model
+        title = h.title or title
+        desc = h.description or desc
+        price_cents = h.price_cents or price_cents
+        if h.images:
+            images = h.images
+        address = h.address or address
+        if h.canonical_url:
+            url = h.canonical_url
+        # Text heuristics only fill gaps
+        if bedrooms_val is None:
+            bedrooms_val = h.bedrooms
+        if bathrooms_val is None:
+            bathrooms_val = h.bathrooms
+        if furnished_val is None:
+            furnished_val = h.furnished
+        if pets_val is None:
+            pets_val = h.pets_allowed
+        if lease_term_val is None:
+            lease_term_val = h.lease_term
+
+    # capture additional attributes blob for anything extra LLM extracts
+    # Preserve additional extracted attributes if present
+    extra_attrs = {}
+    try:
+        if settings.openai_api_key and 'data' in locals() and isinstance(data, dict):
+            for k in ("unit_size", "utilities_included", "parking", "laundry", "floor", "building_type"):
+                if data.get(k) is not None:
+                    extra_attrs[k] = data.get(k)
+    except Exception:
+        pass
+
+    return {
+        "source": "marketplace",
+        "url": url,
+        "title": title,
+        "description": desc,
+        "ai_description": ai_desc,
+        "availability": availability_val,
+        "price_cents": price_cents,
+        "images": images,
+        "address": address,
+        "bedrooms": bedrooms_val,
+        "bathrooms": bathrooms_val,
+        "furnished": furnished_val,
+        "pets_allowed": pets_val,
+        "lease_term": lease_term_val,
+        "attributes": extra_attrs,
+    }
+
+
+def _enrich_fields(fields: dict) -> dict:
+    lat, lng = (None, None)
+    if fields.get("address"):
+        with observe_step("geocode"):
+            lat, lng = _geocode(fields["address"])
+    return {**fields, "latitude": lat, "longitude": lng}
+
+
+def _persist_fields(db: Session, fields: dict) -> dict:
+    """Write the listing, its images and an outbox entry in one transaction."""
+    source, url, title, desc = fields["source"], fields["url"], fields["title"], fields["description"]
+    price_cents, images, address = fields["price_cents"], fields["images"], fields["address"]
+    lat, lng = fields.get("latitude"), fields.get("longitude")
+    bedrooms_val = fields["bedrooms"]
+
+    # campus tagging, persisted on the listing for indexed filtering
+    campus_id, campus_name, dist_km = (None, None, None)
+    if lat is not None and lng is not None:
+        with observe_step("campus_lookup"):
+            campus_id, campus_name, dist_km = _nearest_campus(db, lat, lng)
+
+    # Dedup by simple key
+    first_image = images[0] if images else None
+    key = _dedup_key(source, title, price_cents, first_image)
+
+    values = dict(
+        source=source,
+        source_id=url,
+        title=title,
+        description=desc,
+        ai_description=fields["ai_description"],
+        price_cents=price_cents or 0,
+        currency="CAD",
+        raw_address=address,
+        availability=fields["availability"],
+        original_url=url,
+        latitude=lat,
+        longitude=lng,
+        posted_at=datetime.utcnow(),
+        dedup_key=key,
+        bedrooms=bedrooms_val,
+        bathrooms=fields["bathrooms"],
+        furnished=fields["furnished"],
+        pets_allowed=fields["pets_allowed"],
+        lease_term=fields["lease_term"],
+        attributes=fields["attributes"] or None,
+        nearest_campus_id=campus_id,
+        campus_distance_km=dist_km,
+    )
+
+    existing = db.execute(
+        select(Listing.id, Listing.attributes, Listing.latitude, Listing.longitude)
+        .where(Listing.source == source, Listing.source_id == url)
+    ).first()
+    signature = text_signature(title, desc)
+    duplicate_of = None
+    previous_point = (existing.latitude, existing.longitude) if existing is not None else (None, None)
+    if existing is not None:
+        _keep_duplicate_urls(values, existing.attributes)
+        with observe_step("upsert"):
+            listing_id, changed = _upsert_listing(db, values)
+    else:
+        # Near-duplicate text (reposts with a tweaked title or price) refreshes the existing row
+        with observe_step("near_dup"):
+            duplicate_of = find_text_duplicate(db, signature, bedrooms_val) if signature else None
+        with observe_step("upsert"):
+            if duplicate_of is not None:
+                previous_point = tuple(db.execute(
+                    select(Listing.latitude, Listing.longitude).where(Listing.id == duplicate_of)
+                ).one())
+                listing_id, changed = _merge_duplicate(db, duplicate_of, values)
+            else:
+                listing_id, changed = _upsert_listing(db, values)
+    if signature and changed:
+        index_text_signature(db, listing_id, signature)
+    # Seen again: keeps the listing out of the stale sweep even when nothing changed
+    touch_last_seen(db, listing_id)
+
+    with observe_step("sync_images"):
+        images_changed, images_added = _sync_images(db, listing_id, images[:12])
+    if changed or images_changed:
+        # Search index update is drained asynchronously from the outbox
+        enqueue_listing_change(db, listing_id)
+        with observe_step("spam_score"):
+            score_listings(db, [listing_id])
+    with observe_step("commit"):
+        db.commit()
+
+    return {
+        "status": "ok" if changed or images_changed else "unchanged",
+        "listing_id": listing_id,
+        "duplicate_of": duplicate_of,
+        "campus": campus_name,
+        "distance_km": dist_km,
+        "changed": changed,
+        "images_added": images_added,
+        "points": [previous_point, (lat, lng)],
+    }
+
+
+def _notify(result: dict) -> dict:
+    """Post-commit side effects of a persisted payload; returns the public task result."""
+    if result["status"] == "ok":
+        invalidate_listings()
+    if result["changed"]:
+        invalidate_tiles(result["points"])
+    if result["images_added"]:
+        process_listing_images.delay(result["listing_id"])
+    return {k: result[k] for k in ("status", "listing_id", "duplicate_of", "campus", "distance_km")}
+
+
+# Set on first insert only: posted_at records the first sighting
+_UPSERT_IMMUTABLE = {"source", "source_id", "posted_at"}
+# A merged repost never takes over the canonical listing's identity; its URL goes to duplicate_urls
+_MERGE_PRESERVED = _UPSERT_IMMUTABLE | {"original_url", "collected_at"}
+
+
+def _keep_duplicate_urls(values: dict, current_attributes: dict | None) -> None:
+    seen_urls = (current_attributes or {}).get("duplicate_urls") if isinstance(current_attributes, dict) else None
+    if seen_urls:
+        values["attributes"] = {**(values.get("attributes") or {}), "duplicate_urls": seen_urls}
+
+
+def _upsert_listing(db: Session, values: dict) -> tuple[int, bool]:
+    """INSERT ... ON CONFLICT (source, source_id) DO UPDATE, skipping the write when nothing changed.
+
+    Returns (listing_id, written).
+    """
+    stmt = pg_insert(Listing).values(**values)
+    columns = [c for c in values if c not in _UPSERT_IMMUTABLE]
+    table = Listing.__table__
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.source, table.c.source_id],
+        set_={c: stmt.excluded[c] for c in columns},
+        where=or_(*(table.c[c].is_distinct_from(stmt.excluded[c]) for c in columns)),
+    ).returning(table.c.id)
+    listing_id = db.execute(stmt).scalar()
+    if listing_id is None:
+        # Already up to date, possibly inserted by a concurrent ingest after our lookup: RETURNING is empty
+        listing_id = db.scalar(
+            select(Listing.id).where(Listing.source == values["source"], Listing.source_id == values["source_id"])
         )
-        db.add(listing)
-        db.flush()
+        return listing_id, False
+    return listing_id, True
+
+
+def _merge_duplicate(db: Session, listing_id: int, values: dict) -> tuple[int, bool]:
+    """Fold a repost into the near-duplicate listing it matched; only changed columns are written."""
+    listing = db.get(Listing, listing_id)
+    seen_urls = list((listing.attributes or {}).get("duplicate_urls") or [])
+    repost_url = values.get("original_url")
+    if repost_url and repost_url != listing.original_url and repost_url not in seen_urls:
+        seen_urls = (seen_urls + [repost_url])[-20:]
+    if seen_urls:
+        values["attributes"] = {**(values.get("attributes") or {}), "duplicate_urls": seen_urls}
+    values["cluster_id"] = listing.cluster_id or listing.id
+    changed = False
+    for field, value in values.items():
+        if field not in _MERGE_PRESERVED and getattr(listing, field) != value:
+            setattr(listing, field, value)
+            changed = True
+    db.flush()
+    return listing.id, changed
+
+
+def _sync_images(db: Session, listing_id: int, urls: list[str]) -> tuple[bool, bool]:
+    """Diff a listing's images against ``urls``; returns (anything_changed, images_added).
+
+    Unchanged images keep their row, checksum and variants, so they are not downloaded again.
+    """
+    wanted = {u: idx for idx, u in enumerate(urls)}
+    current: dict[str, tuple[int, int]] = {}
+    stale: list[int] = []
+    for image_id, url, order_index in db.execute(
+        select(ListingImage.id, ListingImage.url, ListingImage.order_index).where(ListingImage.listing_id == listing_id)
+    ):
+        if url in wanted and url not in current:
+            current[url] = (image_id, order_index)
+        else:
+            stale.append(image_id)
+    if stale:
+        db.execute(delete(ListingImage).where(ListingImage.id.in_(stale)))
+    moved = [
+        {"id": image_id, "order_index": wanted[url]}
+        for url, (image_id, order_index) in current.items()
+        if order_index != wanted[url]
+    ]
+    if moved:
+        db.execute(update(ListingImage), moved)
+    added = [ListingImage(listing_id=listing_id, url=u, order_index=idx) for u, idx in wanted.items() if u not in current]
+    db.add_all(added)
+    return bool(stale or moved or added), bool(added)
+
+
+@celery_app.task
+def process_listing_images(listing_id: int) -> dict:
+    """Download a listing's images once, record checksum/dimensions and store WebP variants."""
+    with SessionLocal() as db:
+        pending = db.execute(
+            select(ListingImage.id, ListingImage.url)
+            .where(ListingImage.listing_id == listing_id, ListingImage.checksum.is_(None))
+        ).all()
+        if not pending:
+            return {"status": "ok", "processed": 0}
+        results = asyncio.run(process_images([(image_id, url) for image_id, url in pending]))
+        done = [
+            {"id": r.image_id, "checksum": r.checksum, "width": r.width, "height": r.height, "phash": r.phash}
+            for r in results
+            if r.error is None
+        ]
+        duplicate_of = None
+        if done:
+            db.execute(update(ListingImage), done)
+            hashes = [(d["id"], d["phash"]) for d in done if d["phash"] is not None]
+            index_image_hashes(db, listing_id, hashes)
+            # Re-hosted photos of an already-known listing: fold this one into that cluster
+            duplicate_of = find_image_duplicate(db, listing_id, [phash for _, phash in hashes])
+            if duplicate_of is not None and duplicate_of > listing_id:
+                # Keep the older listing canonical
+                duplicate_of = None
+            if duplicate_of is not None:
+                canonical = db.get(Listing, duplicate_of)
+                if canonical.cluster_id is None:
+                    canonical.cluster_id = canonical.id
+                listing = db.get(Listing, listing_id)
+                listing.status = "duplicate"
+                listing.cluster_id = canonical.cluster_id
+                enqueue_listing_change(db, listing_id)
+                point = (listing.latitude, listing.longitude)
+            # Checksums are known now, so reused photos count towards the score
+            score_listings(db, [listing_id])
+            db.commit()
+            invalidate_listings()
+            if duplicate_of is not None:
+                invalidate_tiles([point])
+    return {
+        "status": "ok",
+        "processed": len(done),
+        "failed": len(results) - len(done),
+        "duplicate_of": duplicate_of,
+    }
+
+
+@celery_app.task
+def retag_campuses(batch_size: int = 1000) -> dict:
+    """Recompute nearest campus for every geocoded listing (run after campuses change)."""
+    invalidate_campus_index()
+    updated = 0
+    last_id = 0
+    with SessionLocal() as db:
+        index = get_campus_index(db)
+        while True:
+            rows = db.execute(
+                select(Listing.id, Listing.latitude, Listing.longitude)
+                .where(Listing.id > last_id, Listing.latitude.is_not(None), Listing.longitude.is_not(None))
+                .order_by(Listing.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            params = []
+            for listing_id, lat, lng in rows:
+                found = index.nearest(lat, lng)
+                campus_id, _, dist_km = found if found else (None, None, None)
+                params.append({"id": listing_id, "nearest_campus_id": campus_id, "campus_distance_km": dist_km})
+            db.execute(update(Listing), params)
+            db.commit()
+            invalidate_listings()
+            updated += len(params)
+            last_id = rows[-1][0]
+    return {"status": "ok", "updated": updated}
+
 
-        # Always attach the current images for this listing; clear old ones if reprocessing same source_id
-        db.query(ListingImage).filter(ListingImage.listing_id == listing.id).delete()
-        for idx, u in enumerate(images[:12]):
-            db.add(ListingImage(listing_id=listing.id, url=u, order_index=idx))
+@celery_app.task
+def drain_listing_outbox() -> dict:
+    """Flush pending listing changes to OpenSearch in bulk batches."""
+    totals = {"batches": 0, "indexed": 0, "failed": 0}
+    with SessionLocal() as db:
+        for _ in range(max(1, settings.outbox_max_batches_per_run)):
+            result = drain_outbox_batch(db, settings.outbox_batch_size)
+            totals["batches"] += 1
+            totals["indexed"] += result["indexed"]
+            totals["failed"] += result["failed"]
+            # Stop on backpressure or once the backlog is drained; beat schedules the next run
+            if result["throttled"] or result["claimed"] < settings.outbox_batch_size:
+                break
+    return totals
 
+
+@celery_app.task
+def reindex_all_listings() -> dict:
+    """Queue every listing for (re)indexing, e.g. after recreating the index."""
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        result = db.execute(
+            insert(ListingOutbox).from_select(
+                ["listing_id", "op", "created_at", "available_at"],
+                select(Listing.id, literal("upsert"), literal(now), literal(now)),
+            )
+        )
         db.commit()
+    return {"status": "queued", "count": result.rowcount}
 
-        # campus tagging (optional, read results only)
-        campus_name, dist_km = (None, None)
-        if lat is not None and lng is not None:
-            campus_name, dist_km = _nearest_campus(db, lat, lng)
 
-        return {"status": "ok", "listing_id": listing.id, "campus": campus_name, "distance_km": dist_km}
+def dispatch_payloads(payload_ids: list[int]) -> None:
+    """Queue processing for many payloads with one broker publish per chunk."""
+    if not payload_ids:
+        return
+    size = max(1, settings.ingest_dispatch_chunk_size)
+    chunks = [payload_ids[i:i + size] for i in range(0, len(payload_ids), size)]
+    group(extract_payloads.s(chunk) for chunk in chunks).apply_async()
 
 
+@celery_app.task
+def maintain_raw_payload_partitions() -> dict:
+    """Create upcoming monthly raw_payloads partitions and expire ones past retention."""
+    with engine.begin() as conn:
+        created = ensure_partitions(conn, settings.raw_payload_partitions_ahead)
+        expired = expire_partitions(conn, settings.raw_payload_retention_days, settings.raw_payload_retention_mode)
+    return {"status": "ok", "created": created, "expired": expired}
+
+
+@celery_app.task
+def expire_stale_listings() -> dict:
+    """Archive listings not seen for ``listing_expire_after_days``, one small transaction per batch."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.listing_expire_after_days)
+    expired = 0
+    with SessionLocal() as db:
+        for _ in range(max(1, settings.listing_expire_max_batches_per_run)):
+            archived = archive_stale_listings(db, cutoff, settings.listing_expire_batch_size)
+            db.commit()
+            invalidate_tiles((lat, lng) for _, lat, lng in archived)
+            expired += len(archived)
+            if len(archived) < settings.listing_expire_batch_size:
+                break
+    if expired:
+        invalidate_listings()
+    return {"status": "ok", "expired": expired}
+
+
+@celery_app.task
+def rebuild_listing_facet_counts() -> dict:
+    """Recompute the facet counter cube from listings to repair any drift."""
+    with SessionLocal() as db:
+        rebuild_facet_counts(db)
+        db.commit()
+    invalidate_listings()
+    return {"status": "ok"}
+
+
+@celery_app.task
+def score_listing_spam() -> dict:
+    """Refresh the price medians and rescore every active listing, one transaction per batch."""
+    updated = scored = 0
+    last_id = 0
+    with SessionLocal() as db:
+        medians = refresh_price_medians(db)
+        while True:
+            ids = db.scalars(
+                select(Listing.id)
+                .where(Listing.id > last_id, Listing.status == "active")
+                .order_by(Listing.id)
+                .limit(settings.spam_score_batch_size)
+            ).all()
+            if not ids:
+                break
+            updated += score_listings(db, ids, medians)
+            db.commit()
+            scored += len(ids)
+            last_id = ids[-1]
+    if updated:
+        invalidate_listings()
+    return {"status": "ok", "scored": scored, "updated": updated}
@@ -0,0 +1,70 @@
+"""Sweep GET /api/listings over increasing client concurrency and report p99 per level.
+
+Usage (from api/):
+    python -m bench.concurrency --levels 16,64,256,512 --duration 20
+    python -m bench.concurrency --mix filtered=1 --output sweep.json --baseline sweep-base.json
+
+Each level is a separate closed-loop run of the ``bench.load listings``
+scenario (same ``--mix``), so the curve shows where latency turns up as
+in-flight requests outgrow the API's worker and connection pools. Results
+are keyed ``levels.c<N>`` and compared against a baseline like any other
+benchmark; ``pool`` records the API's pool settings for the run.
+"""
+import argparse
+import asyncio
+import sys
+
+from bench.load import run_listings
+from bench.results import add_result_arguments, emit
+
+
+def _pool_settings() -> dict:
+    try:
+        from app.config import settings
+    except Exception:
+        return {}
+    return {
+        "db_pool_size": settings.db_pool_size,
+        "db_max_overflow": settings.db_max_overflow,
+        "async_db_pool_size": settings.async_db_pool_size,
+        "async_db_max_overflow": settings.async_db_max_overflow,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--levels", default="16,64,256,512", help="Comma-separated client concurrency levels")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per level")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mix", default="filtered=5,bbox=2,deep_offset=1,cursor=2")
+    parser.add_argument("--max-offset", type=int, default=10_000)
+    parser.add_argument("--cursor-pages", type=int, default=50)
+    parser.add_argument("--campus-ids", default="1,2,3,4,5,6,7,8,9,10")
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    levels: dict[str, dict] = {}
+    for level in (int(v) for v in args.levels.split(",")):
+        args.concurrency = level
+        run = asyncio.run(run_listings(args))
+        levels[f"c{level}"] = {
+            "requests": run["requests"],
+            "errors": run["errors"],
+            "rps": run["rps"],
+            "latency_ms": run["latency_ms"],
+        }
+        print(f"c={level}: {run['rps']:.0f} rps, p99 {run['latency_ms']['p99']} ms", file=sys.stderr)
+
+    result = {
+        "benchmark": "concurrency.listings",
+        "config": {"levels": args.levels, "duration": args.duration, "mix": args.mix},
+        "pool": _pool_settings(),
+        "levels": levels,
+    }
+    return emit(result, args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Micro-benchmark for the heuristic extractors over saved RawPayload rows.
+
+Usage (from api/):
+    python -m bench.extractors --limit 5000 --output extractors.json
+    python -m bench.extractors --corpus payloads.jsonl --baseline extractors.json
+
+The corpus is read from the ``raw_payloads`` table by default, or from a
+JSONL file of ``{"source": ..., "payload": {...}}`` objects. Results are
+compared against a baseline like any other benchmark (see bench.results).
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+
+from bench.results import add_result_arguments, emit
+
+
+def load_corpus_from_db(limit: int) -> list[tuple[str, dict]]:
+    from sqlalchemy import select
+
+    from app.db import SessionLocal
+    from app.models import RawPayload
+    from app.payloads import load_payload
+
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(RawPayload.source, RawPayload.payload_zstd, RawPayload.payload)
+            .order_by(RawPayload.id.desc())
+            .limit(limit)
+        ).all()
+    corpus = [(source, load_payload(blob, payload)) for source, blob, payload in rows]
+    return [(source, payload) for source, payload in corpus if isinstance(payload, dict)]
+
+
+def load_corpus_from_file(path: str, limit: int) -> list[tuple[str, dict]]:
+    corpus = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            corpus.append((item.get("source", "marketplace"), item["payload"]))
+            if len(corpus) >= limit:
+                break
+    return corpus
+
+
+def run(corpus: list[tuple[str, dict]], repeat: int) -> dict:
+    from app.extractors import get_extractor
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for source, payload in corpus:
+            get_extractor(source).extract(payload)
+        timings.append(time.perf_counter() - start)
+    best = min(timings)
+    return {
+        "benchmark": "extractors",
+        "config": {"documents": len(corpus), "repeat": repeat},
+        "best_seconds": best,
+        "median_seconds": statistics.median(timings),
+        "docs_per_second": len(corpus) / best if best else None,
+        "us_per_doc": best / len(corpus) * 1e6 if corpus else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="JSONL corpus instead of the raw_payloads table")
+    parser.add_argument("--limit", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus_from_file(args.corpus, args.limit) if args.corpus else load_corpus_from_db(args.limit)
+    if not corpus:
+        print("No payloads to benchmark", file=sys.stderr)
+        return 2
+    return emit(run(corpus, args.repeat), args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Local stand-ins for OpenAI, Nominatim and image CDNs with configurable latency.
+
+Usage (from api/):
+    python -m bench.fakes --port 9100 --openai-latency-ms 800 --geocode-latency-ms 150 --cdn-latency-ms 40
+
+Then point the API and workers at it:
+    OPENAI_API_KEY=fake OPENAI_BASE_URL=http://localhost:9100/v1
+    GEOCODER_URL=http://localhost:9100/search
+
+Responses are deterministic per input: the chat endpoint echoes fields from
+the RAW_JSON line(s) of the prompt (micro-batched prompts get an ``items``
+array), the geocoder hashes the query to a point near a campus, and
+``/img/<key>.jpg`` serves a JPEG of ``?w=`` width. Each latency is
+``value * (1 +/- jitter)``; ``--*-error-rate`` returns 500s.
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import random
+import re
+import time
+from functools import lru_cache
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from bench import synthetic
+
+
+_RAW_JSON_RE = re.compile(r"^RAW_JSON: (.*)$", re.MULTILINE)
+_ITEM_RE = re.compile(r"^### ITEM \d+$", re.MULTILINE)
+_PRICE_RE = re.compile(r"[\d,]+")
+
+
+def _extraction(model_input: str) -> dict:
+    match = _RAW_JSON_RE.search(model_input)
+    raw = json.loads(match.group(1)) if match else {}
+    price = _PRICE_RE.search(str(raw.get("price") or ""))
+    description = raw.get("description_text") or ""
+    bedrooms = re.search(r"(\d+) bed", description)
+    return {
+        "title": raw.get("title") or "Rental listing",
+        "description": description,
+        "ai_description": f"Rental near campus. {description[:200]}",
+        "price": price.group(0).replace(",", "") if price else None,
+        "currency": "CAD",
+        "bedrooms": int(bedrooms.group(1)) if bedrooms else None,
+        "bathrooms": 1,
+        "furnished": "Furnished" in description,
+        "pets_allowed": "pets allowed" in description,
+        "lease_term": "12 months",
+        "address": raw.get("location_text"),
+        "availability": "now",
+        "images": raw.get("images") or [],
+    }
+
+
+def _completion(content: str, prompt_chars: int) -> dict:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": "fake",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": prompt_chars // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (prompt_chars + len(content)) // 4},
+    }
+
+
+@lru_cache(maxsize=64)
+def _jpeg(width: int, height: int, shade: int) -> bytes:
+    from PIL import Image
+
+    image = Image.new("RGB", (width, height), (shade, 120, 255 - shade))
+    # A gradient band keeps the dHash away from the all-zero degenerate value
+    for x in range(0, width, max(1, width // 16)):
+        image.paste((x * 255 // width, shade, 90), (x, 0, x + max(1, width // 32), height))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=80)
+    return out.getvalue()
+
+
+def create_app(args: argparse.Namespace) -> FastAPI:
+    app = FastAPI(title="bench fakes")
+    rng = random.Random(args.seed)
+    stats = {"openai": 0, "geocode": 0, "cdn": 0, "errors": 0}
+
+    async def delay(ms: float) -> None:
+        if ms > 0:
+            await asyncio.sleep(ms * (1.0 + rng.uniform(-args.jitter, args.jitter)) / 1000.0)
+
+    def fail(rate: float) -> bool:
+        if rate > 0 and rng.random() < rate:
+            stats["errors"] += 1
+            return True
+        return False
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request) -> Response:
+        body = await request.json()
+        stats["openai"] += 1
+        user = next((m["content"] for m in body.get("messages", []) if m.get("role") == "user"), "")
+        await delay(args.openai_latency_ms + args.openai_ms_per_kchar * len(user) / 1000.0)
+        if fail(args.openai_error_rate):
+            return JSONResponse({"error": {"message": "fake upstream error"}}, status_code=500)
+        parts = _ITEM_RE.split(user)
+        if len(parts) > 1:
+            content = json.dumps({"items": [_extraction(p) for p in parts[1:]]})
+        else:
+            content = json.dumps(_extraction(user))
+        return JSONResponse(_completion(content, len(user)))
+
+    @app.get("/search")
+    async def nominatim(q: str = "") -> Response:
+        stats["geocode"] += 1
+        await delay(args.geocode_latency_ms)
+        if fail(args.geocode_error_rate):
+            return Response(status_code=500)
+        digest = int(hashlib.sha1(q.encode()).hexdigest(), 16)
+        if digest % 1000 < args.geocode_miss_rate * 1000:
+            return JSONResponse([])
+        _, lat, lng = synthetic.campus_point(random.Random(digest))
+        return JSONResponse([{"lat": f"{lat:.6f}", "lon": f"{lng:.6f}", "display_name": q}])
+
+    @app.get("/img/{name}")
+    async def image(name: str, w: int = 960) -> Response:
+        stats["cdn"] += 1
+        await delay(args.cdn_latency_ms)
+        if fail(args.cdn_error_rate):
+            return Response(status_code=500)
+        width = max(16, min(w, 2048))
+        shade = int(hashlib.sha1(name.encode()).hexdigest()[:2], 16)
+        return Response(_jpeg(width, width * 2 // 3, shade), media_type="image/jpeg",
+                        headers={"Cache-Control": "public, max-age=86400"})
+
+    @app.get("/stats")
+    def get_stats() -> dict:
+        return stats
+
+    return app
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--jitter", type=float, default=0.2, help="Latency jitter as a fraction")
+    parser.add_argument("--openai-latency-ms", type=float, default=800.0)
+    parser.add_argument("--openai-ms-per-kchar", type=float, default=20.0, help="Extra latency per 1000 prompt chars")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--geocode-latency-ms", type=float, default=150.0)
+    parser.add_argument("--geocode-miss-rate", type=float, default=0.05)
+    parser.add_argument("--geocode-error-rate", type=float, default=0.0)
+    parser.add_argument("--cdn-latency-ms", type=float, default=40.0)
+    parser.add_argument("--cdn-error-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    import uvicorn
+
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""Bulk-load synthetic listings, listing images and raw payloads with COPY.
+
+Usage (from api/):
+    python -m bench.generate --listings 2000000 --payloads 1000000
+    python -m bench.generate --listings 100000 --cdn-base http://localhost:9100 --seed 7 --output gen.json
+
+Rows are generated deterministically from ``--seed`` (see bench.synthetic)
+and streamed to Postgres in ``--chunk-size`` COPY batches, so memory stays
+flat at millions of rows. The facet-count trigger is disabled during the
+load and the cube rebuilt once at the end. Raw payloads are stored the way
+the ingest endpoints store them (zstd + content hash) across the last
+``--payload-days`` days; missing monthly partitions are created first.
+Search is not populated: queue ``app.tasks.reindex_all_listings`` afterwards.
+"""
+import argparse
+import csv
+import hashlib
+import io
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bench import synthetic
+from bench.results import add_result_arguments, emit
+
+
+LISTING_COLUMNS = [
+    "id", "source", "source_id", "title", "description", "price_cents", "currency", "bedrooms", "bathrooms",
+    "furnished", "pets_allowed", "lease_term", "raw_address", "original_url", "latitude", "longitude",
+    "posted_at", "collected_at", "last_seen_at", "status", "dedup_key", "nearest_campus_id", "campus_distance_km",
+]
+IMAGE_COLUMNS = ["listing_id", "url", "width", "height", "order_index"]
+PAYLOAD_COLUMNS = ["source", "url", "payload_zstd", "content_hash", "created_at"]
+
+
+def _copy(cursor, table: str, columns: list[str], rows: list[list]) -> None:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def _progress(label: str, done: int, total: int, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    print(f"{label}: {done}/{total} ({rate:,.0f} rows/s)", file=sys.stderr)
+
+
+def load_campuses(db) -> list[tuple[int, str, float, float]]:
+    from sqlalchemy import select
+    from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+    from app.models import Campus
+
+    db.execute(
+        pg_insert(Campus)
+        .values([{"name": n, "latitude": lat, "longitude": lng} for n, lat, lng in synthetic.CAMPUSES])
+        .on_conflict_do_nothing(index_elements=[Campus.name])
+    )
+    db.commit()
+    return [tuple(r) for r in db.execute(select(Campus.id, Campus.name, Campus.latitude, Campus.longitude)).all()]
+
+
+def generate_listings(conn, args, campuses) -> dict:
+    from app.campus_index import CampusIndex
+
+    index = CampusIndex(campuses)
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(max(id), 0) FROM listings")
+    next_id = cur.fetchone()[0] + 1
+    images_total = 0
+    started = time.perf_counter()
+    for chunk_start in range(0, args.listings, args.chunk_size):
+        listing_rows, image_rows = [], []
+        for key in range(chunk_start, min(args.listings, chunk_start + args.chunk_size)):
+            f = synthetic.listing_fields(rng, args.seed * 10**9 + key, now, args.cdn_base)
+            campus = index.nearest(f["latitude"], f["longitude"])
+            first_image = f["images"][0] if f["images"] else ""
+            dedup = f"{f['source']}|{f['title'].strip().lower()}|{f['price_cents']}|{first_image}"
+            listing_rows.append([
+                next_id, f["source"], f["source_id"], f["title"], f["description"], f["price_cents"], f["currency"],
+                f["bedrooms"], f["bathrooms"], f["furnished"], f["pets_allowed"], f["lease_term"],
+                f["raw_address"], f["source_id"], f["latitude"], f["longitude"], f["posted_at"],
+                f["collected_at"], f["last_seen_at"], f["status"], hashlib.sha1(dedup.encode()).hexdigest(),
+                campus[0] if campus else None, campus[2] if campus else None,
+            ])
+            for order, url in enumerate(f["images"]):
+                image_rows.append([next_id, url.split("?", 1)[0], 960, 640, order])
+            next_id += 1
+        _copy(cur, "listings", LISTING_COLUMNS, listing_rows)
+        _copy(cur, "listing_images", IMAGE_COLUMNS, image_rows)
+        conn.commit()
+        images_total += len(image_rows)
+        _progress("listings", chunk_start + len(listing_rows), args.listings, started)
+    cur.execute("SELECT setval(pg_get_serial_sequence('listings', 'id'), (SELECT max(id) FROM listings))")
+    conn.commit()
+    seconds = time.perf_counter() - started
+    return {
+        "listings": args.listings,
+        "listing_images": images_total,
+        "seconds": seconds,
+        "rows_per_second": (args.listings + images_total) / seconds if seconds else None,
+    }
+
+
+def generate_payloads(conn, args) -> dict:
+    from app.payloads import compress_payload, content_hash
+
+    rng = random.Random(args.seed + 1)
+    now = datetime.utcnow()
+    cur = conn.cursor()
+    started = time.perf_counter()
+    for chunk_start in range(0, args.payloads, args.chunk_size):
+        rows = []
+        for key in range(chunk_start, min(args.payloads, chunk_start + args.chunk_size)):
+            request = synthetic.marketplace_payload(rng, args.seed * 10**9 + key, args.cdn_base)
+            body = {"raw_html": None, "raw_json": request["raw_json"], "raw_text": request["raw_text"]}
+            created_at = now - timedelta(seconds=rng.randint(0, args.payload_days * 24 * 3600))
+            rows.append([
+                request["source"],
+                request["source_url"],
+                "\\x" + compress_payload(body).hex(),
+                content_hash(request["source"], request["source_url"], body),
+                created_at,
+            ])
+        _copy(cur, "raw_payloads", PAYLOAD_COLUMNS, rows)
+        conn.commit()
+        _progress("raw_payloads", chunk_start + len(rows), args.payloads, started)
+    seconds = time.perf_counter() - started
+    return {
+        "raw_payloads": args.payloads,
+        "seconds": seconds,
+        "rows_per_second": args.payloads / seconds if seconds else None,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--payloads", type=int, default=100_000)
+    parser.add_argument("--payload-days", type=int, default=60, help="Spread raw payload created_at over this window")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--cdn-base", default="http://localhost:9100", help="Image URLs point here (see bench.fakes)")
+    parser.add_argument("--truncate", action="store_true", help="Empty listings (cascades) and raw_payloads first")
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from sqlalchemy import text
+
+    from app.db import SessionLocal, engine, init_database
+    from app.facets import rebuild_facet_counts
+    from app.raw_partitions import add_months, ensure_partitions, month_start
+
+    init_database()
+    with engine.begin() as conn:
+        if args.truncate:
+            conn.execute(text("TRUNCATE listings, raw_payloads RESTART IDENTITY CASCADE"))
+        oldest = datetime.utcnow() - timedelta(days=args.payload_days)
+        months = 0
+        while add_months(month_start(oldest), months) < month_start(datetime.utcnow()):
+            months += 1
+        ensure_partitions(conn, months + 1, now=oldest)
+
+    with SessionLocal() as db:
+        campuses = load_campuses(db)
+
+    result: dict = {"benchmark": "generate", "seed": args.seed}
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        cur.execute("ALTER TABLE listings DISABLE TRIGGER listings_facet_counts")
+        raw.commit()
+        try:
+            if args.listings:
+                result["listings"] = generate_listings(raw, args, campuses)
+            if args.payloads:
+                result["raw_payloads"] = generate_payloads(raw, args)
+        finally:
+            raw.rollback()
+            cur.execute("ALTER TABLE listings ENABLE TRIGGER listings_facet_counts")
+            raw.commit()
+        started = time.perf_counter()
+        cur.execute("ANALYZE listings, listing_images, raw_payloads")
+        raw.commit()
+        result["analyze_seconds"] = time.perf_counter() - started
+    finally:
+        raw.close()
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        rebuild_facet_counts(db)
+        db.commit()
+        result["facet_rebuild_seconds"] = time.perf_counter() - started
+    return emit(result, args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""Load scenarios for ingest, listing reads and payload processing.
+
+Usage (from api/):
+    python -m bench.load ingest --base-url http://localhost:8000 --concurrency 32 --duration 30
+    python -m bench.load ingest --batch-size 500 --concurrency 4 --duration 30
+    python -m bench.load listings --concurrency 64 --duration 30 --mix filtered=5,bbox=2,deep_offset=1,cursor=2
+    python -m bench.load process --payloads 2000 --concurrency 8 --output process.json --baseline base.json
+
+``ingest`` and ``listings`` are closed-loop HTTP clients against a running
+API (``--concurrency`` in-flight requests for ``--duration`` seconds).
+``process`` runs ``process_raw_payload`` in this process over freshly
+inserted synthetic payloads (or the newest existing ones) and reports the
+per-step breakdown from the worker metrics. Point OPENAI_BASE_URL and
+GEOCODER_URL at bench.fakes for repeatable upstream latency.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from bench import synthetic
+from bench.results import add_result_arguments, emit, latency_summary
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.samples: dict[str, list[float]] = defaultdict(list)
+        self.errors: dict[str, int] = defaultdict(int)
+        self.statuses: dict[str, int] = defaultdict(int)
+        self.items = 0
+
+    def record(self, kind: str, seconds: float, ok: bool, status: str | None = None, items: int = 1) -> None:
+        self.samples[kind].append(seconds)
+        if not ok:
+            self.errors[kind] += 1
+        else:
+            self.items += items
+        if status is not None:
+            self.statuses[status] += 1
+
+    def summary(self, name: str, elapsed: float, config: dict) -> dict:
+        every = [s for samples in self.samples.values() for s in samples]
+        result = {
+            "benchmark": f"load.{name}",
+            "config": config,
+            "elapsed": elapsed,
+            "requests": len(every),
+            "errors": sum(self.errors.values()),
+            "rps": len(every) / elapsed if elapsed else None,
+            "items_per_second": self.items / elapsed if elapsed else None,
+            "latency_ms": latency_summary(every),
+        }
+        if len(self.samples) > 1:
+            result["by_kind"] = {
+                kind: {
+                    "requests": len(samples),
+                    "errors": self.errors.get(kind, 0),
+                    "rps": len(samples) / elapsed if elapsed else None,
+                    "latency_ms": latency_summary(samples),
+                }
+                for kind, samples in sorted(self.samples.items())
+            }
+        if self.statuses:
+            result["statuses"] = dict(self.statuses)
+        return result
+
+
+async def _closed_loop(concurrency: int, duration: float, step) -> float:
+    """Run ``step(worker_index)`` in ``concurrency`` loops until ``duration`` elapses."""
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+
+    async def worker(n: int) -> None:
+        while time.perf_counter() < deadline:
+            await step(n)
+
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def run_ingest(args) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    # Unique per run so payloads are new unless deliberately repeated
+    base_key = int(time.time() * 1000) * 1000
+    counter = iter(range(10**9))
+    sent: list[dict] = []
+
+    def next_payload() -> dict:
+        if sent and rng.random() < args.duplicate_rate:
+            return rng.choice(sent)
+        payload = synthetic.marketplace_payload(rng, base_key + next(counter), args.cdn_base)
+        if len(sent) < 10_000:
+            sent.append(payload)
+        return payload
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def step(_: int) -> None:
+            if args.batch_size > 1:
+                kind, path = "batch", "/api/ingest/batch"
+                body = [next_payload() for _ in range(args.batch_size)]
+            else:
+                kind, path = "single", "/api/ingest"
+                body = next_payload()
+            start = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                ok = response.status_code < 400
+                status = response.json().get("status") if ok else str(response.status_code)
+            except Exception as exc:
+                ok, status = False, type(exc).__name__
+            recorder.record(kind, time.perf_counter() - start, ok, status, items=len(body) if kind == "batch" else 1)
+
+        elapsed = await _closed_loop(args.concurrency, args.duration, step)
+    config = {"concurrency": args.concurrency, "duration": args.duration, "batch_size": args.batch_size,
+              "duplicate_rate": args.duplicate_rate}
+    return recorder.summary("ingest", elapsed, config)
+
+
+def _parse_mix(value: str) -> tuple[list[str], list[float]]:
+    kinds, weights = [], []
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        kinds.append(kind.strip())
+        weights.append(float(weight or 1))
+    return kinds, weights
+
+
+def _filtered_params(rng: random.Random, campus_ids: list[int]) -> dict:
+    params: dict = {"limit": 20}
+    if rng.random() < 0.7:
+        low = rng.choice([50000, 80000, 100000, 120000])
+        params["min_price"] = low
+        params["max_price"] = low + rng.choice([30000, 60000, 100000])
+    if rng.random() < 0.5:
+        params["bedrooms"] = rng.choice([0, 1, 2, 3])
+    if rng.random() < 0.3:
+        params["furnished"] = rng.choice(["true", "false"])
+    if campus_ids and rng.random() < 0.6:
+        params["campus_id"] = rng.choice(campus_ids)
+        if rng.random() < 0.5:
+            params["within_km"] = rng.choice([1, 2, 5])
+        params["sort"] = rng.choice(["recent", "campus_distance"])
+    return params
+
+
+def _bbox_params(rng: random.Random) -> dict:
+    _, lat, lng = synthetic.campus_point(rng)
+    if rng.random() < 0.5:
+        span = rng.choice([0.01, 0.03, 0.08])
+        return {"bbox": f"{lng - span},{lat - span},{lng + span},{lat + span}", "limit": 50}
+    return {"near": f"{lat},{lng}", "radius_km": rng.choice([1, 3, 10]), "sort": "distance", "limit": 20}
+
+
+async def run_listings(args) -> dict:
+    import httpx
+
+    rng = random.Random(args.seed)
+    kinds, weights = _parse_mix(args.mix)
+    campus_ids = [int(c) for c in args.campus_ids.split(",")] if args.campus_ids else []
+    recorder = Recorder()
+    cursors: dict[int, tuple[str | None, int]] = {}
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def step(n: int) -> None:
+            kind = rng.choices(kinds, weights=weights)[0]
+            if kind == "filtered":
+                params = _filtered_params(rng, campus_ids)
+            elif kind == "bbox":
+                params = _bbox_params(rng)
+            elif kind == "deep_offset":
+                params = {"limit": 20, "offset": rng.randrange(0, args.max_offset + 1, 20)}
+            elif kind == "cursor":
+                # Each worker walks its own cursor chain, restarting after --cursor-pages pages
+                cursor, depth = cursors.get(n, (None, 0))
+                params = {"limit": 20, **({"cursor": cursor} if cursor else {})}
+            else:
+                raise SystemExit(f"Unknown listings scenario kind: {kind}")
+            start = time.perf_counter()
+            try:
+                response = await client.get("/api/listings", params=params)
+                ok = response.status_code < 400
+            except Exception:
+                response, ok = None, False
+            recorder.record(kind, time.perf_counter() - start, ok)
+            if kind == "cursor":
+                next_cursor = response.headers.get("X-Next-Cursor") if ok else None
+                depth += 1
+                cursors[n] = (next_cursor, depth) if next_cursor and depth < args.cursor_pages else (None, 0)
+
+        elapsed = await _closed_loop(args.concurrency, args.duration, step)
+    config = {"concurrency": args.concurrency, "duration": args.duration, "mix": args.mix,
+              "max_offset": args.max_offset, "cursor_pages": args.cursor_pages}
+    return recorder.summary("listings", elapsed, config)
+
+
+def _insert_fresh_payloads(count: int, seed: int, cdn_base: str) -> list[int]:
+    from sqlalchemy import insert
+
+    from app.db import SessionLocal
+    from app.models import RawPayload
+    from app.payloads import compress_payload, content_hash
+
+    rng = random.Random(seed)
+    base_key = int(time.time() * 1000) * 1000
+    rows = []
+    for n in range(count):
+        request = synthetic.marketplace_payload(rng, base_key + n, cdn_base)
+        body = {"raw_html": None, "raw_json": request["raw_json"], "raw_text": request["raw_text"]}
+        rows.append({
+            "source": request["source"],
+            "url": request["source_url"],
+            "payload_zstd": compress_payload(body),
+            "content_hash": content_hash(request["source"], request["source_url"], body),
+        })
+    with SessionLocal() as db:
+        ids = list(db.scalars(insert(RawPayload).returning(RawPayload.id), rows))
+        db.commit()
+    return ids
+
+
+def _newest_payload_ids(count: int) -> list[int]:
+    from sqlalchemy import select
+
+    from app.db import SessionLocal
+    from app.models import RawPayload
+
+    with SessionLocal() as db:
+        return list(db.scalars(select(RawPayload.id).order_by(RawPayload.id.desc()).limit(count)))
+
+
+def _step_breakdown() -> dict:
+    from app.metrics import PIPELINE_STEP_SECONDS
+
+    totals: dict[str, dict] = defaultdict(dict)
+    for metric in PIPELINE_STEP_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                totals[sample.labels["step"]]["total"] = sample.value
+            elif sample.name.endswith("_count"):
+                totals[sample.labels["step"]]["count"] = sample.value
+    return {
+        step: {
+            "count": int(v.get("count", 0)),
+            "mean_ms": v["total"] / v["count"] * 1000.0 if v.get("count") else None,
+        }
+        for step, v in sorted(totals.items())
+    }
+
+
+def run_process(args) -> dict:
+    from app.tasks import process_raw_payload
+
+    if args.source == "fresh":
+        ids = _insert_fresh_payloads(args.payloads, args.seed, args.cdn_base)
+    else:
+        ids = _newest_payload_ids(args.payloads)
+    recorder = Recorder()
+
+    def one(payload_id: int) -> None:
+        start = time.perf_counter()
+        try:
+            status = process_raw_payload(payload_id).get("status")
+            ok = status != "not_found"
+        except Exception as exc:
+            ok, status = False, type(exc).__name__
+        recorder.record("process", time.perf_counter() - start, ok, status)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, ids))
+    elapsed = time.perf_counter() - started
+    config = {"concurrency": args.concurrency, "payloads": len(ids), "source": args.source}
+    result = recorder.summary("process", elapsed, config)
+    result["steps"] = _step_breakdown()
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="scenario", required=True)
+
+    http_common = argparse.ArgumentParser(add_help=False)
+    http_common.add_argument("--base-url", default="http://localhost:8000")
+    http_common.add_argument("--concurrency", type=int, default=32)
+    http_common.add_argument("--duration", type=float, default=30.0)
+    http_common.add_argument("--timeout", type=float, default=30.0)
+    http_common.add_argument("--seed", type=int, default=1)
+    add_result_arguments(http_common)
+
+    ingest = sub.add_parser("ingest", parents=[http_common], help="POST /api/ingest (or /api/ingest/batch)")
+    ingest.add_argument("--batch-size", type=int, default=1, help=">1 posts to /api/ingest/batch")
+    ingest.add_argument("--duplicate-rate", type=float, default=0.05, help="Fraction of re-sent payloads")
+    ingest.add_argument("--cdn-base", default="http://localhost:9100")
+
+    listings = sub.add_parser("listings", parents=[http_common], help="GET /api/listings, filtered and deep-paged")
+    listings.add_argument("--mix", default="filtered=5,bbox=2,deep_offset=1,cursor=2")
+    listings.add_argument("--max-offset", type=int, default=10_000)
+    listings.add_argument("--cursor-pages", type=int, default=50)
+    listings.add_argument("--campus-ids", default="1,2,3,4,5,6,7,8,9,10")
+
+    process = sub.add_parser("process", help="process_raw_payload in this process")
+    process.add_argument("--payloads", type=int, default=1000)
+    process.add_argument("--source", choices=["fresh", "existing"], default="fresh")
+    process.add_argument("--concurrency", type=int, default=8)
+    process.add_argument("--seed", type=int, default=1)
+    process.add_argument("--cdn-base", default="http://localhost:9100")
+    add_result_arguments(process)
+
+    args = parser.parse_args(argv)
+    if args.scenario == "ingest":
+        result = asyncio.run(run_ingest(args))
+    elif args.scenario == "listings":
+        result = asyncio.run(run_listings(args))
+    else:
+        result = run_process(args)
+    return emit(result, args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Statement counts and latency of the listing read endpoints.
+
+Usage (from api/):
+    python -m bench.queries --page-sizes 1,20,100 --repeat 20
+    python -m bench.queries --output queries.json --baseline queries-base.json
+
+Needs DATABASE_URL pointing at a populated database (see bench.generate)
+with at least max(--page-sizes) active listings. The Redis response cache
+is disabled for the run.
+
+Each request counts the statements both engines send. GET /api/listings
+and /api/listings/{id} must take exactly two queries at every page size:
+the listing rows plus one batched image load. Any other count fails the
+run with exit 1. For comparison, ``per_row`` times the loading the
+endpoints used before the batched load: the same page, images lazy-loaded
+one listing at a time and each row validated through ListingDetail.
+"""
+import argparse
+import sys
+import time
+from contextlib import contextmanager
+
+from bench.results import add_result_arguments, emit, latency_summary
+
+
+EXPECTED_STATEMENTS = 2
+
+
+class StatementCounter:
+    def __init__(self, *engines) -> None:
+        from sqlalchemy import event
+
+        self.count = 0
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args, **kwargs) -> None:
+        self.count += 1
+
+    @contextmanager
+    def counting(self):
+        start = self.count
+        box = {"statements": 0}
+        try:
+            yield box
+        finally:
+            box["statements"] = self.count - start
+
+
+def _per_row_page(limit: int) -> int:
+    """The pre-batching read: listings first, then each listing's images on attribute access."""
+    from sqlalchemy import select
+
+    from app.crud import apply_listing_filters
+    from app.db import SessionLocal
+    from app.models import Listing
+    from app.schemas import ListingDetail
+
+    with SessionLocal() as db:
+        stmt = apply_listing_filters(select(Listing)).order_by(Listing.collected_at.desc(), Listing.id.desc())
+        rows = db.execute(stmt.limit(limit)).scalars().all()
+        return len([ListingDetail.model_validate(row).model_dump() for row in rows])
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--page-sizes", default="1,20,100")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed requests per page size")
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    from app.config import settings
+
+    settings.listings_cache_enabled = False
+
+    from fastapi.testclient import TestClient
+
+    from app.db import async_engine, engine
+    from app.main import app
+
+    counter = StatementCounter(engine, async_engine.sync_engine)
+    failures: list[str] = []
+    result: dict = {"benchmark": "queries", "config": {"page_sizes": args.page_sizes, "repeat": args.repeat}}
+
+    def check(name: str, statements: int) -> None:
+        if statements != EXPECTED_STATEMENTS:
+            failures.append(f"{name}: {statements} statements (expected {EXPECTED_STATEMENTS})")
+
+    with TestClient(app) as client:
+        pages: dict[str, dict] = {}
+        detail_id = None
+        for size in (int(v) for v in args.page_sizes.split(",")):
+            samples, per_row = [], []
+            statements = per_row_statements = 0
+            for _ in range(max(1, args.repeat)):
+                with counter.counting() as counted:
+                    start = time.perf_counter()
+                    response = client.get("/api/listings", params={"limit": size})
+                    samples.append(time.perf_counter() - start)
+                response.raise_for_status()
+                rows = response.json()
+                if len(rows) < size:
+                    raise SystemExit(f"Only {len(rows)} active listings; load more with bench.generate")
+                detail_id = detail_id or rows[0]["id"]
+                statements = counted["statements"]
+                check(f"list limit={size}", statements)
+
+                with counter.counting() as counted:
+                    start = time.perf_counter()
+                    _per_row_page(size)
+                    per_row.append(time.perf_counter() - start)
+                per_row_statements = counted["statements"]
+            pages[f"limit_{size}"] = {
+                "statements": statements,
+                "latency_ms": latency_summary(samples),
+                "per_row": {"statements": per_row_statements, "latency_ms": latency_summary(per_row)},
+            }
+        result["list"] = pages
+
+        samples = []
+        for _ in range(max(1, args.repeat)):
+            with counter.counting() as counted:
+                start = time.perf_counter()
+                client.get(f"/api/listings/{detail_id}").raise_for_status()
+                samples.append(time.perf_counter() - start)
+            check("detail", counted["statements"])
+        result["detail"] = {"statements": counted["statements"], "latency_ms": latency_summary(samples)}
+
+    code = emit(result, args.output, args.baseline, args.tolerance)
+    if failures:
+        print("STATEMENT COUNT: " + "; ".join(failures), file=sys.stderr)
+        return 1
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""Machine-readable benchmark results and baseline comparison.
+
+Every benchmark writes one JSON object. Numeric leaves whose key ends in
+``_per_second`` (or is ``rps``) are treated as higher-is-better; leaves
+under a ``latency_ms`` object and keys ending in ``_seconds``/``_ms`` are
+lower-is-better. Anything else is informational.
+
+Usage (from api/):
+    python -m bench.results current.json baseline.json --tolerance 0.10
+"""
+import argparse
+import json
+import math
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values: list[float], q: float) -> float | None:
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(samples_seconds: list[float]) -> dict:
+    values = sorted(s * 1000.0 for s in samples_seconds)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "p50": percentile(values, 0.50),
+        "p90": percentile(values, 0.90),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else None,
+    }
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def with_environment(result: dict) -> dict:
+    return {
+        **result,
+        "recorded_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+    }
+
+
+def _flatten(obj, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        flat[prefix] = float(obj)
+    return flat
+
+
+def _direction(path: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 when not compared."""
+    leaf = path.rsplit(".", 1)[-1]
+    if leaf == "rps" or leaf.endswith("_per_second"):
+        return 1
+    if ".latency_ms." in f".{path}" and leaf in ("mean", "p50", "p90", "p99"):
+        return -1
+    if leaf.endswith("_seconds") or leaf.endswith("_ms"):
+        return -1
+    return 0
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> tuple[list[str], list[str]]:
+    """Return (report lines, regressions) for every comparable metric present in both."""
+    current, previous = _flatten(result), _flatten(baseline)
+    report, regressions = [], []
+    for path in sorted(current.keys() & previous.keys()):
+        direction = _direction(path)
+        before, after = previous[path], current[path]
+        if direction == 0 or before == 0:
+            continue
+        ratio = after / before
+        report.append(f"{path}: {before:.4g} -> {after:.4g} ({ratio:.2%})")
+        if (direction > 0 and ratio < 1.0 - tolerance) or (direction < 0 and ratio > 1.0 + tolerance):
+            regressions.append(path)
+    return report, regressions
+
+
+def emit(result: dict, output: str | None, baseline: str | None, tolerance: float) -> int:
+    """Print/write ``result`` and compare it against ``baseline``; returns the process exit code."""
+    result = with_environment(result)
+    print(json.dumps(result, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(result, f, indent=2)
+    if not baseline:
+        return 0
+    with open(baseline) as f:
+        report, regressions = compare(result, json.load(f), tolerance)
+    for line in report:
+        print(line)
+    if regressions:
+        print("REGRESSION: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+def add_result_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against a previous results JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed regression (fraction)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("current")
+    parser.add_argument("baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    args = parser.parse_args(argv)
+    with open(args.current) as f, open(args.baseline) as g:
+        report, regressions = compare(json.load(f), json.load(g), args.tolerance)
+    for line in report:
+        print(line)
+    if regressions:
+        print("REGRESSION: " + ", ".join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""Time spam scoring (medians, feature matrix, logistic) over synthetic listings in memory.
+
+Usage (from api/):
+    python -m bench.spam --listings 100000
+    python -m bench.spam --listings 100000 --spam-rate 0.05 --output spam.json --baseline spam-base.json
+
+No database: rows come from bench.synthetic, and ``--spam-rate`` of them are
+turned into typical scams (price cut to a third, deposit-by-wire text,
+off-platform contact, reused photos). The timed part is exactly what
+``app.spam.score_listings`` runs per batch after its SELECT. The mean score
+for planted and clean rows is reported as a sanity check of the weights.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime
+
+from bench import synthetic
+from bench.results import add_result_arguments, emit
+
+
+SCAM_TEXT = " Owner out of the country, send deposit by wire transfer and keys will be mailed. WhatsApp me!!!"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listings", type=int, default=100_000)
+    parser.add_argument("--spam-rate", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=10_000, help="Rows per feature matrix, as in the worker")
+    parser.add_argument("--seed", type=int, default=1)
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    import numpy as np
+
+    from app.campus_index import CampusIndex
+    from app.spam import TEXT_CHARS, compute_price_medians, feature_matrix, spam_scores
+
+    rng = random.Random(args.seed)
+    index = CampusIndex([(i + 1, name, lat, lng) for i, (name, lat, lng) in enumerate(synthetic.CAMPUSES)])
+    now = datetime.utcnow()
+    campus_ids, bedrooms, prices, texts, lengths, duplicates, planted = [], [], [], [], [], [], []
+    for key in range(args.listings):
+        f = synthetic.listing_fields(rng, key, now, "http://cdn")
+        campus = index.nearest(f["latitude"], f["longitude"])
+        spam = rng.random() < args.spam_rate
+        description = f["description"] + (SCAM_TEXT if spam else "")
+        campus_ids.append(campus[0] if campus else 0)
+        bedrooms.append(f["bedrooms"])
+        prices.append(f["price_cents"] // 3 if spam else f["price_cents"])
+        texts.append(f"{f['title']} {description}".lower()[:TEXT_CHARS])
+        lengths.append(len(description))
+        duplicates.append(rng.randint(1, 4) if spam else 0)
+        planted.append(spam)
+
+    started = time.perf_counter()
+    campus_arr = np.array(campus_ids, dtype=np.int64)
+    bedroom_arr = np.array(bedrooms, dtype=np.int64)
+    price_arr = np.array(prices, dtype=float)
+    medians = compute_price_medians(campus_arr, bedroom_arr, price_arr.astype(np.int64))
+    medians_seconds = time.perf_counter() - started
+
+    scores = np.empty(args.listings)
+    started = time.perf_counter()
+    for lo in range(0, args.listings, args.batch_size):
+        hi = min(args.listings, lo + args.batch_size)
+        features = feature_matrix(
+            campus_arr[lo:hi],
+            bedroom_arr[lo:hi],
+            price_arr[lo:hi],
+            np.array(texts[lo:hi], dtype=str),
+            np.array(lengths[lo:hi]),
+            np.array(duplicates[lo:hi], dtype=float),
+            medians,
+        )
+        scores[lo:hi] = spam_scores(features)
+    score_seconds = time.perf_counter() - started
+
+    planted_mask = np.array(planted)
+    result = {
+        "benchmark": "spam",
+        "config": {"listings": args.listings, "spam_rate": args.spam_rate, "batch_size": args.batch_size,
+                   "seed": args.seed},
+        "medians_seconds": medians_seconds,
+        "score_seconds": score_seconds,
+        "listings_per_second": args.listings / score_seconds if score_seconds else None,
+        "mean_score": {
+            "planted": float(scores[planted_mask].mean()) if planted_mask.any() else None,
+            "clean": float(scores[~planted_mask].mean()) if (~planted_mask).any() else None,
+        },
+        "flagged_at_0_8": {
+            "planted": int((scores[planted_mask] > 0.8).sum()),
+            "clean": int((scores[~planted_mask] > 0.8).sum()),
+        },
+    }
+    return emit(result, args.output, args.baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Cold-start benchmark for the API process.
+
+Usage (from api/):
+    python -m bench.startup --runs 5 --output startup.json
+    python -m bench.startup --serve --baseline startup.json
+
+Each run imports ``app.main`` in a fresh interpreter and records the import
+time and whether any worker-only dependency (Celery, openai, ...) was pulled
+in; that alone fails the run (exit 1). With ``--serve`` it also starts
+uvicorn and measures the time until ``/live`` answers. Needs DATABASE_URL
+set but no reachable services.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from bench.results import add_result_arguments, emit
+
+
+# Must stay off the API import path; loaded lazily by the code that needs them
+WORKER_ONLY_MODULES = ("app.tasks", "celery", "openai", "app.llm", "app.llm_executor", "httpx", "opensearchpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (WORKER_ONLY_MODULES,)
+
+
+def _env() -> dict:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://bench@localhost/bench")
+    return env
+
+
+def measure_import(runs: int) -> tuple[list[float], list[str]]:
+    timings, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, env=_env(), check=True)
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        timings.append(result["seconds"])
+        loaded.update(result["loaded"])
+    return timings, sorted(loaded)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def measure_time_to_live(timeout: float) -> float | None:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/live", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        return None
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--serve", action="store_true", help="Also time uvicorn start to first /live")
+    parser.add_argument("--serve-timeout", type=float, default=30.0)
+    add_result_arguments(parser)
+    args = parser.parse_args(argv)
+
+    timings, loaded = measure_import(args.runs)
+    result = {
+        "benchmark": "startup",
+        "runs": args.runs,
+        "import_app_main_seconds": statistics.median(timings),
+        "import_app_main_best": min(timings),
+        "worker_only_modules_loaded": loaded,
+    }
+    if args.serve:
+        result["time_to_live_seconds"] = measure_time_to_live(args.serve_timeout)
+    code = emit(result, args.output, args.baseline, args.tolerance)
+    if loaded:
+        print("REGRESSION: app.main imports worker-only modules: " + ", ".join(loaded), file=sys.stderr)
+        return 1
+    if args.serve and result["time_to_live_seconds"] is None:
+        print("API did not answer /live within --serve-timeout", file=sys.stderr)
+        return 1
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
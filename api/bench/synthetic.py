@@ -0,0 +1,118 @@
+"""Deterministic synthetic rental data shared by the generator and load scenarios.
+
+Everything is driven by a ``random.Random`` so a given seed always yields
+the same corpus. Listings cluster around real campuses with a lognormal
+price distribution; payloads mimic what the browser extension captures from
+Marketplace (``raw_json`` plus ``raw_text``).
+"""
+import math
+import random
+from datetime import datetime, timedelta
+
+
+CAMPUSES = [
+    ("University of Toronto", 43.6629, -79.3957),
+    ("Toronto Metropolitan University", 43.6577, -79.3788),
+    ("York University", 43.7735, -79.5019),
+    ("University of Waterloo", 43.4723, -80.5449),
+    ("McMaster University", 43.2609, -79.9192),
+    ("Queen's University", 44.2253, -76.4951),
+    ("University of Ottawa", 45.4231, -75.6831),
+    ("McGill University", 45.5048, -73.5772),
+    ("University of British Columbia", 49.2606, -123.2460),
+    ("University of Alberta", 53.5232, -113.5263),
+]
+CAMPUS_WEIGHTS = [30, 12, 8, 10, 6, 4, 6, 10, 10, 4]
+
+STREETS = ["College", "Spadina", "Bloor", "Harbord", "King", "Queen", "Dundas", "University", "Bathurst", "Albert"]
+SUFFIXES = ["St", "Ave", "Rd", "Blvd"]
+ADJECTIVES = ["Sunny", "Spacious", "Cozy", "Bright", "Renovated", "Modern", "Quiet", "Furnished", "Charming"]
+UNITS = ["room", "studio", "1-bed apartment", "2-bed apartment", "3-bed house", "basement suite", "condo"]
+FEATURES = [
+    "in-suite laundry", "hardwood floors", "utilities included", "close to transit", "walk to campus",
+    "dishwasher", "balcony", "parking available", "gym in building", "high-speed internet",
+]
+BEDROOMS = [0, 1, 1, 1, 2, 2, 2, 3, 3, 4]
+LEASE_TERMS = ["12 months", "8 months", "4 months", "month-to-month"]
+
+
+def campus_point(rng: random.Random) -> tuple[str, float, float]:
+    name, lat, lng = rng.choices(CAMPUSES, weights=CAMPUS_WEIGHTS)[0]
+    # Most rentals within a few km of campus, with a long tail
+    distance_km = rng.expovariate(1 / 2.5)
+    bearing = rng.uniform(0, 2 * math.pi)
+    dlat = distance_km / 111.0 * math.cos(bearing)
+    dlng = distance_km / (111.0 * math.cos(math.radians(lat))) * math.sin(bearing)
+    return name, lat + dlat, lng + dlng
+
+
+def price_cents(rng: random.Random, bedrooms: int) -> int:
+    dollars = rng.lognormvariate(math.log(900 + 450 * bedrooms), 0.25)
+    return int(round(dollars / 25.0) * 25) * 100
+
+
+def address(rng: random.Random) -> str:
+    return f"{rng.randint(1, 999)} {rng.choice(STREETS)} {rng.choice(SUFFIXES)}"
+
+
+def description(rng: random.Random, bedrooms: int, furnished: bool, pets: bool, lease: str) -> str:
+    features = ", ".join(rng.sample(FEATURES, 3))
+    return (
+        f"{bedrooms} bed {rng.choice([1, 1, 1.5, 2])} bath. {'Furnished' if furnished else 'Unfurnished'}, "
+        f"{'pets allowed' if pets else 'no pets'}. {lease} lease. Features {features}. "
+        f"Contact for viewing, available {rng.choice(['now', 'May 1', 'Sept 1', 'Jan 1'])}."
+    )
+
+
+def image_urls(rng: random.Random, cdn_base: str, key: int, count: int) -> list[str]:
+    return [f"{cdn_base.rstrip('/')}/img/{key}-{n}.jpg?w=960" for n in range(count)]
+
+
+def listing_fields(rng: random.Random, key: int, now: datetime, cdn_base: str) -> dict:
+    """One listing as column values (plus ``images``), roughly what the pipeline would persist."""
+    bedrooms = rng.choice(BEDROOMS)
+    furnished = rng.random() < 0.4
+    pets = rng.random() < 0.3
+    lease = rng.choice(LEASE_TERMS)
+    _, lat, lng = campus_point(rng)
+    collected_at = now - timedelta(seconds=rng.randint(0, 60 * 24 * 3600))
+    unit = UNITS[min(bedrooms + 1, len(UNITS) - 1)] if bedrooms else rng.choice(UNITS[:2])
+    return {
+        "source": "marketplace",
+        "source_id": f"https://www.facebook.com/marketplace/item/{10**14 + key}/",
+        "title": f"{rng.choice(ADJECTIVES)} {unit} near campus",
+        "description": description(rng, bedrooms, furnished, pets, lease),
+        "price_cents": price_cents(rng, bedrooms),
+        "currency": "CAD",
+        "bedrooms": bedrooms,
+        "bathrooms": 1.0 + 0.5 * rng.randint(0, 2),
+        "furnished": furnished,
+        "pets_allowed": pets,
+        "lease_term": lease,
+        "raw_address": address(rng),
+        "latitude": lat,
+        "longitude": lng,
+        "posted_at": collected_at,
+        "collected_at": collected_at,
+        "last_seen_at": collected_at + timedelta(seconds=rng.randint(0, 7 * 24 * 3600)),
+        "status": "active" if rng.random() < 0.97 else "duplicate",
+        "images": image_urls(rng, cdn_base, key, rng.randint(1, 8)),
+    }
+
+
+def marketplace_payload(rng: random.Random, key: int, cdn_base: str) -> dict:
+    """An ``IngestRequest`` body as the extension would post it."""
+    fields = listing_fields(rng, key, datetime.utcnow(), cdn_base)
+    price = fields["price_cents"] // 100
+    return {
+        "source": "marketplace",
+        "source_url": fields["source_id"],
+        "raw_json": {
+            "title": fields["title"],
+            "description_text": fields["description"],
+            "price": f"${price:,}",
+            "location_text": fields["raw_address"],
+            "images": fields["images"],
+        },
+        "raw_text": f"{fields['title']}\nCA${price:,} / month\n{fields['raw_address']}\n{fields['description']}",
+    }
@@ -0,0 +1,72 @@
+-- Spam dimension for the facet counter cube (app/facets.py).
+-- clean = 1 for active listings GET /api/listings shows by default
+-- (spam_score <= LISTINGS_MAX_SPAM_SCORE, 0.8 here, or not scored yet), so
+-- default facet requests are still answered from the cube. Re-run the
+-- functions below with the new value (or restart the API, then run
+-- rebuild_listing_facet_counts) after changing that setting.
+
+ALTER TABLE listing_facet_counts ADD COLUMN IF NOT EXISTS clean SMALLINT NOT NULL DEFAULT 1;
+
+BEGIN;
+LOCK TABLE listing_facet_counts IN EXCLUSIVE MODE;
+ALTER TABLE listing_facet_counts DROP CONSTRAINT IF EXISTS listing_facet_counts_pkey;
+DELETE FROM listing_facet_counts;
+ALTER TABLE listing_facet_counts ADD PRIMARY KEY (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket);
+
+CREATE OR REPLACE FUNCTION listing_facet_counts_apply(l listings, delta integer) RETURNS void AS $$
+BEGIN
+    IF l.status IS DISTINCT FROM 'active' THEN
+        RETURN;
+    END IF;
+    INSERT INTO listing_facet_counts AS c (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket, count)
+    VALUES (
+        COALESCE(l.nearest_campus_id, 0),
+        COALESCE(l.bedrooms, -1),
+        CASE WHEN l.furnished IS NULL THEN -1 WHEN l.furnished THEN 1 ELSE 0 END,
+        CASE WHEN l.pets_allowed IS NULL THEN -1 WHEN l.pets_allowed THEN 1 ELSE 0 END,
+        CASE WHEN l.spam_score IS NULL OR l.spam_score <= 0.8 THEN 1 ELSE 0 END,
+        LEAST(GREATEST(l.price_cents, 0) / 25000, 24),
+        delta
+    )
+    ON CONFLICT (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket)
+    DO UPDATE SET count = c.count + EXCLUDED.count;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION listing_facet_counts_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (OLD.status, OLD.nearest_campus_id, OLD.bedrooms, OLD.furnished, OLD.pets_allowed, OLD.price_cents,
+        CASE WHEN OLD.spam_score IS NULL OR OLD.spam_score <= 0.8 THEN 1 ELSE 0 END)
+       IS NOT DISTINCT FROM
+       (NEW.status, NEW.nearest_campus_id, NEW.bedrooms, NEW.furnished, NEW.pets_allowed, NEW.price_cents,
+        CASE WHEN NEW.spam_score IS NULL OR NEW.spam_score <= 0.8 THEN 1 ELSE 0 END) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM listing_facet_counts_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM listing_facet_counts_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER listings_facet_counts
+AFTER INSERT OR DELETE OR UPDATE OF status, nearest_campus_id, bedrooms, furnished, pets_allowed, price_cents, spam_score
+ON listings FOR EACH ROW EXECUTE FUNCTION listing_facet_counts_trigger();
+
+INSERT INTO listing_facet_counts (campus_id, bedrooms, furnished, pets_allowed, clean, price_bucket, count)
+SELECT
+    COALESCE(nearest_campus_id, 0),
+    COALESCE(bedrooms, -1),
+    CASE WHEN furnished IS NULL THEN -1 WHEN furnished THEN 1 ELSE 0 END,
+    CASE WHEN pets_allowed IS NULL THEN -1 WHEN pets_allowed THEN 1 ELSE 0 END,
+    CASE WHEN spam_score IS NULL OR spam_score <= 0.8 THEN 1 ELSE 0 END,
+    LEAST(GREATEST(price_cents, 0) / 25000, 24),
+    count(*)
+FROM listings
+WHERE status = 'active'
+GROUP BY 1, 2, 3, 4, 5, 6;
+COMMIT;
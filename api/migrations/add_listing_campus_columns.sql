@@ -0,0 +1,13 @@
+-- Migration to persist nearest-campus tagging on listings
+-- Populated by process_raw_payload; backfill with the retag_campuses task
+
+ALTER TABLE listings
+ADD COLUMN IF NOT EXISTS nearest_campus_id INTEGER REFERENCES campuses(id) ON DELETE SET NULL;
+
+ALTER TABLE listings
+ADD COLUMN IF NOT EXISTS campus_distance_km DOUBLE PRECISION;
+
+CREATE INDEX IF NOT EXISTS ix_listings_campus_distance_km ON listings(campus_distance_km);
+
+-- Serves "within N km of campus X" filters and distance ordering
+CREATE INDEX IF NOT EXISTS ix_listings_campus_distance ON listings(nearest_campus_id, campus_distance_km);
@@ -0,0 +1,67 @@
+-- Facet counter cube for GET /api/listings/facets (app/facets.py).
+-- A trigger on listings keeps per-cell counts of active listings current;
+-- the rebuild_listing_facet_counts beat task recomputes it nightly.
+
+CREATE TABLE IF NOT EXISTS listing_facet_counts (
+    campus_id INTEGER NOT NULL,
+    bedrooms INTEGER NOT NULL,
+    furnished SMALLINT NOT NULL,
+    pets_allowed SMALLINT NOT NULL,
+    price_bucket INTEGER NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (campus_id, bedrooms, furnished, pets_allowed, price_bucket)
+);
+
+INSERT INTO listing_facet_counts (campus_id, bedrooms, furnished, pets_allowed, price_bucket, count)
+SELECT
+    COALESCE(nearest_campus_id, 0),
+    COALESCE(bedrooms, -1),
+    CASE WHEN furnished IS NULL THEN -1 WHEN furnished THEN 1 ELSE 0 END,
+    CASE WHEN pets_allowed IS NULL THEN -1 WHEN pets_allowed THEN 1 ELSE 0 END,
+    LEAST(GREATEST(price_cents, 0) / 25000, 24),
+    count(*)
+FROM listings
+WHERE status = 'active'
+AND NOT EXISTS (SELECT 1 FROM listing_facet_counts)
+GROUP BY 1, 2, 3, 4, 5;
+
+CREATE OR REPLACE FUNCTION listing_facet_counts_apply(l listings, delta integer) RETURNS void AS $$
+BEGIN
+    IF l.status IS DISTINCT FROM 'active' THEN
+        RETURN;
+    END IF;
+    INSERT INTO listing_facet_counts AS c (campus_id, bedrooms, furnished, pets_allowed, price_bucket, count)
+    VALUES (
+        COALESCE(l.nearest_campus_id, 0),
+        COALESCE(l.bedrooms, -1),
+        CASE WHEN l.furnished IS NULL THEN -1 WHEN l.furnished THEN 1 ELSE 0 END,
+        CASE WHEN l.pets_allowed IS NULL THEN -1 WHEN l.pets_allowed THEN 1 ELSE 0 END,
+        LEAST(GREATEST(l.price_cents, 0) / 25000, 24),
+        delta
+    )
+    ON CONFLICT (campus_id, bedrooms, furnished, pets_allowed, price_bucket)
+    DO UPDATE SET count = c.count + EXCLUDED.count;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION listing_facet_counts_trigger() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND
+       (OLD.status, OLD.nearest_campus_id, OLD.bedrooms, OLD.furnished, OLD.pets_allowed, OLD.price_cents)
+       IS NOT DISTINCT FROM
+       (NEW.status, NEW.nearest_campus_id, NEW.bedrooms, NEW.furnished, NEW.pets_allowed, NEW.price_cents) THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM listing_facet_counts_apply(OLD, -1);
+    END IF;
+    IF TG_OP IN ('UPDATE', 'INSERT') THEN
+        PERFORM listing_facet_counts_apply(NEW, 1);
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER listings_facet_counts
+AFTER INSERT OR DELETE OR UPDATE OF status, nearest_campus_id, bedrooms, furnished, pets_allowed, price_cents
+ON listings FOR EACH ROW EXECUTE FUNCTION listing_facet_counts_trigger();
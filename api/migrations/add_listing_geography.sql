@@ -0,0 +1,13 @@
+-- Generated PostGIS geography point for spatial queries on GET /api/listings
+-- (bbox=, near=&radius_km=, sort=distance KNN ordering). Adding a STORED
+-- generated column rewrites the table; run during a maintenance window.
+
+CREATE EXTENSION IF NOT EXISTS postgis;
+
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS geog geography(Point, 4326)
+    GENERATED ALWAYS AS (
+        CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL
+        THEN ST_SetSRID(ST_MakePoint(longitude, latitude), 4326)::geography END
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_listings_geog ON listings USING GIST (geog);
@@ -0,0 +1,4 @@
+-- Composite index backing keyset pagination on GET /api/listings
+-- (ORDER BY collected_at DESC, id DESC with a (collected_at, id) < (...) seek predicate)
+
+CREATE INDEX IF NOT EXISTS ix_listings_collected_at_id ON listings(collected_at, id);
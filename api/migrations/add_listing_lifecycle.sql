@@ -0,0 +1,22 @@
+-- Listing lifecycle (app/lifecycle.py, beat task expire_stale_listings).
+-- last_seen_at is bumped on every re-ingest (including byte-identical
+-- re-submissions, see app.lifecycle.touch_resubmitted); listings not seen for
+-- LISTING_EXPIRE_AFTER_DAYS are moved to listings_archive so the hot table
+-- and its indexes only cover the active working set.
+
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP WITHOUT TIME ZONE;
+UPDATE listings SET last_seen_at = collected_at WHERE last_seen_at IS NULL;
+CREATE INDEX IF NOT EXISTS ix_listings_last_seen_at ON listings(last_seen_at);
+
+CREATE TABLE IF NOT EXISTS listings_archive (
+    id INTEGER PRIMARY KEY,
+    source VARCHAR(64) NOT NULL,
+    source_id VARCHAR(128) NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    collected_at TIMESTAMP WITHOUT TIME ZONE,
+    last_seen_at TIMESTAMP WITHOUT TIME ZONE,
+    archived_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    data JSONB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_listings_archive_archived_at ON listings_archive(archived_at);
+CREATE INDEX IF NOT EXISTS ix_listings_archive_source_source_id ON listings_archive(source, source_id);
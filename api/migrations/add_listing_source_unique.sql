@@ -0,0 +1,15 @@
+-- Idempotent re-ingestion: one listing per (source, source_id), upserted with
+-- INSERT ... ON CONFLICT (source, source_id). Existing duplicates are collapsed
+-- onto the most recently collected row before the unique index is built.
+
+DELETE FROM listings l
+USING listings newer
+WHERE l.source = newer.source
+  AND l.source_id = newer.source_id
+  AND (l.collected_at, l.id) < (newer.collected_at, newer.id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_listings_source_source_id ON listings(source, source_id);
+
+-- Content hash of each raw payload; identical re-submissions are acknowledged without queuing work
+ALTER TABLE raw_payloads ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+CREATE INDEX IF NOT EXISTS ix_raw_payloads_content_hash ON raw_payloads(content_hash);
@@ -0,0 +1,31 @@
+-- Near-duplicate detection (app/near_dup.py)
+-- MinHash/LSH over listing text and multi-index hashing over image dHashes.
+
+ALTER TABLE listings ADD COLUMN IF NOT EXISTS cluster_id INTEGER;
+CREATE INDEX IF NOT EXISTS ix_listings_cluster_id ON listings(cluster_id);
+
+ALTER TABLE listing_images ADD COLUMN IF NOT EXISTS phash BIGINT;
+
+CREATE TABLE IF NOT EXISTS listing_text_signatures (
+    listing_id INTEGER PRIMARY KEY REFERENCES listings(id) ON DELETE CASCADE,
+    minhash BYTEA NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS listing_lsh_bands (
+    listing_id INTEGER NOT NULL REFERENCES listings(id) ON DELETE CASCADE,
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    PRIMARY KEY (listing_id, band)
+);
+CREATE INDEX IF NOT EXISTS ix_listing_lsh_bands_bucket ON listing_lsh_bands(band, bucket);
+
+CREATE TABLE IF NOT EXISTS image_hash_chunks (
+    image_id INTEGER NOT NULL REFERENCES listing_images(id) ON DELETE CASCADE,
+    chunk SMALLINT NOT NULL,
+    value INTEGER NOT NULL,
+    listing_id INTEGER NOT NULL,
+    phash BIGINT NOT NULL,
+    PRIMARY KEY (image_id, chunk)
+);
+CREATE INDEX IF NOT EXISTS ix_image_hash_chunks_value ON image_hash_chunks(chunk, value);
+CREATE INDEX IF NOT EXISTS ix_image_hash_chunks_listing_id ON image_hash_chunks(listing_id);
@@ -0,0 +1,52 @@
+-- Convert raw_payloads into a monthly RANGE-partitioned table on created_at and
+-- add the compressed payload column. Existing rows stay where they are: the old
+-- table becomes the partition raw_payloads_legacy covering everything before the
+-- start of next month, so no data is rewritten. Monthly partitions after that are
+-- created by app.raw_partitions.ensure_partitions (bootstrap and the beat job that
+-- runs every 6 hours), which also drops partitions older than
+-- RAW_PAYLOAD_RETENTION_DAYS. raw_payloads_default catches rows for any month
+-- without a partition yet; ensure_partitions moves them out when it creates one.
+
+BEGIN;
+
+ALTER TABLE raw_payloads RENAME TO raw_payloads_legacy;
+ALTER TABLE raw_payloads_legacy ALTER COLUMN payload DROP NOT NULL;
+ALTER TABLE raw_payloads_legacy ADD COLUMN IF NOT EXISTS payload_zstd BYTEA;
+ALTER TABLE raw_payloads_legacy ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+ALTER TABLE raw_payloads_legacy DROP CONSTRAINT raw_payloads_pkey;
+ALTER TABLE raw_payloads_legacy ADD PRIMARY KEY (id, created_at);
+ALTER INDEX IF EXISTS ix_raw_payloads_source RENAME TO ix_raw_payloads_legacy_source;
+ALTER INDEX IF EXISTS ix_raw_payloads_created_at RENAME TO ix_raw_payloads_legacy_created_at;
+ALTER INDEX IF EXISTS ix_raw_payloads_content_hash RENAME TO ix_raw_payloads_legacy_content_hash;
+
+CREATE TABLE raw_payloads (
+    id INTEGER NOT NULL DEFAULT nextval('raw_payloads_id_seq'),
+    source VARCHAR(64) NOT NULL,
+    url VARCHAR(1024),
+    payload JSONB,
+    payload_zstd BYTEA,
+    content_hash VARCHAR(64),
+    created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER TABLE raw_payloads_legacy ALTER COLUMN id DROP DEFAULT;
+ALTER SEQUENCE raw_payloads_id_seq OWNED BY raw_payloads.id;
+
+DO $$
+DECLARE
+    cutover DATE := (date_trunc('month', now()) + interval '1 month')::date;
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE raw_payloads ATTACH PARTITION raw_payloads_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        cutover
+    );
+END $$;
+
+CREATE TABLE IF NOT EXISTS raw_payloads_default PARTITION OF raw_payloads DEFAULT;
+
+CREATE INDEX IF NOT EXISTS ix_raw_payloads_source ON raw_payloads(source);
+CREATE INDEX IF NOT EXISTS ix_raw_payloads_created_at ON raw_payloads(created_at);
+CREATE INDEX IF NOT EXISTS ix_raw_payloads_content_hash ON raw_payloads(content_hash);
+
+COMMIT;
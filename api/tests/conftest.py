@@ -0,0 +1,4 @@
+import os
+
+# app.config requires a database URL at import; these tests never connect
+os.environ.setdefault("DATABASE_URL", "postgresql://test@localhost/test")
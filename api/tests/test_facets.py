@@ -0,0 +1,47 @@
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import facets
+from app.config import settings
+
+
+@pytest.fixture
+def routed(monkeypatch):
+    """Record which facet backend compute_facets picks when OpenSearch is unavailable."""
+    calls = []
+    monkeypatch.setattr(settings, "facets_use_opensearch", False)
+    monkeypatch.setattr(facets, "_counter_facets", lambda db, f: calls.append(("counters", f)) or {})
+    monkeypatch.setattr(facets, "_sql_facets", lambda db, f: calls.append(("database", f)) or {})
+    return calls
+
+
+def test_default_threshold_uses_counter_cube(routed):
+    facets.compute_facets(None, bedrooms=2, max_spam_score=settings.listings_max_spam_score)
+    assert routed == [("counters", {"bedrooms": 2, "max_spam_score": settings.listings_max_spam_score})]
+
+
+def test_custom_threshold_falls_back_to_sql(routed):
+    facets.compute_facets(None, max_spam_score=0.3)
+    assert [backend for backend, _ in routed] == ["database"]
+
+
+def test_spatial_filter_falls_back_to_sql(routed):
+    facets.compute_facets(None, bbox=(-79.5, 43.6, -79.3, 43.7))
+    assert [backend for backend, _ in routed] == ["database"]
+
+
+def test_facets_endpoint_defaults_hit_counter_cube(routed, monkeypatch):
+    from app.main import app
+    from app.db import get_db
+
+    monkeypatch.setattr(settings, "listings_cache_enabled", False)
+    app.dependency_overrides[get_db] = lambda: mock.MagicMock()
+    try:
+        response = TestClient(app).get("/api/listings/facets", params={"bedrooms": 1})
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert [backend for backend, _ in routed] == ["counters"]
+    assert routed[0][1]["max_spam_score"] == settings.listings_max_spam_score